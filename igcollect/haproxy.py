@@ -9,6 +9,8 @@ from argparse import ArgumentParser
 from subprocess import Popen, PIPE
 from time import time
 
+from lib_graphite import GraphiteEmitter
+
 BUFFER_SIZE = 4096
 
 
@@ -23,17 +25,20 @@ def parse_args():
 
 def main():
     args = parse_args()
-    template = args.prefix + '.{}.{}.{} {} ' + str(int(time()))
     haproxy_info = read_ha_proxy_stats(args.haproxy_stats_socket).decode()
     haproxy_info = haproxy_info.splitlines()
     header = haproxy_info[0].replace(' ', '_').split(',')
-    for line in haproxy_info[1:-1]:
-        service_data = line.split(',')
-        data = dict(zip(header, service_data))  # gather data for every proxy/service
-        pxname = data.pop('#_pxname')  # pxname - proxy name; svname - service name
-        svname = data.pop('svname')
-        for metric_name, metric_value in data.items():
-            print(template.format(pxname, svname, metric_name, metric_value))
+    with GraphiteEmitter(args.prefix, int(time())) as emitter:
+        for line in haproxy_info[1:-1]:
+            service_data = line.split(',')
+            data = dict(zip(header, service_data))  # gather data for every proxy/service
+            pxname = data.pop('#_pxname')  # pxname - proxy name; svname - service name
+            svname = data.pop('svname')
+            for metric_name, metric_value in data.items():
+                emitter.emit(
+                    '{}.{}.{}'.format(pxname, svname, metric_name),
+                    metric_value,
+                )
 
 
 def read_ha_proxy_stats(haproxy_stats_socket):
@@ -2,6 +2,7 @@
 """igcollect - idrac
 
 This script collects various parameters of iDRAC and a server it is in via SNMP.
+The iDRACs given are polled concurrently.
 
 Copyright © 2023 InnoGames GmbH
 """
@@ -9,12 +10,13 @@ Copyright © 2023 InnoGames GmbH
 from argparse import ArgumentParser
 from time import time
 
+import asyncio
 import sys
 
 from lib_snmp import (
     add_snmp_arguments,
-    get_snmp_connection,
-    get_snmp_table,
+    get_host_prefix,
+    poll_devices,
 )
 
 OID_CONSTANTS = {
@@ -72,8 +74,12 @@ OIDS = {
 
 def parse_args():
     parser = ArgumentParser()
-    parser.add_argument('host', type=str, help='Hostname of the iDRAC')
-    parser.add_argument('--prefix', help='Graphite prefix')
+    parser.add_argument('host', nargs='+', help='Hostnames of the iDRACs')
+    parser.add_argument(
+        '--prefix', default='idrac',
+        help='Graphite prefix, "{host}" is replaced by the iDRAC, which is '
+        'appended to the prefix without it for multiple iDRACs',
+    )
     add_snmp_arguments(parser)
 
     return parser.parse_args()
@@ -83,39 +89,57 @@ def main():
     timestamp = int(time())
     args = parse_args()
 
-    snmp = get_snmp_connection(args)
+    ret = 0
+    results = poll_devices(args.host, args, poll_idrac)
+    for host, probes in results.items():
+        if isinstance(probes, Exception):
+            print(f'{host}: {probes}', file=sys.stderr)
+            ret = -1
+            continue
+        prefix = get_host_prefix(args.prefix, host, len(args.host) > 1)
+        for probe_set, probe_data in probes.items():
+            for probe_name, probe_reading in probe_data.items():
+                probe_name = probe_name.replace(' ', '_')
+                print(f'{prefix}.{probe_set}.{probe_name} {probe_reading} {timestamp}')
+    return ret
 
-    prefix = 'idrac'
-    if args.prefix:
-        prefix = f'{args.prefix}'
 
+async def poll_idrac(snmp):
+    """ Return the readings of the probes of every probe set """
+    readers = []
     for probe_set, probe_config in OIDS.items():
         if probe_set == 'temperature':
-            probe_data = get_temperatures(snmp, probe_config)
+            readers.append(get_temperatures)
         elif probe_set == 'current':
-            probe_data = get_currents(snmp, probe_config)
+            readers.append(get_currents)
         else:
             raise Exception(f'Unknown probe {probe_set}')
 
-        for probe_name, probe_reading in probe_data.items():
-            probe_name = probe_name.replace(' ', '_')
-            print(f'{prefix}.{probe_set}.{probe_name} {probe_reading} {timestamp}')
+    probe_data = await asyncio.gather(*(
+        reader(snmp, probe_config)
+        for reader, probe_config in zip(readers, OIDS.values())
+    ))
+    return dict(zip(OIDS, probe_data))
 
 
-def get_temperatures(snmp, config):
+async def get_temperatures(snmp, config):
     ret = {}
-    probe_units = get_snmp_table(snmp, config['probe_type'])
-    for probe_index, probe_data in get_probes_table(snmp, config).items():
+    probe_units, probes = await asyncio.gather(
+        snmp.get_table(config['probe_type']), get_probes_table(snmp, config),
+    )
+    for probe_index, probe_data in probes.items():
         if probe_units[probe_index] != OID_CONSTANTS['temperatureProbeTypeIsDiscrete']:
             ret[probe_data['name']] = probe_data['reading'] * 0.1
         # else skip this probe
     return ret
 
 
-def get_currents(snmp, config):
+async def get_currents(snmp, config):
     ret = {}
-    probe_units = get_snmp_table(snmp, config['probe_type'])
-    for probe_index, probe_data in get_probes_table(snmp, config).items():
+    probe_units, probes = await asyncio.gather(
+        snmp.get_table(config['probe_type']), get_probes_table(snmp, config),
+    )
+    for probe_index, probe_data in probes.items():
         probe_unit = probe_units[probe_index]
         if probe_unit in config['probe_unit_mapping']:
             probe_unit = config['probe_unit_mapping'][probe_unit]
@@ -125,9 +149,10 @@ def get_currents(snmp, config):
     return ret
 
 
-def get_probes_table(snmp, config):
-    probe_names = get_snmp_table(snmp, config['probe_names'])
-    probe_readings = get_snmp_table(snmp, config['probe_readings'])
+async def get_probes_table(snmp, config):
+    probe_names, probe_readings = await snmp.get_tables(
+        [config['probe_names'], config['probe_readings']]
+    )
     ret = {}
     for probe_index, probe_name in probe_names.items():
         ret[probe_index] = {
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""igcollect - Parallel Collector Executor
+
+This script runs a set of collectors concurrently, so that a slow one
+doesn't delay the others.  Every collector runs in its own process, which
+is killed when it exceeds its timeout.  The output of every collector is
+written as soon as it finishes.
+
+python igcollect_parallel.py "linux_cpu --prefix cpu" "switch sw1 ..." \\
+    --timeout 20
+
+The collectors can also be read from the same INI file as igcollectd.py
+uses, where the sections can have their own timeout option.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import os
+import sys
+
+from argparse import ArgumentParser
+from time import time
+
+# The collectors and the libraries are installed next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lib_runner import (
+    add_telemetry_arguments,
+    load_collector,
+    parse_job,
+    read_jobs,
+    run_parallel,
+)
+
+
+def parse_args():
+    parser = ArgumentParser()
+    parser.add_argument(
+        'collectors', nargs='*',
+        help='collector to run with its arguments as a single string',
+    )
+    parser.add_argument(
+        '--config',
+        help='INI file with one section for every collector to run',
+    )
+    parser.add_argument(
+        '--workers', type=int, default=4,
+        help='number of collectors to run at the same time',
+    )
+    parser.add_argument(
+        '--timeout', type=float, default=50,
+        help='seconds after which a collector is killed',
+    )
+    add_telemetry_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    jobs = [parse_job(c) for c in args.collectors]
+    if args.config:
+        jobs += read_jobs(args.config, timeout=args.timeout)
+    if not jobs:
+        print('No collectors given', file=sys.stderr)
+        return 1
+
+    # Import the collectors once before forking the workers
+    for job in jobs:
+        load_collector(job.module)
+
+    failed = 0
+    for result in run_parallel(jobs, args.workers, args.timeout):
+        lines = result.lines
+        if args.telemetry:
+            lines = lines + result.telemetry(
+                args.telemetry_prefix, int(time())
+            )
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+        if result.error:
+            print('{}: {}'.format(result.name, result.error), file=sys.stderr)
+            failed += 1
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
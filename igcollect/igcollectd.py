@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""igcollect - Collector Daemon
+
+This script imports the collectors once and keeps running them on their
+own schedule, so the interpreter startup, the imports and the connections
+are not paid again on every interval.  The collectors are configured in
+an INI file, one section for each job:
+
+    [cpu]
+    module = linux_cpu
+    interval = 10
+    args = --prefix cpu
+
+    [linux_disk]
+    interval = 60
+
+The module defaults to the name of the section, the interval to the value
+of --interval.  The output of the collectors is written to the standard
+output the same way as the standalone scripts do, or sent directly to the
+carbon relays given with --carbon.  The metrics which cannot be sent to
+the relays are kept in the --spool-dir to be sent later.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import logging
+import os
+import sys
+
+from argparse import ArgumentParser
+from heapq import heappop, heappush
+from time import monotonic, sleep, time
+
+# The collectors and the libraries are installed next to this script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lib_carbon import CarbonSender, parse_destination
+from lib_spool import Spool
+from lib_runner import (
+    add_telemetry_arguments,
+    enable_resident,
+    load_collector,
+    read_jobs,
+    run_collector,
+)
+
+
+def parse_args():
+    parser = ArgumentParser()
+    parser.add_argument(
+        '--config', default='/etc/igcollect/igcollectd.conf',
+        help='INI file with one section for every collector to run',
+    )
+    parser.add_argument(
+        '--interval', type=float, default=60,
+        help='default interval in seconds between the runs of a collector',
+    )
+    parser.add_argument(
+        '--carbon', action='append', default=[],
+        help='carbon relay as host[:port] to send the metrics to instead of '
+        'the standard output, can be given multiple times for failover',
+    )
+    parser.add_argument(
+        '--carbon-protocol', choices=['plaintext', 'pickle'],
+        default='plaintext',
+    )
+    parser.add_argument(
+        '--spool-dir',
+        help='directory to keep the metrics in while the carbon relays are '
+        'not reachable',
+    )
+    parser.add_argument(
+        '--spool-size', type=int, default=100,
+        help='maximum size of the spool in MiB, the oldest metrics are '
+        'dropped above it',
+    )
+    parser.add_argument(
+        '--replay-rate', type=int, default=1000,
+        help='maximum number of metrics per second to send from the spool',
+    )
+    add_telemetry_arguments(parser)
+    parser.add_argument('--debug', '-d', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.WARNING,
+        format='%(name)s: %(message)s',
+    )
+
+    try:
+        jobs = read_jobs(args.config, interval=args.interval)
+    except ValueError as error:
+        print('Invalid configuration {}: {}'.format(args.config, error),
+              file=sys.stderr)
+        return 1
+    if not jobs:
+        print('No collectors configured in {}'.format(args.config),
+              file=sys.stderr)
+        return 1
+
+    enable_resident()
+    for job in jobs:
+        # Import errors should be noticed at the start, not after an interval
+        load_collector(job.module)
+
+    sender = None
+    if args.carbon:
+        spool = None
+        if args.spool_dir:
+            spool = Spool(args.spool_dir, args.spool_size * 1024 * 1024)
+        sender = CarbonSender(
+            [parse_destination(d, args.carbon_protocol) for d in args.carbon],
+            args.carbon_protocol,
+            spool=spool,
+            replay_rate=args.replay_rate,
+        )
+
+    schedule(jobs, sender, args.telemetry_prefix if args.telemetry else None)
+
+
+def schedule(jobs, sender=None, telemetry_prefix=None):
+    """Run the jobs forever keeping the interval of every one of them"""
+    queue = []
+    now = monotonic()
+    for job in jobs:
+        heappush(queue, (now, job))
+
+    while True:
+        due, job = heappop(queue)
+        delay = due - monotonic()
+        if delay > 0:
+            sleep(delay)
+
+        result = run_collector(job.module, job.argv, job.name)
+        if result.error:
+            logging.getLogger(__name__).error(
+                'Job %s failed: %s', job.name, result.error
+            )
+        write_lines(result.lines, sender)
+        if telemetry_prefix:
+            write_lines(
+                result.telemetry(telemetry_prefix, int(time())), sender
+            )
+
+        # Skip the missed runs instead of trying to catch up with them
+        due += job.interval
+        now = monotonic()
+        if due < now:
+            due += (now - due) // job.interval * job.interval + job.interval
+        heappush(queue, (due, job))
+
+
+def write_lines(lines, sender=None):
+    if not lines:
+        return
+
+    data = '\n'.join(lines) + '\n'
+    if sender is None:
+        sys.stdout.write(data)
+        sys.stdout.flush()
+    else:
+        sender.write(data.encode())
+        sender.flush()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
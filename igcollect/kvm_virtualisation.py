@@ -11,7 +11,6 @@ from os.path import isdir
 from re import sub as regexp_sub
 from subprocess import check_output
 from time import time
-import libvirt
 import xml.etree.ElementTree as ET
 
 # Keep this in sync with igvm!
@@ -27,6 +26,10 @@ def parse_args():
 
 def main():
     args = parse_args()
+    # libvirt is imported only after the arguments are parsed, because it
+    # is slow to import
+    import libvirt
+
     conn = libvirt.openReadOnly(None)
     now = str(int(time()))
     core2node = get_cpu_core_to_numa_node_mapping()
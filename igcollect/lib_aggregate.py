@@ -0,0 +1,272 @@
+"""igcollect - Streaming aggregation library
+
+The log collectors summarise the values of a period without keeping
+them.  An Aggregate needs constant memory however many values are added,
+and two of them can be merged, e.g. the ones of different seconds or of
+different files.
+
+The count, sum, minimum and maximum, and the number of the values above
+a threshold are exact.
+
+The quantiles are estimated with a sketch of logarithmically sized
+buckets [1].  For the relative accuracy a, a positive value v falls into
+the bucket i = ceil(log(v) / log(g)) with g = (1 + a) / (1 - a), and the
+bucket is represented by the value 2 * g^i / (g + 1).  The quantile q
+returned is therefore within the relative error a of the value of rank
+floor(q * (count - 1)) among the added values.  The default accuracy of
+1% needs about 1400 buckets to cover the values from 0.001 to 10^9.
+When the sketch has more than max_buckets buckets, the lowest ones are
+collapsed, so only the lowest quantiles lose their accuracy.
+
+The distribution counts the values in the buckets of the width 1 named
+after their integer parts.  It is exact, and its size is limited by the
+number of different integers.
+
+A Histogram counts the values in the buckets up to the given bounds in a
+list of fixed size, so the number of the buckets doesn't depend on the
+values.  log_bounds() returns the bounds growing like 1, 2, 5, 10, 20...
+
+[1] Masson, Rim, Lee: DDSketch: A Fast and Fully-Mergeable Quantile
+    Sketch with Relative-Error Guarantees, VLDB 2019
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from decimal import Decimal
+from math import ceil, floor, isfinite, log, log10
+
+
+class QuantileSketch(object):
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / log(self.gamma)
+        self.count = 0
+        self.zeros = 0
+        # Bucket index -> count, for the positive and the negative values
+        self.positive = {}
+        self.negative = {}
+
+    def add(self, value, count=1):
+        self.count += count
+        if value > 0:
+            store = self.positive
+            key = ceil(log(value) * self._multiplier)
+        elif value < 0:
+            store = self.negative
+            key = ceil(log(-value) * self._multiplier)
+        else:
+            self.zeros += count
+            return
+        if key in store:
+            store[key] += count
+        else:
+            self._add(store, key, count)
+
+    def merge(self, other):
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.positive.items():
+            self._add(self.positive, key, count)
+        for key, count in other.negative.items():
+            self._add(self.negative, key, count)
+
+    def quantile(self, q):
+        """Return the estimated value of the quantile or None if empty"""
+        if not self.count:
+            return None
+        rank = int(q * (self.count - 1))
+        seen = 0
+        # From the lowest value to the highest one
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def to_state(self):
+        return [
+            self.count, self.zeros,
+            list(self.positive.items()), list(self.negative.items()),
+        ]
+
+    def load_state(self, state):
+        self.count, self.zeros, positive, negative = state
+        self.positive = dict(positive)
+        self.negative = dict(negative)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _add(self, store, key, count):
+        store[key] = store.get(key, 0) + count
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        """Merge the lowest buckets to keep the size constant"""
+        if len(self.negative) > 1:
+            # The largest negative indexes hold the lowest values
+            store, lowest = self.negative, max
+        else:
+            store, lowest = self.positive, min
+        key = lowest(store)
+        count = store.pop(key)
+        key = lowest(store)
+        store[key] += count
+
+
+class Aggregate(object):
+    def __init__(self, threshold=None, quantiles=False, distribution=False,
+                 relative_accuracy=0.01, histogram=None):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        # The number of the values greater than or equal to the threshold
+        self.threshold = threshold
+        self.above = 0
+        self.sketch = None
+        if quantiles:
+            self.sketch = QuantileSketch(relative_accuracy)
+        self.distribution = Counter() if distribution else None
+        # The bounds of the buckets of the histogram
+        self.histogram = Histogram(histogram) if histogram else None
+
+    def add(self, value):
+        # The infinities and NaN of the broken lines would spoil the sum
+        # and cannot be put into the buckets
+        if not isfinite(value):
+            return
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.threshold is not None and value >= self.threshold:
+            self.above += 1
+        if self.sketch is not None:
+            self.sketch.add(value)
+        if self.distribution is not None:
+            self.distribution[int(value)] += 1
+        if self.histogram is not None:
+            self.histogram.add(value)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+        self.above += other.above
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        if self.distribution is not None:
+            self.distribution.update(other.distribution)
+        if self.histogram is not None:
+            self.histogram.merge(other.histogram)
+
+    def mean(self):
+        return self.sum / self.count
+
+    def quantile(self, q):
+        """Return the estimated quantile limited to the exact extremes"""
+        value = self.sketch.quantile(q)
+        if value is None:
+            return None
+        return min(max(value, self.min), self.max)
+
+    def to_state(self):
+        """Return the contents as a list which can be saved as JSON"""
+        return [
+            self.count, self.sum, self.min, self.max, self.above,
+            self.sketch.to_state() if self.sketch is not None else None,
+            list(self.distribution.items())
+            if self.distribution is not None else None,
+            self.histogram.to_state() if self.histogram is not None else None,
+        ]
+
+    def load_state(self, state):
+        (
+            self.count, self.sum, self.min, self.max, self.above, sketch,
+            distribution,
+        ) = state[:7]
+        if self.sketch is not None:
+            self.sketch.load_state(sketch)
+        if self.distribution is not None:
+            self.distribution = Counter(dict(distribution))
+        # The states saved before the histograms were added are shorter
+        if self.histogram is not None and len(state) > 7:
+            self.histogram.load_state(state[7])
+
+
+def log_bounds(minimum, maximum):
+    """Return the bounds 1, 2 and 5 times the powers of 10 in the range"""
+    bounds = []
+    exponent = floor(log10(minimum))
+    while True:
+        for mantissa in (1, 2, 5):
+            # Parsed to avoid the bounds like 0.30000000000000004
+            bound = float('{}e{}'.format(mantissa, exponent))
+            if bound > maximum:
+                return bounds
+            if bound >= minimum:
+                bounds.append(bound)
+        exponent += 1
+
+
+def format_bound(bound):
+    """Format the bound of a bucket to be used in the metric name"""
+    if bound == float('inf'):
+        return 'inf'
+    # The shortest exact representation, so the bounds cannot collide
+    formatted = '{:f}'.format(Decimal(repr(bound)))
+    if '.' in formatted:
+        formatted = formatted.rstrip('0').rstrip('.')
+    return formatted.replace('.', '_')
+
+
+class Histogram(object):
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        # The last bucket counts the values above all of the bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+    def cumulative(self):
+        """Return the bounds with the counts of the values up to them
+
+        The last bound is infinity, so its count is the count of all values.
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_state(self):
+        return list(self.counts)
+
+    def load_state(self, state):
+        self.counts = list(state)
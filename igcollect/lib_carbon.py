@@ -0,0 +1,286 @@
+"""igcollect - Carbon sender library
+
+This library sends the metrics directly to the carbon relays over
+persistent TCP connections instead of relying on an external pipe.  Both
+the batched plaintext and the pickle protocols are supported.  The sender
+behaves like a binary file, so the output of any collector can be written
+to it unchanged:
+
+    sender = CarbonSender([('carbon1', 2004), ('carbon2', 2004)], 'pickle')
+    with GraphiteEmitter('cpu', stream=sender) as emitter:
+        ...
+
+The first reachable destination is used.  A destination which fails is not
+tried again before its backoff expires, which doubles after every failure.
+
+With a spool, the metrics which couldn't be sent, because all destinations
+failed or were blocking longer than the timeout, are written to the local
+disk.  They are sent again after the connection recovers, limited to the
+given rate, so that the relays don't get the backlogs of all hosts at
+once.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import logging
+import socket
+
+from collections import deque
+from itertools import islice
+from pickle import dumps
+from select import select
+from struct import pack
+from time import monotonic
+
+# The unused replay rate is saved up to this many seconds
+REPLAY_BURST = 60
+
+DEFAULT_PORTS = {
+    'plaintext': 2003,
+    'pickle': 2004,
+}
+
+
+class Destination(object):
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.backoff = 0
+        self.retry_at = 0
+
+    def __str__(self):
+        return '{}:{}'.format(self.host, self.port)
+
+    def failed(self, min_backoff, max_backoff):
+        self.backoff = min(max(self.backoff * 2, min_backoff), max_backoff)
+        self.retry_at = monotonic() + self.backoff
+
+    def succeeded(self):
+        self.backoff = 0
+        self.retry_at = 0
+
+
+class CarbonSender(object):
+    def __init__(self, destinations, protocol='plaintext', batch_size=500,
+                 timeout=5, min_backoff=1, max_backoff=60,
+                 max_pending=100000, spool=None, replay_rate=1000):
+        if protocol not in DEFAULT_PORTS:
+            raise ValueError('Unknown protocol {}'.format(protocol))
+
+        self.destinations = [Destination(h, p) for h, p in destinations]
+        self.protocol = protocol
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        # Metrics waiting to be sent, the oldest ones are dropped when the
+        # destinations are not reachable for too long.
+        self.pending = deque(maxlen=max_pending)
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self._replay_allowance = 0
+        self._replay_checked = monotonic()
+        self._partial = b''
+        self._sock = None
+        self._current = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, data):
+        """Accept the plaintext lines as printed by the collectors"""
+        if isinstance(data, str):
+            data = data.encode()
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            metric = parse_line(line)
+            if metric:
+                self.pending.append(metric)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return len(data)
+
+    def send(self, metrics):
+        """Queue the (path, value, timestamp) tuples"""
+        self.pending.extend(metrics)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Send as many of the pending metrics as possible
+
+        Returns False, if the metrics couldn't be sent to any destination.
+        They are kept to be sent with the next flush, or moved to the spool.
+        """
+        while self.pending:
+            batch = list(islice(self.pending, self.batch_size))
+            if not self._send_batch(batch):
+                self._spool_pending()
+                return False
+            for _ in batch:
+                self.pending.popleft()
+        if self.spool is not None:
+            return self._replay()
+        return True
+
+    def close(self):
+        if self._partial:
+            self.write(b'\n')
+        self.flush()
+        self._disconnect()
+        if self.spool is not None:
+            self.spool.close()
+
+    def _spool_pending(self):
+        if self.spool is None:
+            return
+        self.spool.append(format_plaintext(self.pending).encode())
+        self.pending.clear()
+        # The replay starts over slowly after the connection recovers
+        self._replay_allowance = 0
+        self._replay_checked = monotonic()
+
+    def _replay(self):
+        """Send the metrics from the spool up to the replay rate"""
+        now = monotonic()
+        self._replay_allowance = min(
+            self._replay_allowance +
+            (now - self._replay_checked) * self.replay_rate,
+            self.replay_rate * REPLAY_BURST,
+        )
+        self._replay_checked = now
+
+        while self.spool.backlog and self._replay_allowance >= 1:
+            lines = self.spool.read(
+                min(self.batch_size, int(self._replay_allowance))
+            )
+            batch = [m for m in map(parse_line, lines) if m]
+            if batch and not self._send_batch(batch):
+                self._replay_allowance = 0
+                return False
+            self.spool.commit()
+            if not lines:
+                break
+            self._replay_allowance -= len(lines)
+        return True
+
+    def _send_batch(self, batch):
+        payload = self.encode(batch)
+        # Every destination is tried at most once for a single batch
+        for _ in range(len(self.destinations)):
+            sock = self._connect()
+            if sock is None:
+                return False
+            try:
+                sock.sendall(payload)
+            except OSError as error:
+                self._fail(error)
+                continue
+            return True
+        return False
+
+    def encode(self, batch):
+        if self.protocol == 'pickle':
+            payload = dumps(
+                [(path, (timestamp, float(value))) for path, value, timestamp
+                 in batch],
+                protocol=2,
+            )
+            return pack('!L', len(payload)) + payload
+
+        return format_plaintext(batch).encode()
+
+    def _connect(self):
+        if self._sock is not None:
+            if self._connection_alive():
+                return self._sock
+            self._disconnect()
+
+        now = monotonic()
+        for destination in self.destinations:
+            if destination.retry_at > now:
+                continue
+            try:
+                self._sock = socket.create_connection(
+                    (destination.host, destination.port), self.timeout
+                )
+            except OSError as error:
+                logging.getLogger(__name__).warning(
+                    'Cannot connect to %s: %s', destination, error
+                )
+                destination.failed(self.min_backoff, self.max_backoff)
+                continue
+            self._current = destination
+            destination.succeeded()
+            return self._sock
+        return None
+
+    def _connection_alive(self):
+        """Carbon never sends anything, so readable means closed"""
+        try:
+            readable, _, _ = select([self._sock], [], [], 0)
+            return not readable or self._sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return False
+
+    def _fail(self, error):
+        logging.getLogger(__name__).warning(
+            'Sending to %s failed: %s', self._current, error
+        )
+        self._current.failed(self.min_backoff, self.max_backoff)
+        self._disconnect()
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._current = None
+
+
+def parse_line(line):
+    """Parse a plaintext line into (path, value, timestamp) tuple
+
+    The value is kept as it was written, so that it is sent on unchanged
+    without losing the precision of the large counters.
+    """
+    parts = line.split()
+    if len(parts) != 3:
+        if parts:
+            logging.getLogger(__name__).warning('Invalid line %r', line)
+        return None
+    path, value, timestamp = parts
+    try:
+        float(value)
+        return path.decode(), value.decode(), int(float(timestamp))
+    except ValueError:
+        logging.getLogger(__name__).warning('Invalid line %r', line)
+        return None
+
+
+def format_plaintext(metrics):
+    """Format the (path, value, timestamp) tuples as plaintext lines"""
+    return ''.join(
+        '{} {} {}\n'.format(path, value, timestamp)
+        for path, value, timestamp in metrics
+    )
+
+
+def parse_destination(arg, protocol='plaintext'):
+    """Parse host[:port] into a tuple using the default port of protocol
+
+    The IPv6 addresses need the brackets like [::1]:2003 to have a port.
+    """
+    if arg.startswith('['):
+        host, sep, port = arg[1:].partition(']:')
+        if sep and port.isdigit():
+            return host, int(port)
+        return arg.strip('[]'), DEFAULT_PORTS[protocol]
+    if arg.count(':') == 1:
+        host, port = arg.split(':')
+        if port.isdigit():
+            return host, int(port)
+    return arg, DEFAULT_PORTS[protocol]
@@ -0,0 +1,68 @@
+"""igcollect - Graphite output library
+
+The collectors used to print() every metric separately.  The emitter
+formats the lines into a bytes buffer instead, and writes them with as few
+system calls as possible.  It is used as a context manager to make sure
+everything is written at the end:
+
+    with GraphiteEmitter('cpu', int(time())) as emitter:
+        emitter.emit('user', 42)
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import sys
+
+from time import time
+
+
+class GraphiteEmitter(object):
+    def __init__(self, prefix='', timestamp=None, stream=None,
+                 buffer_size=65536):
+        # The parts which are the same on every line are encoded only once
+        self._prefix = (prefix + '.').encode() if prefix else b''
+        if timestamp is None:
+            timestamp = int(time())
+        self._suffix = ' {}\n'.format(timestamp).encode()
+        self._stream = stream
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self.lines = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def emit(self, path, value, timestamp=None):
+        """Add a single metric to the buffer"""
+        buf = self._buffer
+        buf += self._prefix
+        if timestamp is None:
+            buf += '{} {}'.format(path, value).encode()
+            buf += self._suffix
+        else:
+            buf += '{} {} {}\n'.format(path, value, timestamp).encode()
+        self.lines += 1
+
+        if len(buf) >= self._buffer_size:
+            self.flush()
+
+    def emit_many(self, metrics):
+        """Add the (path, value, timestamp) tuples to the buffer"""
+        for path, value, timestamp in metrics:
+            self.emit(path, value, timestamp)
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        stream = self._stream
+        if stream is None:
+            # Keep the order with the lines which are still printed
+            sys.stdout.flush()
+            stream = sys.stdout.buffer
+        stream.write(self._buffer)
+        stream.flush()
+        del self._buffer[:]
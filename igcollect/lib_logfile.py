@@ -0,0 +1,350 @@
+"""igcollect - Log file library
+
+The log collectors either read the log files backwards from the end until
+they reach the beginning of the period they report, or they continue
+reading from the position they stopped at on their previous run.
+
+LogTail remembers the position as the inode and the byte offset.  When
+the file was rotated, the rest of the rotated file is read before starting
+with the new one.  The rotated file is found by its inode next to the log
+file, so it must not be compressed before the next run.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import json
+import logging
+import os
+import re
+
+from datetime import datetime
+from mmap import mmap, ACCESS_READ
+from os.path import basename, dirname, join
+
+# The smaller files are read from the start instead of searching them
+SEEK_MIN_SIZE = 1024 * 1024
+
+# The strptime formats which fromisoformat() can parse much faster
+_iso_formats = {
+    date + separator + '%H:%M:%S' + fraction + zone
+    for date in ('%Y-%m-%d', )
+    for separator in ('T', ' ')
+    for fraction in ('', '.%f')
+    for zone in ('', '%z', 'Z')
+}
+
+# The key=value pairs of logfmt with the values optionally quoted
+_logfmt_pair = re.compile(r'([^\s="]+)=("(?:[^"\\]|\\.)*"|[^\s"]*)')
+_logfmt_value = re.compile(r'\S*')
+
+
+class LogTail(object):
+    def __init__(self, filename, inode=None, offset=0, buf_size=65536):
+        self.filename = filename
+        self.inode = inode
+        self.offset = offset
+        self.buf_size = buf_size
+
+    def __iter__(self):
+        """Yield the lines appended since the position and move it
+
+        Only the complete lines are returned, an incomplete last line is
+        returned with the next run after it was completed.
+        """
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return
+
+        if self.inode is not None and self.inode != stat.st_ino:
+            rotated = self._find_rotated()
+            if rotated is None:
+                logging.getLogger(__name__).warning(
+                    'Rotated file of %s is not found, lines may be lost',
+                    self.filename,
+                )
+            else:
+                yield from self._read(rotated, self.offset, complete=False)
+            self.offset = 0
+        elif stat.st_size < self.offset:
+            # The file was truncated e.g. by logrotate's copytruncate
+            self.offset = 0
+
+        self.inode = stat.st_ino
+        yield from self._read(self.filename, self.offset)
+
+    def seek_end(self):
+        """Move the position after the last complete line of the file"""
+        with open(self.filename, 'rb') as fh:
+            self.inode = os.fstat(fh.fileno()).st_ino
+            position = fh.seek(0, os.SEEK_END)
+            while position > 0:
+                size = min(self.buf_size, position)
+                position -= size
+                fh.seek(position)
+                index = fh.read(size).rfind(b'\n')
+                if index >= 0:
+                    self.offset = position + index + 1
+                    return
+            self.offset = 0
+
+    def _find_rotated(self):
+        directory = dirname(self.filename) or '.'
+        name = basename(self.filename)
+        for entry in sorted(os.listdir(directory)):
+            if not entry.startswith(name + '.') or entry.endswith('.gz'):
+                continue
+            path = join(directory, entry)
+            try:
+                if os.stat(path).st_ino == self.inode:
+                    return path
+            except OSError:
+                continue
+        return None
+
+    def _read(self, filename, offset, complete=True):
+        partial = b''
+        with open(filename, 'rb') as fh:
+            fh.seek(offset)
+            while True:
+                data = fh.read(self.buf_size)
+                if not data:
+                    break
+                lines = (partial + data).split(b'\n')
+                partial = lines.pop()
+                for line in lines:
+                    offset += len(line) + 1
+                    self.offset = offset
+                    yield line.decode(errors='replace')
+        if partial and not complete:
+            yield partial.decode(errors='replace')
+
+
+def read_lines_reverse(filename, end=None, buf_size=65536):
+    """Yield the lines of the file from the last one to the first one
+
+    The empty lines are skipped.  The reading starts at the end of the
+    file or at the given offset.
+    """
+    with open(filename, 'rb') as fh:
+        position = fh.seek(0, os.SEEK_END)
+        if end is not None:
+            position = min(position, end)
+        partial = b''
+        while position > 0:
+            size = min(buf_size, position)
+            position -= size
+            fh.seek(position)
+            lines = (fh.read(size) + partial).split(b'\n')
+            # The first line may continue in the previous block
+            partial = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line.decode(errors='replace')
+        if partial:
+            yield partial.decode(errors='replace')
+
+
+def seek_timestamp(filename, timestamp, parse, slack=0,
+                   min_size=SEEK_MIN_SIZE):
+    """Return the offset of a line before the given timestamp
+
+    The lines of the file are assumed to be sorted by their timestamps
+    with the deviations up to the slack seconds, so the lines before the
+    returned offset are all older than the timestamp.  The offset is
+    found by bisecting the file, so only a few pages around the probed
+    offsets are read.  The parse function should return the timestamp
+    of the line given as bytes, or None if the line has none.  The files
+    smaller than min_size are not searched.
+    """
+    size = os.path.getsize(filename)
+    if size < min_size:
+        return 0
+
+    threshold = timestamp - slack
+    with open(filename, 'rb') as fh, mmap(fh.fileno(), 0,
+                                          access=ACCESS_READ) as mm:
+        low, high = 0, size
+        while high - low > 4096:
+            middle = (low + high) // 2
+            probed = _first_timestamp(mm, middle, high, parse)
+            if probed is None or probed >= threshold:
+                high = middle
+            else:
+                low = middle
+        if low == 0:
+            return 0
+        return mm.find(b'\n', low - 1) + 1 or size
+
+
+def _first_timestamp(mm, start, end, parse):
+    """Return the timestamp of the first line starting after start"""
+    position = mm.find(b'\n', start, end)
+    while 0 <= position < end:
+        line_end = mm.find(b'\n', position + 1)
+        if line_end < 0:
+            line_end = len(mm)
+        timestamp = parse(mm[position + 1:line_end])
+        if timestamp is not None:
+            return timestamp
+        position = line_end if line_end < end else -1
+    return None
+
+
+def extract_json_fields(line, keys):
+    """Return the values of the keys found in the JSON object of the line
+
+    Only the given keys are searched for instead of decoding the whole
+    object.  The values are returned as strings, the strings without their
+    quotes.  The keys of the nested objects are found too, so the keys
+    should be unique within the line.
+    """
+    fields = {}
+    for key in keys:
+        needle = '"' + key + '"'
+        index = line.find(needle)
+        while index >= 0:
+            position = _skip_spaces(line, index + len(needle))
+            # The same text within a string value has its quotes escaped
+            if (
+                line.startswith(':', position) and
+                (index == 0 or line[index - 1] != '\\')
+            ):
+                value = _json_value(line, _skip_spaces(line, position + 1))
+                if value is not None:
+                    fields[key] = value
+                break
+            index = line.find(needle, index + 1)
+    return fields
+
+
+def _skip_spaces(line, position):
+    while line[position:position + 1].isspace():
+        position += 1
+    return position
+
+
+def _json_value(line, position):
+    if not line.startswith('"', position):
+        end = position
+        while end < len(line) and line[end] not in ',}] \t\r\n':
+            end += 1
+        return line[position:end] or None
+
+    end = position
+    while True:
+        end = line.find('"', end + 1)
+        if end < 0:
+            return None
+        backslashes = 0
+        while line[end - 1 - backslashes] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 0:
+            break
+    value = line[position + 1:end]
+    if '\\' in value:
+        value = json.loads(line[position:end + 1])
+    return value
+
+
+def extract_logfmt_fields(line, keys):
+    """Return the values of the keys found in the logfmt line
+
+    The quoted values may contain spaces and escaped quotes.  Without
+    them, only the given keys are searched for.
+    """
+    fields = {}
+    if '"' not in line:
+        for key in keys:
+            needle = key + '='
+            index = line.find(needle)
+            while index > 0 and not line[index - 1].isspace():
+                index = line.find(needle, index + 1)
+            if index >= 0:
+                fields[key] = _logfmt_value.match(
+                    line, index + len(needle)
+                ).group()
+        return fields
+
+    pairs = dict(_logfmt_pair.findall(line))
+    for key in keys:
+        value = pairs.get(key)
+        if value is not None:
+            if value.startswith('"'):
+                value = re.sub(r'\\(.)', r'\1', value[1:-1])
+            fields[key] = value
+    return fields
+
+
+class TimestampParser(object):
+    """Convert the timestamps of the log lines to epoch seconds
+
+    The ISO 8601 timestamps, including the RFC 3339 ones of syslog, are
+    parsed with fromisoformat() instead of strptime().  The special formats
+    "epoch" and "epoch_ms" accept the seconds or the milliseconds since the
+    epoch.  Any other format and the strings which cannot be parsed this
+    way are passed to the fallback function.
+
+    The results are memorised per second, because the consecutive lines
+    usually share it.  The fraction of the second is ignored for the ISO
+    timestamps, so they are looked up with the string without it.
+    """
+
+    def __init__(self, time_format, fallback, memo_size=4096):
+        self.time_format = time_format
+        self.fallback = fallback
+        self.memo_size = memo_size
+        self._memo = {}
+        if time_format == 'epoch':
+            self._parse = self._parse_epoch
+        elif time_format == 'epoch_ms':
+            self._parse = self._parse_epoch_ms
+        elif time_format in _iso_formats:
+            self._parse = self._parse_iso
+        else:
+            self._parse = self._parse_fallback
+
+    def __call__(self, time_str):
+        return self._parse(time_str)
+
+    def _parse_epoch(self, time_str):
+        try:
+            return int(float(time_str))
+        except ValueError:
+            return self.fallback(time_str)
+
+    def _parse_epoch_ms(self, time_str):
+        try:
+            return int(float(time_str) // 1000)
+        except ValueError:
+            return self.fallback(time_str)
+
+    def _parse_iso(self, time_str):
+        # Drop the fraction of the second keeping the time zone
+        if time_str[19:20] == '.':
+            key = time_str[:19] + time_str[20:].lstrip('0123456789')
+        else:
+            key = time_str
+        timestamp = self._memo.get(key)
+        if timestamp is None:
+            try:
+                if key.isdigit():
+                    raise ValueError('Not an ISO 8601 timestamp')
+                timestamp = int(datetime.fromisoformat(key).timestamp())
+            except ValueError:
+                # Older Python versions don't support all of ISO 8601
+                timestamp = self.fallback(time_str)
+            self._remember(key, timestamp)
+        return timestamp
+
+    def _parse_fallback(self, time_str):
+        timestamp = self._memo.get(time_str)
+        if timestamp is None:
+            timestamp = self.fallback(time_str)
+            self._remember(time_str, timestamp)
+        return timestamp
+
+    def _remember(self, key, timestamp):
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[key] = timestamp
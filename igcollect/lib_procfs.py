@@ -0,0 +1,101 @@
+"""igcollect - procfs and sysfs library
+
+The Linux collectors read the pseudo-files under /proc and /sys.  They
+can be pointed to a different root directory with the IGCOLLECT_ROOT
+environment variable, so that a captured copy of those files can be
+replayed in the tests.
+
+The pseudo-files are generated by the kernel on every read from the
+start, so they don't need to be reopened to get the current values.  The
+ProcReader keeps them open, and rereads them with a single pread() into
+the same buffer.  It is kept between the runs by the daemon, so the
+collectors don't open and close the same files every time.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import os
+
+from lib_runner import resident
+
+ROOT_ENV = 'IGCOLLECT_ROOT'
+
+
+def root_path(path):
+    """Return the absolute path under the root directory"""
+    root = os.environ.get(ROOT_ENV)
+    if not root:
+        return path
+    return os.path.join(root, path.lstrip('/'))
+
+
+class ProcReader(object):
+    def __init__(self, buffer_size=4096):
+        self._fds = {}
+        self._used = set()
+        self._buf = bytearray(buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+        self._used = set()
+
+    def sweep(self):
+        """Close the files which were not read since the last sweep
+
+        It stops keeping the files of the removed devices open forever.
+        """
+        for path in list(self._fds):
+            if path not in self._used:
+                os.close(self._fds.pop(path))
+        self._used = set()
+
+    def read(self, path):
+        """Return the contents of the file as bytes"""
+        size = self._read(path)
+        return bytes(self._buf[:size])
+
+    def read_int(self, path):
+        """Return the contents of the file holding a single integer"""
+        # The integers are parsed from the bytes with the surrounding
+        # whitespace without being decoded first.
+        size = self._read(path)
+        return int(self._buf[:size])
+
+    def _read(self, path):
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = self._fds[path] = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        self._used.add(path)
+
+        try:
+            size = os.preadv(fd, [self._buf], 0)
+        except OSError:
+            # The device of the file may have been removed and added again,
+            # so reopen the file once before giving up.
+            os.close(self._fds.pop(path))
+            fd = self._fds[path] = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+            size = os.preadv(fd, [self._buf], 0)
+
+        # The file may have been truncated by the small buffer
+        while size == len(self._buf):
+            self._buf = bytearray(len(self._buf) * 2)
+            size = os.preadv(fd, [self._buf], 0)
+        return size
+
+
+def get_proc_reader(name):
+    """Return the reader of the collector kept open by the daemon
+
+    The files the collector didn't read on its previous run are closed.
+    """
+    reader = resident(('procfs', name), ProcReader)
+    reader.sweep()
+    return reader
@@ -0,0 +1,287 @@
+"""igcollect - Collector runner library
+
+The collector scripts are written to be executed once per interval as
+separate processes.  This library allows to import them once and call their
+unchanged main() entry points repeatedly from a long-running process.  The
+output printed by the collector is captured and returned to the caller.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import logging
+import os
+import resource
+import signal
+import sys
+
+from contextlib import redirect_stdout
+from importlib import import_module
+from io import BytesIO, TextIOWrapper
+from shlex import split
+from time import monotonic, perf_counter
+
+
+# Objects kept alive between the runs of the collectors.  It stays None
+# unless a long-running process enables it, so that the collectors executed
+# as standalone scripts behave exactly like before.
+_resident = None
+
+
+class Job(object):
+    def __init__(self, name, module, argv=(), interval=None, timeout=None):
+        self.name = name
+        self.module = module
+        self.argv = list(argv)
+        self.interval = interval
+        self.timeout = timeout
+
+    def __lt__(self, other):
+        return self.name < other.name
+
+
+class CollectorResult(object):
+    def __init__(self, name):
+        self.name = name
+        self.lines = []
+        self.error = None
+        self.errors = 0
+        self.wall_time = 0
+        self.cpu_time = 0
+        self.max_rss = 0
+
+    def telemetry(self, prefix, timestamp):
+        """Return the lines describing the cost of the run
+
+        The peak RSS is the maximum of the whole process, so it is only
+        meaningful for the collectors running in their own processes.
+        """
+        template = '{}.{}.{{}} {{}} {}'.format(
+            prefix, self.name.replace('.', '_').replace(' ', '_'), timestamp
+        )
+        return [
+            template.format('wall_time', round(self.wall_time, 6)),
+            template.format('cpu_time', round(self.cpu_time, 6)),
+            template.format('max_rss', self.max_rss),
+            template.format('lines', len(self.lines)),
+            template.format('errors', self.errors),
+        ]
+
+
+class ErrorCounter(logging.Handler):
+    """Count the errors logged by the collector"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        if record.name != __name__:
+            self.count += 1
+
+
+def enable_resident():
+    """Keep the objects registered with resident() between the runs"""
+    global _resident
+
+    if _resident is None:
+        _resident = {}
+
+
+def resident(key, factory, alive=None):
+    """Return an object which can be reused by the following runs
+
+    The factory is called to create the object when it doesn't exist yet,
+    or the optional alive callback reports that it cannot be used anymore
+    e.g. because the connection is closed.  Without enable_resident() being
+    called first, a new object is created every time.
+    """
+    if _resident is None:
+        return factory()
+
+    obj = _resident.get(key)
+    if obj is None or (alive is not None and not alive(obj)):
+        obj = _resident[key] = factory()
+    return obj
+
+
+def load_collector(name):
+    """Import the collector module only once"""
+    return import_module(name)
+
+
+def read_jobs(filename, interval=None, timeout=None):
+    """Read the jobs from the INI file with one section for each
+
+    The module defaults to the name of the section.  The interval and
+    timeout options default to the given values.  ValueError is raised
+    for the intervals which are not positive.
+    """
+    from configparser import ConfigParser
+
+    config = ConfigParser()
+    if not config.read(filename):
+        raise OSError('Cannot read configuration file {}'.format(filename))
+
+    jobs = []
+    for section in config.sections():
+        job = Job(
+            section,
+            config.get(section, 'module', fallback=section),
+            split(config.get(section, 'args', fallback='')),
+            config.getfloat(section, 'interval', fallback=interval),
+            config.getfloat(section, 'timeout', fallback=timeout),
+        )
+        # The scheduler would run the job in a busy loop
+        if job.interval is not None and job.interval <= 0:
+            raise ValueError('Interval of {} must be positive, not {}'.format(
+                section, job.interval
+            ))
+        jobs.append(job)
+    return jobs
+
+
+def parse_job(spec):
+    """Parse the job from a string like "linux_cpu --prefix cpu" """
+    argv = split(spec)
+    return Job(argv[0], argv[0], argv[1:])
+
+
+def run_collector(name, argv=(), job=None):
+    """Call main() of the collector and capture its output
+
+    The arguments are passed through sys.argv, so the parse_args() function
+    of the collector doesn't need to be changed.  The collector is not
+    allowed to terminate the running process.
+    """
+    result = CollectorResult(job or name)
+    module = load_collector(name)
+
+    buf = BytesIO()
+    stream = TextIOWrapper(buf, encoding='utf-8', write_through=True)
+    saved_argv = sys.argv
+    sys.argv = [module.__file__] + list(argv)
+    error_counter = ErrorCounter()
+    logging.getLogger().addHandler(error_counter)
+    cpu_start = _cpu_time()
+    wall_start = perf_counter()
+    try:
+        with redirect_stdout(stream):
+            ret = module.main()
+        if ret:
+            result.error = 'returned {}'.format(ret)
+    except SystemExit as e:
+        if e.code:
+            result.error = 'exited with {}'.format(e.code)
+    except Exception as e:
+        logging.getLogger(__name__).exception('Collector %s failed', name)
+        result.error = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        sys.argv = saved_argv
+        stream.flush()
+        logging.getLogger().removeHandler(error_counter)
+
+    result.wall_time = perf_counter() - wall_start
+    result.cpu_time = _cpu_time() - cpu_start
+    result.max_rss = _max_rss()
+    result.errors = error_counter.count + bool(result.error)
+    result.lines = buf.getvalue().decode('utf-8').splitlines()
+    return result
+
+
+def _cpu_time():
+    """Return the CPU time of the process including the subprocesses"""
+    total = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def _max_rss():
+    """Return the peak resident set size of the process in bytes"""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # It is reported in bytes on macOS and in kilobytes everywhere else
+    if sys.platform != 'darwin':
+        max_rss *= 1024
+    return max_rss
+
+
+def add_telemetry_arguments(parser):
+    parser.add_argument(
+        '--telemetry', action='store_true',
+        help='report the wall time, CPU time, peak RSS, number of lines and '
+        'errors of every collector run',
+    )
+    parser.add_argument('--telemetry-prefix', default='igcollect')
+
+
+def run_parallel(jobs, workers=4, timeout=60):
+    """Run the jobs in separate processes and yield the results
+
+    The results are yielded in the order the jobs finish.  A job running
+    longer than its timeout is killed together with the processes it
+    started, and yielded with an error and without any lines.
+    """
+    # The collectors importing this library don't need these
+    from multiprocessing import get_context
+    from multiprocessing.connection import wait
+
+    context = get_context('fork')
+    pending = list(reversed(jobs))
+    running = {}  # Connection -> (job, process, deadline)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            job = pending.pop()
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_child, args=(job, writer), daemon=True
+            )
+            process.start()
+            writer.close()
+            deadline = monotonic() + (job.timeout or timeout)
+            running[reader] = (job, process, deadline)
+
+        next_deadline = min(d for _, _, d in running.values())
+        ready = wait(list(running), max(next_deadline - monotonic(), 0))
+        for reader in ready:
+            job, process, _ = running.pop(reader)
+            try:
+                result = reader.recv()
+            except EOFError:
+                process.join()
+                result = CollectorResult(job.name)
+                result.error = 'terminated with {}'.format(process.exitcode)
+                result.errors = 1
+            reader.close()
+            process.join()
+            yield result
+
+        now = monotonic()
+        for reader, (job, process, deadline) in list(running.items()):
+            if deadline > now:
+                continue
+            del running[reader]
+            _kill(process)
+            reader.close()
+            result = CollectorResult(job.name)
+            result.error = 'timed out after {}s'.format(job.timeout or timeout)
+            result.errors = 1
+            result.wall_time = now - deadline + (job.timeout or timeout)
+            yield result
+
+
+def _run_child(job, writer):
+    # Start a new process group to be able to kill the subprocesses too
+    os.setpgrp()
+    writer.send(run_collector(job.module, job.argv, job.name))
+    writer.close()
+
+
+def _kill(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # The child has not started its process group yet
+        process.kill()
+    process.join(5)
@@ -1,106 +1,212 @@
 """igcollect - SNMP common library
-"""
 
+pysnmp takes a long time to import, so it is imported only when SNMP is
+actually used, not for parsing the arguments.
 
-from pysnmp import proto
-from pysnmp.entity.rfc3413.oneliner import cmdgen
-from pysnmp.entity.rfc3413.oneliner.cmdgen import (
-    CommunityData,
-    UsmUserData,
-    usmHMACSHAAuthProtocol,
-    usmAesCfb128Protocol,
-    usmDESPrivProtocol,
-)
+The collectors poll the devices through poll_devices().  It polls many
+hosts concurrently in one process with the asyncio API of pysnmp, which
+works with pysnmp 6 and newer.  The tables are walked with one GETBULK
+request per round trip, and the requests of the tables of a host are
+sent in parallel up to --max-requests.
+"""
 
 
 class IgCollectSNMPException(Exception):
     pass
 
 
-# Predefine some variables, it makes this program run a bit faster.
-cmd_gen = cmdgen.CommandGenerator()
-
-
-def get_snmp_connection(args):
-    """ Prepare SNMP transport agent.
+def get_auth_data(args):
+    """ Return the authentication data for SNMP v2c or v3
 
-        Connection over SNMP v2c and v3 is supported.
         The choice of authentication and privacy algorithms for v3 is
         arbitrary, matching what our switches can do.
     """
+    from pysnmp.hlapi import asyncio as hlapi
 
     if args.community:
-        auth_data = CommunityData(args.community, mpModel=1)
-    else:
-        if args.priv_proto == 'des':
-            priv_proto = usmDESPrivProtocol
-        if args.priv_proto == 'aes':
-            priv_proto = usmAesCfb128Protocol
-        else:
-            raise IgCollectSNMPException(f'Unsupported privacy protocol {args.priv_prot}')
+        return hlapi.CommunityData(args.community, mpModel=1)
 
-        auth_data = UsmUserData(
-            args.user, args.auth, args.priv,
-            authProtocol=usmHMACSHAAuthProtocol,
-            privProtocol=priv_proto,
+    if args.priv_proto == 'des':
+        priv_proto = hlapi.usmDESPrivProtocol
+    elif args.priv_proto == 'aes':
+        priv_proto = hlapi.usmAesCfb128Protocol
+    else:
+        raise IgCollectSNMPException(
+            f'Unsupported privacy protocol {args.priv_proto}'
         )
 
-    transport_target = cmdgen.UdpTransportTarget((args.host, 161))
+    return hlapi.UsmUserData(
+        args.user, args.auth, args.priv,
+        authProtocol=hlapi.usmHMACSHAAuthProtocol,
+        privProtocol=priv_proto,
+    )
 
-    return {
-        'auth_data': auth_data,
-        'transport_target': transport_target,
-    }
 
+def split_host(host):
+    """ Return the address of the host with the port, by default 161 """
+    if host.count(':') == 1:
+        host, port = host.split(':')
+        return host, int(port)
+    return host, 161
 
-def get_snmp_value(snmp, OID):
-    """ Get a single value from SNMP """
 
-    errorIndication, errorStatus, errorIndex, varBinds = cmd_gen.getCmd(
-        snmp['auth_data'],
-        snmp['transport_target'],
-        OID,
-    )
-    if errorIndication:
-        raise IgCollectSNMPException(f'Unable to get SNMP value: {errorIndication}')
+def get_host_prefix(prefix, host, multiple):
+    """ Return the Graphite prefix of the host
 
-    return convert_snmp_type(varBinds)
+        "{host}" in the prefix is replaced with the host.  The host is
+        appended to the prefixes without it when polling multiple hosts.
+    """
+    if multiple and '{host}' not in prefix:
+        prefix += '.{host}'
+    return prefix.replace('{host}', host)
 
 
-def get_snmp_table(snmp, OID):
-    """ Fetch a table from SNMP.
+class SNMPDevice:
+    """ Host polled by a coroutine of poll_devices()
 
-        Returned is a dictionary mapping the last number of OID (converted to
-        Python integer) to value (converted to int or str).
+        At most max_requests requests to the host are in flight at the same
+        time, the rest wait for them.
     """
-    ret = {}
-    errorIndication, errorStatus, errorIndex, varBindTable = cmd_gen.bulkCmd(
-        snmp['auth_data'],
-        snmp['transport_target'],
-        0,  # nonRepeaters
-        25,
-        OID,
-    )
-    for varBind in varBindTable:
-        # Oh the joy of pysnmp library!
-        # When the nonrepeaters value above is 0, we might get objects from
-        # another snmp tree on some hardware, for example from cisco routers.
-        # we can set it to 1 but then we have high cpu usage. So keep it 0
-        # and manually check if we are still in the same tree.
-        # OIDs we query for must not start with a dot.
-        if not str(varBind[0][0]).startswith(OID):
-            break
-        if errorIndication:
-            raise IgCollectSNMPException(f'Unable to get SNMP value: {errorIndication}')
 
-        index = int(str(varBind[0][0][-1:]))
-        ret[index] = convert_snmp_type(varBind)
+    def __init__(self, engine, auth_data, host, max_requests):
+        import asyncio
+
+        self.engine = engine
+        self.auth_data = auth_data
+        self.host = host
+        self.semaphore = asyncio.Semaphore(max_requests)
+        self.transport_target = None
+
+    async def open(self):
+        """ Resolve the address of the host """
+        from pysnmp.hlapi import asyncio as hlapi
+
+        target_class = hlapi.UdpTransportTarget
+        if hasattr(target_class, 'create'):
+            self.transport_target = await target_class.create(
+                split_host(self.host)
+            )
+        else:
+            self.transport_target = target_class(split_host(self.host))
+
+    async def request(self, command, OID, *args):
+        """ Send the request when less than max_requests are in flight """
+        async with self.semaphore:
+            return await self.send(command, OID, *args)
 
-    return ret
+    async def send(self, command, OID, *args):
+        """ Send a "get" or "bulk" request -> list of the names and values
+
+            The names are the tuples of the numbers of the OIDs, the values
+            are converted by convert_snmp_type().
+        """
+        from pysnmp.hlapi import asyncio as hlapi
+
+        if command == 'get':
+            function = getattr(hlapi, 'get_cmd', None) or hlapi.getCmd
+        else:
+            function = getattr(hlapi, 'bulk_cmd', None) or hlapi.bulkCmd
+        errorIndication, errorStatus, errorIndex, varBinds = await function(
+            self.engine,
+            self.auth_data,
+            self.transport_target,
+            hlapi.ContextData(),
+            *args,
+            hlapi.ObjectType(hlapi.ObjectIdentity(OID)),
+            lookupMib=False,
+        )
+        if errorIndication or errorStatus:
+            raise IgCollectSNMPException(
+                f'Unable to get SNMP value from {self.host}: '
+                f'{errorIndication or errorStatus.prettyPrint()}'
+            )
+        ret = []
+        for varBind in varBinds:
+            # The older versions return a row for every repetition
+            if isinstance(varBind, list):
+                varBind = varBind[0]
+            ret.append((tuple(varBind[0]), convert_snmp_type([varBind])))
+        return ret
+
+    async def get_value(self, OID):
+        """ Get a single value from SNMP """
+        return (await self.request('get', OID))[0][1]
+
+    async def get_table(self, OID):
+        """ Fetch a table from SNMP walking it with GETBULK requests
+
+            Returned is a dictionary mapping the last number of OID (converted
+            to Python integer) to value (converted to int or str).
+        """
+        # The subtree is compared by the numbers, so that "1.10" is not
+        # within "1.1" and the OIDs may start with a dot
+        root = tuple(int(x) for x in OID.strip('.').split('.'))
+        last = root
+        ret = {}
+        while True:
+            results = await self.request(
+                'bulk', '.'.join(str(x) for x in last), 0, 25
+            )
+            if not results:
+                return ret
+            for name, value in results:
+                # The agent returns the same OID at the end of the MIB
+                if name[:len(root)] != root or name <= last:
+                    return ret
+                ret[name[-1]] = value
+                last = name
+
+    async def get_tables(self, OIDs):
+        """ Fetch the tables concurrently -> list of the tables """
+        import asyncio
+
+        return await asyncio.gather(*(self.get_table(x) for x in OIDs))
+
+
+def poll_devices(hosts, args, poll):
+    """ Run the poll coroutine for every host concurrently
+
+        The coroutine is called with the SNMPDevice of the host.  The hosts
+        are independent: the exception raised by one of them is returned
+        as its result.  Returned is a dictionary mapping the hosts to the
+        results of the coroutine.
+    """
+    import asyncio
+
+    return asyncio.run(_poll_devices(hosts, args, poll))
+
+
+async def _poll_devices(hosts, args, poll):
+    import asyncio
+    from pysnmp.hlapi import asyncio as hlapi
+
+    engine = hlapi.SnmpEngine()
+    auth_data = get_auth_data(args)
+    devices = [
+        SNMPDevice(engine, auth_data, host, args.max_requests)
+        for host in hosts
+    ]
+    try:
+        results = await asyncio.gather(
+            *(_poll_device(device, poll) for device in devices),
+            return_exceptions=True,
+        )
+    finally:
+        if hasattr(engine, 'close_dispatcher'):
+            engine.close_dispatcher()
+        else:
+            engine.transportDispatcher.closeDispatcher()
+    return dict(zip(hosts, results))
+
+
+async def _poll_device(device, poll):
+    await device.open()
+    return await poll(device)
 
 
 def convert_snmp_type(varBinds):
     """ Convert SNMP data types to something more convenient: int or str """
+    from pysnmp import proto
 
     val = varBinds[0][1]
     if type(val) in [
@@ -123,4 +229,8 @@ def add_snmp_arguments(parser):
         '--priv_proto',
         help='SNMPv3 privacy protocol: aes (default) or des',
         default='aes'
+    )
+    parser.add_argument(
+        '--max-requests', type=int, default=4,
+        help='maximum number of the concurrent SNMP requests to a host',
     )
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""igcollect - Spool library
+
+The spool keeps the lines which could not be sent in a directory on the
+local disk, until they can be sent again.  The lines are appended to the
+segment files, which are rotated when they reach their size.  The oldest
+segments are dropped, when the spool grows over its size.  The position
+of the oldest line not yet sent is kept in a file too, so the backlog
+survives the restarts.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import logging
+import os
+
+from fcntl import flock, LOCK_EX, LOCK_NB
+from struct import Struct
+
+_position = Struct('<QQ')
+
+
+class Spool(object):
+    def __init__(self, directory, max_size=100 * 1024 * 1024,
+                 segment_size=4 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.segment_size = segment_size
+        self.size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._position_fd = os.open(
+            os.path.join(directory, 'position'), os.O_RDWR | os.O_CREAT, 0o644
+        )
+        try:
+            # Only one process can use the spool at a time
+            flock(self._position_fd, LOCK_EX | LOCK_NB)
+        except OSError:
+            os.close(self._position_fd)
+            raise
+
+        self._segments = []
+        for name in os.listdir(directory):
+            if name.isdigit():
+                self._segments.append(int(name))
+                self.size += os.path.getsize(self._path(int(name)))
+        self._segments.sort()
+        self._write_fd = None
+        self._write_size = 0
+        self._next = None
+
+        data = os.pread(self._position_fd, _position.size, 0)
+        if len(data) == _position.size:
+            self._segment, self._offset = _position.unpack(data)
+        else:
+            self._segment, self._offset = 0, 0
+        # The segments before the position were read completely
+        while self._segments and self._segments[0] < self._segment:
+            self._remove_oldest()
+        if not self._segments or self._segments[0] != self._segment:
+            self._segment, self._offset = self._first_position()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+            self._write_fd = None
+        if self._position_fd is not None:
+            os.close(self._position_fd)
+            self._position_fd = None
+
+    @property
+    def backlog(self):
+        """Return the size of the lines not yet read in bytes"""
+        return self.size - self._offset
+
+    def append(self, data):
+        """Append the complete lines to the newest segment"""
+        if not data:
+            return
+        # A new segment is started after a restart too
+        if self._write_fd is None or self._write_size >= self.segment_size:
+            self._rotate()
+        os.write(self._write_fd, data)
+        self._write_size += len(data)
+        self.size += len(data)
+        self._trim()
+
+    def read(self, count):
+        """Return up to count lines from the oldest position
+
+        The position is only moved forward by commit(), so the same lines
+        are returned again, if they couldn't be sent.
+        """
+        lines = []
+        segment, offset = self._segment, self._offset
+        for segment in self._segments:
+            if segment < self._segment:
+                continue
+            with open(self._path(segment), 'rb') as fd:
+                fd.seek(offset)
+                while len(lines) < count:
+                    line = fd.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    lines.append(line)
+                    offset += len(line)
+            if len(lines) >= count or segment == self._segments[-1]:
+                break
+            offset = 0
+        self._next = segment, offset
+        return lines
+
+    def commit(self):
+        """Move the position after the lines returned by the last read()"""
+        if self._next is None:
+            return
+        segment, offset = self._next
+        self._next = None
+        while self._segments and self._segments[0] < segment:
+            self._remove_oldest()
+        if self._segments and self._segments[0] == segment:
+            self._set_position(segment, offset)
+
+    def _path(self, segment):
+        return os.path.join(self.directory, '{:016d}'.format(segment))
+
+    def _rotate(self):
+        if self._write_fd is not None:
+            os.close(self._write_fd)
+        segment = self._segments[-1] + 1 if self._segments else 1
+        self._write_fd = os.open(
+            self._path(segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+        )
+        self._write_size = 0
+        self._segments.append(segment)
+        if len(self._segments) == 1:
+            self._set_position(segment, 0)
+
+    def _trim(self):
+        """Drop the oldest segments while the spool is too large"""
+        if self.size <= self.max_size or len(self._segments) < 2:
+            return
+        dropped = 0
+        while self.size > self.max_size and len(self._segments) > 1:
+            dropped += self._remove_oldest()
+        self._set_position(*self._first_position())
+        if dropped:
+            logging.getLogger(__name__).warning(
+                'Spool %s is full, dropped %d bytes', self.directory, dropped
+            )
+
+    def _remove_oldest(self):
+        segment = self._segments.pop(0)
+        path = self._path(segment)
+        size = os.path.getsize(path)
+        os.unlink(path)
+        self.size -= size
+        if segment != self._segment:
+            return size
+        # Only the part after the position was not read yet
+        dropped = size - self._offset
+        self._offset = 0
+        return dropped
+
+    def _first_position(self):
+        return (self._segments[0] if self._segments else 0), 0
+
+    def _set_position(self, segment, offset):
+        self._segment, self._offset = segment, offset
+        os.pwrite(self._position_fd, _position.pack(segment, offset), 0)
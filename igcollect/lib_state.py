@@ -0,0 +1,254 @@
+"""igcollect - Counter state library
+
+Most of the collectors report monotonic counters.  This library keeps the
+previous value of every counter in a small file, so that the collectors
+can report the per-second rates themselves instead of Graphite computing
+them on every render.
+
+The file is mapped into memory and organised as an open addressing hash
+table with fixed size slots.  The metric paths are stored as 64-bit
+hashes next to the timestamp and the value of the previous run.  The table
+is rebuilt with the double size when it gets full, dropping the counters
+which were not updated for a week.  The values are stored as doubles, so
+the counters above 2^53 lose some precision which is negligible for rates.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+import os
+
+from fcntl import flock, LOCK_EX, LOCK_NB
+from hashlib import blake2b
+from mmap import mmap
+from struct import Struct
+from time import monotonic, sleep, time
+
+from lib_runner import resident
+
+DEFAULT_STATE_DIR = '/var/tmp/igcollect'
+RATE_SUFFIX = '_rate'
+
+_header = Struct('<4sII')
+_slot = Struct('<Qdd')
+_slot_value = Struct('<dd')
+_magic = b'IGC1'
+
+
+class CounterStore(object):
+    def __init__(self, filename, capacity=1024, max_age=7 * 24 * 60 * 60,
+                 lock_timeout=5):
+        self.filename = filename
+        self.max_age = max_age
+        self._slots = {}  # Cache of the positions of the slots
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock(lock_timeout)
+
+        if os.fstat(self._fd).st_size < _header.size:
+            self._create(capacity)
+        self._map()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._fd is not None:
+            self._mmap.close()
+            os.close(self._fd)
+            self._fd = None
+
+    def get(self, key):
+        """Return (timestamp, value) stored for the key or None"""
+        pos = self._find(key)
+        if pos is None:
+            return None
+        return _slot_value.unpack_from(self._mmap, pos + 8)
+
+    def set(self, key, timestamp, value):
+        pos = self._find(key, insert=True)
+        _slot_value.pack_into(self._mmap, pos + 8, timestamp, value)
+
+    def rate(self, key, value, timestamp=None):
+        """Store the counter and return its per-second rate
+
+        None is returned for the first value of the counter, and when the
+        counter is reset e.g. by a reboot.  The 32-bit and 64-bit counters
+        are allowed to wrap around, if they were close to their limit.
+        """
+        if timestamp is None:
+            timestamp = time()
+        previous = self.get(key)
+        self.set(key, timestamp, value)
+        if previous is None:
+            return None
+
+        prev_timestamp, prev_value = previous
+        elapsed = timestamp - prev_timestamp
+        if elapsed <= 0:
+            return None
+
+        delta = value - prev_value
+        if delta < 0:
+            delta = _wrapped_delta(prev_value, value)
+            if delta is None:
+                return None
+        return delta / elapsed
+
+    def _find(self, key, insert=False):
+        pos = self._slots.get(key)
+        if pos is not None:
+            return pos
+
+        key_hash = _hash(key)
+        mask = self._capacity - 1
+        index = key_hash & mask
+        while True:
+            pos = _header.size + index * _slot.size
+            slot_hash = _slot.unpack_from(self._mmap, pos)[0]
+            if slot_hash == key_hash:
+                self._slots[key] = pos
+                return pos
+            if slot_hash == 0:
+                break
+            index = (index + 1) & mask
+
+        if not insert:
+            return None
+        if (self._used + 1) * 10 > self._capacity * 7:
+            self._grow()
+            return self._find(key, insert)
+
+        self._used += 1
+        _header.pack_into(self._mmap, 0, _magic, self._capacity, self._used)
+        _slot.pack_into(self._mmap, pos, key_hash, 0, 0)
+        self._slots[key] = pos
+        return pos
+
+    def _lock(self, timeout):
+        """Only one process can use the file at a time
+
+        A hung process holding the lock must not block the others forever,
+        so they give up after the timeout.
+        """
+        deadline = monotonic() + timeout
+        while True:
+            try:
+                flock(self._fd, LOCK_EX | LOCK_NB)
+                return
+            except BlockingIOError:
+                if monotonic() >= deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise OSError(
+                        'Counter file {} is locked by another process'
+                        .format(self.filename)
+                    )
+                sleep(0.05)
+
+    def _create(self, capacity):
+        os.ftruncate(self._fd, 0)
+        os.ftruncate(self._fd, _header.size + capacity * _slot.size)
+        os.pwrite(self._fd, _header.pack(_magic, capacity, 0), 0)
+
+    def _map(self):
+        self._mmap = mmap(self._fd, 0)
+        magic, self._capacity, self._used = _header.unpack_from(self._mmap)
+        if (
+            magic != _magic or
+            len(self._mmap) != _header.size + self._capacity * _slot.size
+        ):
+            # Start over instead of failing on a broken file
+            self._mmap.close()
+            self._create(1024)
+            self._map()
+
+    def _grow(self):
+        """Rebuild the table with the double size dropping old entries"""
+        min_timestamp = time() - self.max_age
+        entries = []
+        for index in range(self._capacity):
+            entry = _slot.unpack_from(
+                self._mmap, _header.size + index * _slot.size
+            )
+            if entry[0] and entry[1] >= min_timestamp:
+                entries.append(entry)
+
+        self._mmap.close()
+        self._create(self._capacity * 2)
+        self._map()
+        self._slots = {}
+        mask = self._capacity - 1
+        for entry in entries:
+            index = entry[0] & mask
+            while _slot.unpack_from(
+                self._mmap, _header.size + index * _slot.size
+            )[0]:
+                index = (index + 1) & mask
+            _slot.pack_into(self._mmap, _header.size + index * _slot.size,
+                            *entry)
+        self._used = len(entries)
+        _header.pack_into(self._mmap, 0, _magic, self._capacity, self._used)
+
+
+def _hash(key):
+    key_hash = int.from_bytes(
+        blake2b(key.encode(), digest_size=8).digest(), 'little'
+    )
+    # Zero marks the empty slots
+    return key_hash or 1
+
+
+def _wrapped_delta(prev_value, value):
+    for limit in (2 ** 32, 2 ** 64):
+        if prev_value <= limit:
+            if prev_value >= limit / 2 and value < limit / 2:
+                return limit - prev_value + value
+            return None
+    return None
+
+
+def add_rate_arguments(parser):
+    parser.add_argument(
+        '--rates', choices=['none', 'add', 'only'], default='none',
+        help='report the per-second rates of the counters in addition to '
+        'or instead of their values',
+    )
+    parser.add_argument(
+        '--state-file',
+        help='file to keep the previous values of the counters, by default '
+        'named after the prefix in ' + DEFAULT_STATE_DIR,
+    )
+
+
+def get_counter_store(args):
+    """Return the store for the arguments or None, if rates are disabled
+
+    The store is kept open between the runs by the daemon.
+    """
+    if args.rates == 'none':
+        return None
+
+    filename = args.state_file or os.path.join(
+        DEFAULT_STATE_DIR, args.prefix + '.counters'
+    )
+    return resident(
+        ('counters', filename),
+        lambda: CounterStore(filename),
+        alive=lambda store: store._fd is not None,
+    )
+
+
+def emit_counter(emitter, store, mode, path, value, timestamp):
+    """Emit the counter and/or its rate according to the mode"""
+    if store is None or mode != 'only':
+        emitter.emit(path, value)
+    if store is not None:
+        rate = store.rate(path, value, timestamp)
+        if rate is not None:
+            emitter.emit(path + RATE_SUFFIX, round(rate, 3))
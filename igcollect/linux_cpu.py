@@ -8,6 +8,8 @@ from argparse import ArgumentParser
 from time import time
 from typing import Tuple
 
+from lib_procfs import get_proc_reader, root_path
+
 
 def parse_args():
     parser = ArgumentParser()
@@ -28,8 +30,9 @@ def main():
         "softirq",
         "steal",
     )
-    cpu_data, totals = get_cpustats_dict(header)
-    freq_dict = get_cpufreq_dict()
+    reader = get_proc_reader("linux_cpu")
+    cpu_data, totals = get_cpustats_dict(header, reader)
+    freq_dict = get_cpufreq_dict(reader)
 
     for cpu in cpu_data:
         for metric in header:
@@ -51,7 +54,7 @@ def main():
         print("{}.{} {} {}".format(args.prefix, value, totals[value], now))
 
 
-def get_cpustats_dict(header) -> Tuple[dict, dict]:
+def get_cpustats_dict(header, reader) -> Tuple[dict, dict]:
     """returns aggregated data from /proc/stat"""
 
     total_dict = {}
@@ -61,55 +64,55 @@ def get_cpustats_dict(header) -> Tuple[dict, dict]:
     # headers from /proc/stat CPU stats
     keys = ("user", "nice", "system", "idle", "iowait", "irq", "softirq")
 
-    with open("/proc/stat", "r") as fp:
-        for line in fp:
-            metric_name = line.split(" ", 1)[0]
-
-            # Here we have to handle some kind of disk first the name than
-            # the counters as mentioned in the header.
-            if metric_name == "cpu":
-                # overall stats
-                values = line.split()
-                total_dict = dict(zip(keys, values[1:8]))
-                if len(line.strip().split()) == 11:
-                    total_dict["steal"] = values[8]
-                    total_dict["guest"] = values[9]
-                    total_dict["guest_nice"] = values[10]
-                else:
-                    total_dict["steal"] = 0
-                    total_dict["guest"] = 0
-                    total_dict["guest_nice"] = 0
-
-                # sum all except idle to get CPU time
-                total_dict["time"] = sum(
-                    int(total_dict[key]) for key in keys if key != "idle"
-                )
+    data = reader.read(root_path("/proc/stat")).decode()
+    for line in data.splitlines():
+        metric_name = line.split(" ", 1)[0]
+
+        # Here we have to handle some kind of disk first the name than
+        # the counters as mentioned in the header.
+        if metric_name == "cpu":
+            # overall stats
+            values = line.split()
+            total_dict = dict(zip(keys, values[1:8]))
+            if len(line.strip().split()) == 11:
+                total_dict["steal"] = values[8]
+                total_dict["guest"] = values[9]
+                total_dict["guest_nice"] = values[10]
+            else:
+                total_dict["steal"] = 0
+                total_dict["guest"] = 0
+                total_dict["guest_nice"] = 0
+
+            # sum all except idle to get CPU time
+            total_dict["time"] = sum(
+                int(total_dict[key]) for key in keys if key != "idle"
+            )
 
-            elif metric_name.startswith("cpu"):
-                # stats per core
-                amountCPU += 1
-                x = line.strip().split()
-                name = x.pop(0).lstrip("cpu")
-                cpustats_dict[name] = {}
-                for i in header:
-                    cpustats_dict[name][i] = x.pop(0)
-            elif metric_name == "btime":
-                total_dict["uptime"] = int(time()) - int(line.split(" ", 1)[1])
-            elif metric_name in [
-                "intr",
-                "ctxt",
-                "processes",
-                "procs_running",
-                "procs_blocked",
-            ]:
-                total_dict[metric_name] = int(line.split(" ", 2)[1])
+        elif metric_name.startswith("cpu"):
+            # stats per core
+            amountCPU += 1
+            x = line.strip().split()
+            name = x.pop(0).lstrip("cpu")
+            cpustats_dict[name] = {}
+            for i in header:
+                cpustats_dict[name][i] = x.pop(0)
+        elif metric_name == "btime":
+            total_dict["uptime"] = int(time()) - int(line.split(" ", 1)[1])
+        elif metric_name in [
+            "intr",
+            "ctxt",
+            "processes",
+            "procs_running",
+            "procs_blocked",
+        ]:
+            total_dict[metric_name] = int(line.split(" ", 2)[1])
 
     total_dict["amount"] = amountCPU
 
     return cpustats_dict, total_dict
 
 
-def get_cpufreq_dict() -> dict:
+def get_cpufreq_dict(reader) -> dict:
     """Returns a dictionary of CPU frequencies from /proc/cpuinfo.
 
     The dictionary keys are processor IDs (as strings), and the values are
@@ -123,31 +126,31 @@ def get_cpufreq_dict() -> dict:
     current_processor = None
 
     try:
-        with open("/proc/cpuinfo", "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Parse processor number
-                if line.startswith("processor"):
-                    parts = line.split(":")
-                    if len(parts) == 2:
-                        current_processor = parts[1].strip()
-                        cpufreq_dict[current_processor] = {"frequency": 0}
-
-                # Parse CPU frequency in MHz
-                elif line.startswith("cpu MHz") and current_processor is not None:
-                    parts = line.split(":")
-                    if len(parts) == 2:
-                        try:
-                            freq_mhz = float(parts[1].strip())
-                            cpufreq_dict[current_processor]["frequency"] = freq_mhz
-                        except (ValueError, TypeError):
-                            cpufreq_dict[current_processor]["frequency"] = 0
-
+        data = reader.read(root_path("/proc/cpuinfo")).decode()
     except (FileNotFoundError, IOError):
-        pass
+        return cpufreq_dict
+
+    for line in data.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        # Parse processor number
+        if line.startswith("processor"):
+            parts = line.split(":")
+            if len(parts) == 2:
+                current_processor = parts[1].strip()
+                cpufreq_dict[current_processor] = {"frequency": 0}
+
+        # Parse CPU frequency in MHz
+        elif line.startswith("cpu MHz") and current_processor is not None:
+            parts = line.split(":")
+            if len(parts) == 2:
+                try:
+                    freq_mhz = float(parts[1].strip())
+                    cpufreq_dict[current_processor]["frequency"] = freq_mhz
+                except (ValueError, TypeError):
+                    cpufreq_dict[current_processor]["frequency"] = 0
 
     return cpufreq_dict
 
@@ -9,6 +9,10 @@ from os import path, listdir
 from re import match
 from time import time
 
+from lib_graphite import GraphiteEmitter
+from lib_procfs import get_proc_reader, root_path
+from lib_state import add_rate_arguments, emit_counter, get_counter_store
+
 METRIC_NAMES = {
     'disk': (
         ('major', None),
@@ -42,31 +46,44 @@ METRIC_NAMES = {
     )
 }
 
+# All the other metrics are monotonic counters
+GAUGES = ('ioOpsInProgress', )
+
 
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument('--prefix', default='disk')
+    add_rate_arguments(parser)
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
-    template = args.prefix + '.{}.{} {} ' + str(int(time()))
-    
-
-    for disk_name, disk_stats in dict(
-        list(get_diskstats_dict().items()) +
-        list(get_zpoolstats_dict().items())
-    ).items():
-        for stat_name, value in disk_stats.items():
-            if stat_name != 'type':
-                print(template.format(disk_name, stat_name, value))
+    timestamp = int(time())
+    store = get_counter_store(args)
+    reader = get_proc_reader('linux_disk')
+
+    with GraphiteEmitter(args.prefix, timestamp) as emitter:
+        for disk_name, disk_stats in dict(
+            list(get_diskstats_dict(reader).items()) +
+            list(get_zpoolstats_dict(reader).items())
+        ).items():
+            for stat_name, value in disk_stats.items():
+                if stat_name == 'type':
+                    continue
+                path = disk_name + '.' + stat_name
+                if stat_name in GAUGES:
+                    emitter.emit(path, value)
+                else:
+                    emit_counter(
+                        emitter, store, args.rates, path, value, timestamp
+                    )
 
 
-def get_zpoolstats_dict():
+def get_zpoolstats_dict(reader):
     """Return a dictionary made from /proc/spl/kstat/zfs/"""
 
-    zfs_base = '/proc/spl/kstat/zfs'
+    zfs_base = root_path('/proc/spl/kstat/zfs')
     if not path.isdir(zfs_base):
         return {}
 
@@ -77,36 +94,36 @@ def get_zpoolstats_dict():
         if not path.isdir('{}/{}'.format(zfs_base, zpool)):
             continue
         ret[zpool] = {'type': 'zfs'}
-        with open('{}/{}/io'.format(zfs_base, zpool) , 'r') as fp:
-            stats_found = False
-            for line in fp:
-                if line.startswith('nread'):
-                    # Disks stats are after line with headers
-                    stats_found = True
-                    continue
-                if stats_found:
-                    x = line.strip().split()
-                    ret[zpool] = {'type': disk_type}
-                    ret[zpool].update(read_metrics(x, METRIC_NAMES[disk_type]))
+        data = reader.read('{}/{}/io'.format(zfs_base, zpool))
+        stats_found = False
+        for line in data.splitlines():
+            if line.startswith(b'nread'):
+                # Disks stats are after line with headers
+                stats_found = True
+                continue
+            if stats_found:
+                x = line.split()
+                ret[zpool] = {'type': disk_type}
+                ret[zpool].update(read_metrics(x, METRIC_NAMES[disk_type]))
                     
     return ret
 
 
-def get_diskstats_dict():
+def get_diskstats_dict(reader):
     """Return a dictionary made from /proc/diskstats"""
     
     disk_type = 'disk'
     ret = {}
 
-    with open('/proc/diskstats', 'r') as fp:
-        for line in fp:
-            x = line.strip().split()
-            disk_name = x[2]
-            # Filter for only normal disks
-            if not match('^(xv|[shv]|nv)(d[a-z]|me[0-9]n[1-9])$', disk_name):
-                continue
-            ret[disk_name] = {'type': disk_type}
-            ret[disk_name].update(read_metrics(x, METRIC_NAMES[disk_type]))
+    data = reader.read(root_path('/proc/diskstats'))
+    for line in data.splitlines():
+        x = line.split()
+        disk_name = x[2].decode()
+        # Filter for only normal disks
+        if not match('^(xv|[shv]|nv)(d[a-z]|me[0-9]n[1-9])$', disk_name):
+            continue
+        ret[disk_name] = {'type': disk_type}
+        ret[disk_name].update(read_metrics(x, METRIC_NAMES[disk_type]))
 
     return ret
 
@@ -7,6 +7,8 @@ Copyright (c) 2016 InnoGames GmbH
 from argparse import ArgumentParser
 from time import time
 
+from lib_procfs import root_path
+
 
 def parse_args():
     parser = ArgumentParser()
@@ -16,7 +18,7 @@ def parse_args():
 
 def main():
     args = parse_args()
-    with open('/proc/loadavg', 'r') as file_descriptor:
+    with open(root_path('/proc/loadavg'), 'r') as file_descriptor:
         avg01, avg05, avg15 = file_descriptor.readline().strip().split(' ')[:3]
 
     template = args.prefix + '.{} {} ' + str(int(time()))
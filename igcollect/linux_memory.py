@@ -7,6 +7,8 @@ Copyright (c) 2018 InnoGames GmbH
 from argparse import ArgumentParser
 from time import time
 
+from lib_procfs import get_proc_reader, root_path
+
 
 def parse_args():
     parser = ArgumentParser()
@@ -46,18 +48,14 @@ def main():
         print(template.format(field, meminfo[field]))
 
 
-def parse_split_file(filename):
-    """Utility to read and parse a comma delimited file"""
-    with open(filename) as fd:
-        return [line.strip().split(None, 1) for line in fd]
-
-
 def get_meminfo():
-    lines = parse_split_file('/proc/meminfo')
-    # turns ['SwapFree:', '100 kB'] into ('SwapFree', '102400')
-    return dict(
-        (key[:-1], 1024 * int(value.split()[0])) for key, value in lines
-    )
+    data = get_proc_reader('linux_memory').read(root_path('/proc/meminfo'))
+    # turns b'SwapFree:  100 kB' into ('SwapFree', 102400)
+    meminfo = {}
+    for line in data.splitlines():
+        fields = line.split()
+        meminfo[fields[0][:-1].decode()] = 1024 * int(fields[1])
+    return meminfo
 
 
 if __name__ == '__main__':
@@ -9,6 +9,10 @@ from time import time
 from os import listdir
 from os.path import isdir, islink, join
 
+from lib_graphite import GraphiteEmitter
+from lib_procfs import ProcReader, get_proc_reader, root_path
+from lib_state import add_rate_arguments, emit_counter, get_counter_store
+
 
 class InterfaceStatistics(object):
     def _check_dir(self, dev, directory):
@@ -21,8 +25,7 @@ class InterfaceStatistics(object):
         return islink(join(self._scn, dev, symlink))
 
     def _check_type(self, dev, types):
-        with open(join(self._scn, dev, 'type'), 'r') as fd:
-            dev_type = fd.readline().strip()
+        dev_type = str(self._reader.read_int(join(self._scn, dev, 'type')))
         return any(dev_type == t for t in types)
 
     def _check_uevent(self, dev, string):
@@ -30,8 +33,7 @@ class InterfaceStatistics(object):
             return string in fd.read()
 
     def _read_stat(self, dev, param):
-        with open(join(self._scn, dev, 'statistics', param)) as fd:
-            return int(fd.readline().strip())
+        return self._reader.read_int(join(self._scn, dev, 'statistics', param))
 
     # Supported types of interfaces for a metrics sending
     # If there is more than one conditions they multipied by AND
@@ -50,7 +52,9 @@ class InterfaceStatistics(object):
     }
     _scn = '/sys/class/net'
 
-    def __init__(self, included_types=[]):
+    def __init__(self, included_types=[], reader=None):
+        self._scn = root_path(self._scn)
+        self._reader = reader or ProcReader()
         self.included_types = included_types
         self.netdev_stat = {}
 
@@ -121,13 +125,15 @@ class InterfaceStatistics(object):
                 for param in metric_names[m]:
                     self.netdev_stat[dev][m] += self._read_stat(dev, param)
 
-    def print_metrics(self, prefix):
-        for dev in self.netdev_stat:
-            for metric in self.netdev_stat[dev]:
-                print('{}.{}.{} {} {}'.format(
-                    prefix, dev.replace('.', '_'), metric,
-                    self.netdev_stat[dev][metric], self.timestamp
-                ))
+    def print_metrics(self, prefix, store=None, rates='none'):
+        with GraphiteEmitter(prefix, self.timestamp) as emitter:
+            for dev in self.netdev_stat:
+                dev_name = dev.replace('.', '_')
+                for metric, value in self.netdev_stat[dev].items():
+                    emit_counter(
+                        emitter, store, rates, dev_name + '.' + metric, value,
+                        self.timestamp,
+                    )
 
 
 def parse_args():
@@ -137,14 +143,17 @@ def parse_args():
                         default=[],
                         choices=InterfaceStatistics.NET_TYPES.keys(),
                         help='list of enabled interfaces')
+    add_rate_arguments(parser)
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
-    ns = InterfaceStatistics(args.enabled_types)
+    ns = InterfaceStatistics(
+        args.enabled_types, get_proc_reader('linux_network')
+    )
     ns.fill_metrics()
-    ns.print_metrics(args.prefix)
+    ns.print_metrics(args.prefix, get_counter_store(args), args.rates)
 
 
 if __name__ == '__main__':
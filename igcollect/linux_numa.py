@@ -7,6 +7,8 @@ Copyright (c) 2017 InnoGames GmbH
 from argparse import ArgumentParser
 from time import time
 
+from lib_procfs import root_path
+
 
 NUMA_NODES_PATH = '/sys/devices/system/node/online'
 NUMA_STAT_PATH = '/sys/devices/system/node/node{}/{}'
@@ -48,13 +50,13 @@ def main():
 
 
 def get_numa_nodes():
-    with open(NUMA_NODES_PATH) as fd:
+    with open(root_path(NUMA_NODES_PATH)) as fd:
         for node in parse_ranges(fd.read()):
             yield node
 
 
 def get_cpu_stats():
-    with open(CPU_STAT_PATH) as fd:
+    with open(root_path(CPU_STAT_PATH)) as fd:
         for line in fd:
             if not line.startswith('cpu'):
                 continue
@@ -66,19 +68,19 @@ def get_cpu_stats():
 
 
 def get_cpulist(node):
-    with open(NUMA_STAT_PATH.format(node, 'cpulist')) as fd:
+    with open(root_path(NUMA_STAT_PATH.format(node, 'cpulist'))) as fd:
         for cpu_core in parse_ranges(fd.read()):
             yield cpu_core
 
 
 def get_numastat(node):
-    with open(NUMA_STAT_PATH.format(node, 'numastat')) as fd:
+    with open(root_path(NUMA_STAT_PATH.format(node, 'numastat'))) as fd:
         for line in fd:
             yield line.strip().split(None, 1)
 
 
 def get_meminfo(node):
-    with open(NUMA_STAT_PATH.format(node, 'meminfo')) as fd:
+    with open(root_path(NUMA_STAT_PATH.format(node, 'meminfo'))) as fd:
         for line in fd:
             line_split = line.strip().split()
             yield line_split[2].rstrip(':'), int(line_split[3])
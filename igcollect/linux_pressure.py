@@ -9,6 +9,8 @@ import time
 
 from argparse import ArgumentParser
 
+from lib_procfs import root_path
+
 
 def parse_args():
     parser = ArgumentParser(prog='linux_pressure.py')
@@ -17,7 +19,7 @@ def parse_args():
 
 
 def main():
-    if not os.path.isdir('/proc/pressure'):
+    if not os.path.isdir(root_path('/proc/pressure')):
         return
 
     args = parse_args()
@@ -56,7 +58,7 @@ def get_pressure_stats():
     now = int(time.time())
     output = []
     for key in ['cpu', 'io', 'memory']:
-        lines = parse_split_file('/proc/pressure/{}'.format(key))
+        lines = parse_split_file(root_path('/proc/pressure/{}'.format(key)))
         for line in lines:
             for element in line[1:]:
                 name, value = element.split('=', 1)
@@ -7,6 +7,8 @@ Copyright (c) 2016 InnoGames GmbH
 from argparse import ArgumentParser
 from time import time
 
+from lib_procfs import get_proc_reader, root_path
+
 
 def parse_args():
     parser = ArgumentParser(prog='linux_vmstat.py')
@@ -29,15 +31,13 @@ def main():
         print(template.format(field, vmstat[field]))
 
 
-def parse_split_file(filename):
-    """Utility to read and parse a space delimited file"""
-    with open(filename, 'r') as fd:
-        return [line.strip().split(None, 1) for line in fd]
-
-
 def get_vmstat():
-    lines = parse_split_file('/proc/vmstat')
-    return {key: int(value.split()[0]) for key, value in lines}
+    data = get_proc_reader('linux_vmstat').read(root_path('/proc/vmstat'))
+    vmstat = {}
+    for line in data.splitlines():
+        key, value = line.split(None, 1)
+        vmstat[key.decode()] = int(value)
+    return vmstat
 
 
 if __name__ == '__main__':
@@ -5,33 +5,100 @@ This script can retrieve last line values by column number:
 
 python logfile_values.py --metric "metric1:1" "metric2:2" ...
 
+The columns can be combined with arithmetic like "metric3:2/(3+4)".
+
 And aggregate data by time period with different functions:
 
-median, mean, sum, min, max, count, frequency, speed (??)
+median, mean, sum, min, max, count, frequency, speed (??), distribution
 
 count_100 - counts values > 100
 count_100_percentage - estimates percentage of values > 100
+p99 - estimates the 99th percentile, any percentile like p99.9 works
+histogram_0.1_1_10 - counts values in the buckets up to the given bounds
+histogram_log_1_1000 - the same with the bounds 1, 2, 5, 10, 20... 1000
+histogram - the same with the bounds from 1 to 1000000
+
+The buckets of the histograms are named after their upper bounds, the
+last one "inf" counts the values above all of them.  With the suffix _le
+like histogram_log_1_1000_le every bucket counts all values up to its
+bound, like the buckets of Prometheus.
+
+The values are not kept in memory.  The median and the percentiles are
+estimated within 1% of the actual values, see lib_aggregate.py.
 
 python logfile_values.py --metric "metric1:1:mean:1d" \
                          --metric "metric2:3:count:60s"
 
+The whole period is read from the end of the file on every run.  The
+beginning of the period is searched by bisecting the large files, so the
+lines out of order up to --slack seconds are counted too.  With
+--incremental only the lines appended since the previous run are read,
+and the aggregates of the period are kept in a state file.  They are
+kept in the buckets of --granularity seconds, by default 1/60 of the
+period, so the beginning of the period is rounded down to it.
+
+Like the full scan, the values are aggregated over the shortest period
+of the given metrics.
+
+The structured logs are read with --format json or --format logfmt.  The
+columns and --time-column are then the names of the fields, by default
+"time":
+
+python logfile_values.py --format json --time-format epoch \
+                         --metric "latency:duration_ms/1000:p99:5min"
+
+Only the fields used by the metrics are looked up in the lines, the lines
+are not decoded as a whole.  The field names are looked up at any depth
+of the JSON objects, so they should be unique within the lines.
+
 Copyright (c) 2019 InnoGames GmbH
 """
 
 import re
 import os
 import gzip
+import json
 import logging
 import datetime
 
-from os.path import exists
-from argparse import ArgumentParser, ArgumentTypeError
+from os.path import exists, join
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+
+from lib_aggregate import Aggregate, format_bound, log_bounds
+from lib_logfile import (
+    LogTail,
+    TimestampParser,
+    extract_json_fields,
+    extract_logfmt_fields,
+    read_lines_reverse,
+    seek_timestamp,
+)
+from lib_state import DEFAULT_STATE_DIR
+
+# The number of the buckets of the period kept in the incremental state
+STATE_BUCKETS = 60
+
+# The parsers of the time formats remembering the recent timestamps
+_timestamp_parsers = {}
+
+# The functions returning the named fields of the structured lines
+_extractors = {
+    'json': extract_json_fields,
+    'logfmt': extract_logfmt_fields,
+}
+
+# The tokens of the column expressions with the fields by index or by name
+_index_tokens = re.compile(r'\d+|[-+*/()]')
+_name_tokens = re.compile(r'[^\s()*/+-]+|[-+*/()]')
+# The numbers within the expressions by name are constants
+_number = re.compile(r'[0-9]+(\.[0-9]+)?')
 
 
 class Metric:
-    def __init__(self, arg):
+    def __init__(self, arg, named=False):
         if ':' not in arg:
             raise ArgumentTypeError('Argument must have ":"')
+        self.arg = arg
         parts = arg.split(':')
         if len(parts) != 4 and len(parts) != 2:
             raise ValueError('Wrong number of options')
@@ -45,9 +112,22 @@ class Metric:
                 raise ArgumentTypeError('Period must have number and unit')
 
         self.column = column
+        self.expression = compile_expression(column, named)
+        # The fields of the structured lines used in the expression
+        self.field_names = set()
+        if named:
+            self.field_names.update(
+                t for t in _name_tokens.findall(column)
+                if t not in '()*/+-' and not _number.fullmatch(t)
+            )
         self.function = function
         self.period = period
-        self.values = []  # Container for metric values
+        quantile = self.get_quantile()
+        if quantile is not None and quantile > 1:
+            raise ArgumentTypeError('Quantile must be between p0 and p100')
+        self.histogram_bounds, self.cumulative = self.parse_histogram()
+        # Summary of the metric values
+        self.aggregate = self.create_aggregate()
         self.last_value = 0
         self.now = int(datetime.datetime.now(datetime.timezone.utc)
                        .timestamp())
@@ -71,98 +151,121 @@ class Metric:
 
         Returns 0.0 if the value cannot be converted to float.
         """
-        raw_value = extract_value(field)
-        try:
-            return float(raw_value)
-        except ValueError:
-            return 0.0
+        return field_value(field)
 
     def estimate_columns_value(self, fields):
         """
         Apply some arithmetic on several columns if needed
         """
-        # Handle simple column reference first (most common case)
-        if self.column.isdigit():
-            try:
-                field = fields[int(self.column)]
-                return self.extract_value_from_field(field)
-            except (IndexError, ValueError):
-                return 0
-
-        # Handle complex expressions with arithmetic
-        arr = [
-            s for s in self.column if s.isdigit() or s in ['/', '*', '+', '-']
-        ]
-        result = 0
-        for index, value in enumerate(arr):
-            try:
-                if value.isdigit() and result == 0:
-                    field = fields[int(value)]
-                    result += self.extract_value_from_field(field)
-                elif value == '/':
-                    field = fields[int(arr[index + 1])]
-                    div_value = self.extract_value_from_field(field)
-                    if div_value != 0:
-                        result = result / div_value
-                    else:
-                        result = 0
-                elif value == '*':
-                    field = fields[int(arr[index + 1])]
-                    result = result * self.extract_value_from_field(field)
-                elif value == '+':
-                    field = fields[int(arr[index + 1])]
-                    result = result + self.extract_value_from_field(field)
-                elif value == '-':
-                    field = fields[int(arr[index + 1])]
-                    result = result - self.extract_value_from_field(field)
-            except (IndexError, ValueError):
-                result = 0
-        return result
+        try:
+            return self.expression(fields)
+        except LookupError:
+            return 0
+
+    def create_aggregate(self):
+        """Return an empty aggregate of the values of the function"""
+        function = self.function or ''
+        threshold = None
+        if function in ('count', 'frequency'):
+            threshold = 0
+        elif function.startswith('count_'):
+            threshold = int(function.split('_')[1])
+        return Aggregate(
+            threshold=threshold,
+            quantiles=function == 'median' or self.get_quantile() is not None,
+            distribution=function == 'distribution',
+            histogram=self.histogram_bounds,
+        )
+
+    def parse_histogram(self):
+        """Return the bounds of the histogram functions and if cumulative"""
+        parts = (self.function or '').split('_')
+        if parts[0] != 'histogram':
+            return None, False
+        cumulative = parts[-1] == 'le'
+        if cumulative:
+            parts.pop()
+        logarithmic = parts[1:2] == ['log']
+        try:
+            numbers = [float(p) for p in parts[2 if logarithmic else 1:]]
+        except ValueError:
+            raise ArgumentTypeError('Histogram bounds must be numbers')
+        if logarithmic or not numbers:
+            if len(numbers) not in (0, 2):
+                raise ArgumentTypeError(
+                    'Logarithmic histogram needs minimum and maximum'
+                )
+            minimum, maximum = numbers or (1, 1000000)
+            if not 0 < minimum < maximum:
+                raise ArgumentTypeError(
+                    'Histogram must have 0 < minimum < maximum'
+                )
+            return log_bounds(minimum, maximum), cumulative
+        return sorted(set(numbers)), cumulative
+
+    def get_quantile(self):
+        """Return the quantile of the functions like p99 or None"""
+        match = re.match(r'^p(\d+(?:\.\d+)?)$', self.function or '')
+        if match:
+            return float(match.group(1)) / 100
+        return None
 
     def get_median(self):
-        sorted_list = sorted(self.values)
-        i = len(sorted_list)
-        if not i % 2:
-            return (sorted_list[(i // 2) - 1] + sorted_list[i // 2]) / 2
-        return sorted_list[i // 2]
+        return self.aggregate.quantile(0.5)
 
     def get_sum(self):
-        return sum(self.values)
+        return self.aggregate.sum
 
-    def get_count(self, v=0):
-        return sum(1 for x in self.values if x >= v)
+    def get_count(self):
+        return self.aggregate.above
 
-    def get_count_percentage(self, v=0):
-        return sum(1 for x in self.values if x >= v) / len(self.values) * 100
+    def get_count_percentage(self):
+        return self.aggregate.above / self.aggregate.count * 100
 
     def get_mean(self):
-        return sum(self.values) / len(self.values)
+        return self.aggregate.mean()
 
     def get_min(self):
-        return min(self.values)
+        return self.aggregate.min
 
     def get_max(self):
-        return max(self.values)
+        return self.aggregate.max
 
     def get_last_value(self):
         return self.last_value
 
-    def get_frequency(self, v=0):
-        return self.get_count(v) / self.get_timeshift()
+    def get_frequency(self):
+        return self.get_count() / self.get_timeshift()
 
     def get_speed(self):
         # Speed :-/?
         return self.get_sum() / self.get_timeshift()
 
     def get_distribution(self):
-        d = {}
-        uniq_values = set(self.values)
-        for v in uniq_values:
-            d[int(v)] = self.values.count(v)
-        return d
+        return dict(self.aggregate.distribution)
+
+    def get_histogram(self):
+        """Return the counts of the buckets named after their bounds"""
+        histogram = self.aggregate.histogram
+        if self.cumulative:
+            buckets = [
+                ('le_' + format_bound(bound), count)
+                for bound, count in histogram.cumulative()
+            ]
+        else:
+            buckets = [
+                (format_bound(bound), count) for bound, count in zip(
+                    histogram.bounds + [float('inf')], histogram.counts
+                )
+            ]
+        return dict(buckets)
 
     def get_metric_value(self):
-        if not self.values:
+        # The histograms have the same series also without values
+        if self.histogram_bounds is not None:
+            return self.get_histogram()
+
+        if not self.aggregate.count:
             return 0
 
         if not self.function:
@@ -173,30 +276,175 @@ class Metric:
 
         if self.function.startswith('count_'):
             if self.function.endswith('percentage'):
-                return float(
-                    self.get_count_percentage(
-                        int(self.function.split('_')[1])))
-            return float(
-                self.get_count(int(self.function.split('_')[1])))
+                return float(self.get_count_percentage())
+            return float(self.get_count())
+
+        quantile = self.get_quantile()
+        if quantile is not None:
+            return float(self.aggregate.quantile(quantile))
 
         return float(getattr(self, 'get_' + self.function)())
 
 
+def field_value(field):
+    """Return the numeric value of the field or 0.0"""
+    try:
+        return float(field)
+    except ValueError:
+        pass
+    # The field may be a key-value pair
+    try:
+        return float(extract_value(field))
+    except ValueError:
+        return 0.0
+
+
+def divide(dividend, divisor):
+    if divisor == 0:
+        return 0
+    return dividend / divisor
+
+
+def compile_expression(column, named=False):
+    """Compile the column expression like "3" or "4+5/(6-7)" to a function
+
+    The numbers are the indexes of the columns, or the names are the keys
+    of the fields and the numbers are constants if named.  The operators have the usual precedence.  The
+    expression is translated to Python once, so evaluating it for a line
+    costs only the field lookups and the arithmetic.  The division by zero
+    results in 0.
+    """
+    # The other characters like the spaces are ignored
+    tokens = (_name_tokens if named else _index_tokens).findall(column)
+    position = 0
+
+    def parse_sum():
+        nonlocal position
+        code = parse_product()
+        while position < len(tokens) and tokens[position] in '+-':
+            operator = tokens[position]
+            position += 1
+            code = '({} {} {})'.format(code, operator, parse_product())
+        return code
+
+    def parse_product():
+        nonlocal position
+        code = parse_operand()
+        while position < len(tokens) and tokens[position] in '*/':
+            operator = tokens[position]
+            position += 1
+            if operator == '*':
+                code = '({} * {})'.format(code, parse_operand())
+            else:
+                code = '_divide({}, {})'.format(code, parse_operand())
+        return code
+
+    def parse_operand():
+        nonlocal position
+        if position >= len(tokens):
+            raise ArgumentTypeError('Incomplete column expression')
+        token = tokens[position]
+        position += 1
+        if token == '(':
+            code = parse_sum()
+            if position >= len(tokens) or tokens[position] != ')':
+                raise ArgumentTypeError('Missing ")" in column expression')
+            position += 1
+            return code
+        if named and _number.fullmatch(token):
+            return repr(float(token))
+        if named and token not in ')*/+-':
+            return '_value(fields[{!r}])'.format(token)
+        if token.isdigit():
+            return '_value(fields[{}])'.format(int(token))
+        raise ArgumentTypeError('Unexpected "{}" in column expression'
+                                .format(token))
+
+    code = parse_sum()
+    if position != len(tokens):
+        raise ArgumentTypeError('Unexpected "{}" in column expression'
+                                .format(tokens[position]))
+    return eval('lambda fields: ' + code, {
+        '_value': field_value, '_divide': divide,
+    })
+
+
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument('--prefix', default='logfile_values')
     parser.add_argument('--file', default='/var/log/messages')
     parser.add_argument('--columns-num', default='0', type=int)
-    parser.add_argument('--metric', type=Metric, nargs='+')
-    parser.add_argument('--time-column', default='0', type=int)
+    parser.add_argument('--metric', nargs='+', default=[])
+    parser.add_argument(
+        '--format', choices=('plain', 'json', 'logfmt'), default='plain',
+        help='"plain" for the columns separated by whitespace, "json" and '
+        '"logfmt" for the fields addressed by their names',
+    )
+    parser.add_argument(
+        '--time-column',
+        help='index of the column with the time, by default 0, or the name '
+        'of the field with --format json and logfmt, by default "time"',
+    )
     parser.add_argument(
         '--time-format', default='%Y-%m-%dT%H:%M:%S%z',
         help='If timezone is not specified, time string is treated as '
-        'local time',
+        'local time, "epoch" and "epoch_ms" for the seconds and the '
+        'milliseconds since the epoch',
+    )
+    parser.add_argument(
+        '--arch', action='store_true',
+        help='read the rotated archives too, if the period starts before '
+        'the file',
+    )
+    parser.add_argument(
+        '--arch-count', default=1, type=int,
+        help='number of the rotated generations like file.1.gz, file.2.gz '
+        'to read with --arch',
+    )
+    parser.add_argument(
+        '--arch-workers', default=4, type=int,
+        help='number of the processes reading the archives concurrently',
+    )
+    parser.add_argument(
+        '--slack', default=60, type=int,
+        help='seconds the timestamps of the lines may be out of order, '
+        'when searching the beginning of the period in the large files',
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='read only the lines appended since the previous run',
+    )
+    parser.add_argument(
+        '--state-file',
+        help='file to keep the position and the values of the period for '
+        '--incremental, by default named after the prefix in ' +
+        DEFAULT_STATE_DIR,
+    )
+    parser.add_argument(
+        '--granularity', type=int,
+        help='seconds of the buckets of the values kept for --incremental, '
+        'by default 1/{} of the period'.format(STATE_BUCKETS),
     )
-    parser.add_argument('--arch', action='store_true')
     parser.add_argument('--debug', '-d', action='store_true')
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    named = args.format != 'plain'
+    try:
+        args.metric = [Metric(arg, named) for arg in args.metric]
+    except (ArgumentTypeError, ValueError) as error:
+        parser.error('argument --metric: {}'.format(error))
+    if named:
+        args.time_column = args.time_column or 'time'
+        args.field_names = {args.time_column}.union(
+            *(m.field_names for m in args.metric)
+        )
+    else:
+        args.field_names = None
+        try:
+            args.time_column = int(args.time_column or 0)
+        except ValueError:
+            parser.error('argument --time-column: must be an index')
+    return args
 
 
 def extract_value(field):
@@ -217,37 +465,28 @@ def extract_value(field):
         return field
 
 
-def get_metrics_values(line, metrics, time_format, columns_num, time_column):
-    fields = line.split()
-    if columns_num and len(fields) != columns_num:
+def get_metrics_values(line, args):
+    parsed = parse_line(line, args)
+    if parsed is None:
         return True
 
-    # Extract timestamp value from key-value pair if needed
-    timestamp_field = fields[time_column]
-    timestamp_value = extract_value(timestamp_field)
-    
-    timestamp = convert_to_timestamp(timestamp_value, time_format)
-    for metric in metrics:
+    timestamp, fields = parsed
+    for metric in args.metric:
         if timestamp > metric.now - metric.get_timeshift():
             value = metric.estimate_columns_value(fields)
-            metric.values.append(value)
+            metric.aggregate.add(value)
         else:
             return False
     return True
 
 
-def get_metrics_last_value(line, metrics):
-    fields = line.split()
-    for metric in metrics:
+def get_metrics_last_value(line, args):
+    fields = split_fields(line, args)
+    for metric in args.metric:
         metric.last_value = metric.estimate_columns_value(fields)
 
 
-def read_logfile_reverse(filename,
-                         columns_num,
-                         time_column,
-                         time_format,
-                         metrics,
-                         buf_size=8192):
+def read_logfile_reverse(filename, args, buf_size=8192):
     """
     A generator that returns the lines of a file in reverse order.
     Stops to read when has met timestamp bigger then desired period.
@@ -282,26 +521,30 @@ def read_logfile_reverse(filename,
                 if buffer[-1] != '\n':
                     lines[-1] += segment
                 else:
-                    yield get_metrics_values(
-                        segment, metrics, time_format,
-                        columns_num, time_column
-                    )
+                    yield get_metrics_values(segment, args)
             segment = lines[0]
             for index in range(len(lines) - 1, 0, -1):
                 global_index += 1
                 if lines[index]:
                     if global_index == 1:
-                        get_metrics_last_value(lines[index], metrics)
-                    yield get_metrics_values(lines[index], metrics,
-                                             time_format, columns_num,
-                                             time_column)
+                        get_metrics_last_value(lines[index], args)
+                    yield get_metrics_values(lines[index], args)
 
     if segment is not None:
-        yield get_metrics_values(segment, metrics, time_format,
-                                 columns_num, time_column)
+        yield get_metrics_values(segment, args)
 
 
 def convert_to_timestamp(time_str, time_format):
+    """Convert the time string to epoch seconds using the fast paths"""
+    parser = _timestamp_parsers.get(time_format)
+    if parser is None:
+        parser = _timestamp_parsers[time_format] = TimestampParser(
+            time_format, lambda s: strptime_timestamp(s, time_format)
+        )
+    return parser(time_str)
+
+
+def strptime_timestamp(time_str, time_format):
     """
     Disclamer about timezone part:
         if time_format doesn't specify timezone position, time tuple is treated
@@ -335,19 +578,122 @@ def convert_to_timestamp(time_str, time_format):
     return int(timestamp)
 
 
-def main():  # NOQA: C901
-    args = parse_args()
-    if args.debug:
-        logging.getLogger().setLevel(logging.DEBUG)
-        logging.getLogger().addHandler(logging.StreamHandler())
+def get_archive_files(filename, count=1, oldest=None):
+    """Return the rotated generations of the log file from the newest one
+
+    The generations are named like file.1.gz, file.2.gz and so on, they
+    may also be uncompressed.  The archives last modified before the
+    oldest timestamp cannot have any lines of the period, and neither
+    can the older generations.
+    """
+    directory = os.path.dirname(filename) or '.'
+    pattern = re.compile(r'{}\.([0-9]+)(\.gz)?$'.format(
+        re.escape(os.path.basename(filename))
+    ))
+    generations = []
+    for entry in os.listdir(directory):
+        match = pattern.match(entry)
+        if match and 0 < int(match.group(1)) <= count:
+            generations.append((int(match.group(1)), join(directory, entry)))
+
+    archive_files = []
+    for generation, path in sorted(generations):
+        if oldest is not None and os.path.getmtime(path) <= oldest:
+            logging.getLogger().debug('Skipping archive file: {}'.format(path))
+            break
+        archive_files.append(path)
+    return archive_files
+
+
+def open_archive(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding='utf-8', errors='replace')
+    return open(filename, encoding='utf-8', errors='replace')
+
+
+def read_archives(args, oldest):
+    """Read the period from the archives into the metrics
+
+    The archives are read concurrently by the worker processes, which
+    return the states of their aggregates to be merged.
+    """
+    archive_files = []
+    for archive_file in get_archive_files(args.file, args.arch_count, oldest):
+        archive_files.append(archive_file)
+        parsed = None
+        with open_archive(archive_file) as fh:
+            for line in fh:
+                parsed = parse_line(line, args)
+                if parsed is not None:
+                    break
+        # The older archives end before the period if this one starts so
+        if parsed is not None and parsed[0] <= oldest:
+            break
+
+    options = Namespace(
+        format=args.format,
+        field_names=args.field_names,
+        columns_num=args.columns_num,
+        time_column=args.time_column,
+        time_format=args.time_format,
+    )
+    jobs = [
+        (f, [m.arg for m in args.metric], oldest, options)
+        for f in archive_files
+    ]
+    workers = min(len(jobs), args.arch_workers, os.cpu_count() or 1)
+    if workers > 1:
+        from multiprocessing import get_context
+
+        context = get_context('fork')
+        with context.Pool(workers) as pool:
+            results = pool.starmap(read_archive, jobs)
+    else:
+        results = [read_archive(*job) for job in jobs]
+
+    for states in results:
+        for metric, state in zip(args.metric, states):
+            aggregate = metric.create_aggregate()
+            aggregate.load_state(state)
+            metric.aggregate.merge(aggregate)
+
+
+def read_archive(filename, metric_args, oldest, options):
+    """Return the states of the aggregates of the period in the archive"""
+    logging.getLogger().debug('Parsing archive file: {}'.format(filename))
+    named = options.format != 'plain'
+    metrics = [Metric(arg, named) for arg in metric_args]
+    with open_archive(filename) as fh:
+        for line in fh:
+            parsed = parse_line(line, options)
+            if parsed is None or parsed[0] <= oldest:
+                continue
+            for metric in metrics:
+                metric.aggregate.add(metric.estimate_columns_value(parsed[1]))
+    return [metric.aggregate.to_state() for metric in metrics]
+
+
+def read_full(args):
+    """Read the period from the end of the file into the metrics"""
+    if not exists(args.file):
+        exit(0)
+    metrics = args.metric
+    # The full scan stops at the first line out of any of the periods
+    oldest = (
+        max(m.now for m in metrics) - min(m.get_timeshift() for m in metrics)
+    )
+    offset = seek_timestamp(
+        args.file, oldest + 1, lambda l: parse_timestamp(l, args), args.slack
+    )
+    if offset:
+        # The lines before the offset are older, also the ones of the archive
+        read_forward(args, offset, oldest)
+        return
 
     file_was_readed = True
 
     # Read from the end of file until the timestamp is satisfying conditions
-    data = read_logfile_reverse(
-        args.file, args.columns_num, args.time_column,
-        args.time_format, metrics=args.metric
-    )
+    data = read_logfile_reverse(args.file, args)
     for log_value in data:
         # Stop reading if next line has bigger timestamp as a required
         if not log_value:
@@ -357,23 +703,219 @@ def main():  # NOQA: C901
     # If the main file was read completely and there is arch flag then
     # check archive files for the presence of a timestamp satisfying condition
     if args.arch and file_was_readed:
-        archive_pattern = re.compile(r'{}\.1\.gz'.format(
-            os.path.basename(args.file)))  # parse only first (newest) archive
-        for root, dirs, files in os.walk(os.path.dirname(args.file)):
-            for f in files:
-                if archive_pattern.search(f):
-                    archive_file = os.path.join(root, f)
-                    logging.getLogger().debug(
-                        'Parsing archive file: {}'.format(f))
-                    with gzip.open(archive_file, 'rt', encoding='utf-8') as fh:
-                        for line in fh:
-                            get_metrics_values(
-                                line,
-                                args.metric,
-                                args.time_format,
-                                args.columns_num,
-                                args.time_column,
-                            )
+        read_archives(args, oldest)
+
+
+class IncrementalState:
+    """Position in the log file and the aggregates of the period in buckets"""
+
+    def __init__(self, config, granularity):
+        self.config = config
+        self.granularity = granularity
+        self.inode = None
+        self.offset = 0
+        self.last_values = None
+        # Start of the bucket -> aggregates of every metric
+        self.buckets = {}
+
+    @classmethod
+    def load(cls, filename, config, granularity, metrics):
+        state = cls(config + [granularity], granularity)
+        try:
+            with open(filename) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return state
+        # The values cannot be reused after the arguments are changed
+        if data.get('config') != state.config:
+            return state
+
+        state.inode = data['inode']
+        state.offset = data['offset']
+        state.last_values = data['last_values']
+        for timestamp, saved in data['buckets'].items():
+            aggregates = state.buckets[int(timestamp)] = [
+                m.create_aggregate() for m in metrics
+            ]
+            for aggregate, aggregate_state in zip(aggregates, saved):
+                aggregate.load_state(aggregate_state)
+        return state
+
+    def save(self, filename):
+        data = {
+            'config': self.config,
+            'inode': self.inode,
+            'offset': self.offset,
+            'last_values': self.last_values,
+            'buckets': {
+                timestamp: [a.to_state() for a in aggregates]
+                for timestamp, aggregates in self.buckets.items()
+            },
+        }
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        with open(filename + '.tmp', 'w') as fh:
+            json.dump(data, fh)
+        os.replace(filename + '.tmp', filename)
+
+    def add(self, timestamp, fields, metrics):
+        timestamp -= timestamp % self.granularity
+        aggregates = self.buckets.get(timestamp)
+        if aggregates is None:
+            aggregates = self.buckets[timestamp] = [
+                m.create_aggregate() for m in metrics
+            ]
+        for aggregate, metric in zip(aggregates, metrics):
+            aggregate.add(metric.estimate_columns_value(fields))
+
+    def expire(self, oldest):
+        for timestamp in list(self.buckets):
+            if timestamp + self.granularity - 1 <= oldest:
+                del self.buckets[timestamp]
+
+    def fill_metrics(self, metrics, timeshift):
+        """Set the values of the metrics like the full scan does"""
+        for index, metric in enumerate(metrics):
+            if self.last_values is not None:
+                metric.last_value = self.last_values[index]
+            oldest = metric.now - timeshift
+            # The full scan adds the values starting from the newest ones
+            for timestamp in sorted(self.buckets, reverse=True):
+                # The bucket at the beginning is added completely
+                if timestamp + self.granularity - 1 <= oldest:
+                    break
+                metric.aggregate.merge(self.buckets[timestamp][index])
+
+
+def read_forward(args, offset, oldest):
+    """Read the period from the offset to the end of the file"""
+    last_fields = None
+    with open(args.file, 'rb') as fh:
+        fh.seek(offset)
+        for line in fh:
+            line = line.decode(errors='replace')
+            if line.strip():
+                last_fields = split_fields(line, args)
+            parsed = parse_line(line, args)
+            if parsed is None:
+                continue
+            timestamp, fields = parsed
+            if timestamp <= oldest:
+                continue
+            for metric in args.metric:
+                metric.aggregate.add(metric.estimate_columns_value(fields))
+    if last_fields is not None:
+        for metric in args.metric:
+            metric.last_value = metric.estimate_columns_value(last_fields)
+
+
+def parse_timestamp(line, args):
+    """Return the timestamp of the line given as bytes or None if it has none
+
+    The timestamp is returned as an int of the seconds since the epoch.
+    """
+    try:
+        parsed = parse_line(line.decode(errors='replace'), args)
+    except (ValueError, IndexError):
+        return None
+    return parsed and parsed[0]
+
+
+def split_fields(line, args):
+    """Return the fields of the line as a list or as a dict if named"""
+    if args.format == 'plain':
+        return line.split()
+    return _extractors[args.format](line, args.field_names)
+
+
+def parse_line(line, args):
+    """Return the timestamp and the fields of the line or None to skip"""
+    fields = split_fields(line, args)
+    if args.format == 'plain':
+        if not fields or args.columns_num and len(fields) != args.columns_num:
+            return None
+        timestamp_value = extract_value(fields[args.time_column])
+    else:
+        timestamp_value = fields.get(args.time_column)
+        if timestamp_value is None:
+            return None
+    return convert_to_timestamp(timestamp_value, args.time_format), fields
+
+
+def read_incremental(args):
+    """Read the lines appended since the previous run into the metrics"""
+    if not exists(args.file):
+        exit(0)
+
+    metrics = args.metric
+    state_file = args.state_file or join(
+        DEFAULT_STATE_DIR, args.prefix + '.logfile'
+    )
+    # The full scan stops at the first line out of any of the periods
+    timeshift = min(m.get_timeshift() for m in metrics)
+    granularity = args.granularity or max(timeshift // STATE_BUCKETS, 1)
+    state = IncrementalState.load(state_file, [
+        args.file, args.columns_num, args.time_column, args.time_format,
+        [m.arg for m in metrics], args.format,
+    ], granularity, metrics)
+    oldest = max(m.now for m in metrics) - timeshift
+
+    if state.inode is None:
+        # Fill the period on the first run by reading backwards
+        tail = LogTail(args.file)
+        tail.seek_end()
+        reached_start = True
+        for line in read_lines_reverse(args.file, tail.offset):
+            if state.last_values is None:
+                fields = split_fields(line, args)
+                state.last_values = [
+                    m.estimate_columns_value(fields) for m in metrics
+                ]
+            parsed = parse_line(line, args)
+            if parsed is None:
+                continue
+            if parsed[0] <= oldest:
+                reached_start = False
+                break
+            state.add(parsed[0], parsed[1], metrics)
+        if args.arch and reached_start:
+            archive_files = get_archive_files(
+                args.file, args.arch_count, oldest
+            )
+            for archive_file in archive_files:
+                with open_archive(archive_file) as fh:
+                    for line in fh:
+                        parsed = parse_line(line, args)
+                        if parsed is not None and parsed[0] > oldest:
+                            state.add(parsed[0], parsed[1], metrics)
+    else:
+        tail = LogTail(args.file, state.inode, state.offset)
+        for line in tail:
+            fields = split_fields(line, args)
+            if fields:
+                state.last_values = [
+                    m.estimate_columns_value(fields) for m in metrics
+                ]
+            parsed = parse_line(line, args)
+            if parsed is not None:
+                state.add(parsed[0], parsed[1], metrics)
+
+    state.fill_metrics(metrics, timeshift)
+    state.expire(min(m.now for m in metrics) - timeshift)
+    state.inode = tail.inode
+    state.offset = tail.offset
+    state.save(state_file)
+
+
+def main():
+    args = parse_args()
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+        logging.getLogger().addHandler(logging.StreamHandler())
+
+    if args.incremental:
+        read_incremental(args)
+    else:
+        read_full(args)
 
     for metric in args.metric:
         template = args.prefix + '.{} {} ' + str(metric.now)
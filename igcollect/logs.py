@@ -11,12 +11,20 @@ see how many errors occur and how many duplicates you have.
 python logs.py myfile.log 15m "([0-9]{2}-?){3} ([0-9]{2}:?){3}" \
     "%y-%m-%d %H:%M:%S" "(\[ERROR\].*)" --verbose
 
+To count several kinds of messages in one pass, they can be named:
+
+python logs.py myfile.log 15m "([0-9]{2}-?){3} ([0-9]{2}:?){3}" \
+    "%y-%m-%d %H:%M:%S" --pattern error "(\[ERROR\].*)" \
+    --pattern timeout "(timed out.*)" --total
+
+The file is read backwards from the end, and the reading stops at the
+first line older than the timeshift by more than --slack seconds.
+
 Copyright (c) 2017 InnoGames GmbH
 """
 
 import re
 import logging
-import hashlib
 import argparse
 import datetime
 
@@ -24,6 +32,8 @@ from os import environ
 from os.path import isfile, expanduser
 from time import time, tzset
 
+from lib_logfile import read_lines_reverse
+
 
 def parse_args():
     """Parse arguments"""
@@ -37,8 +47,12 @@ def parse_args():
                         help='e.g. ([0-9]{2}-?){3} ([0-9]{2}:?){3}')
     parser.add_argument('time_format',
                         help='e.g. %%y-%%m-%%d %%H:%%M:%%S')
-    parser.add_argument('message_regex',
+    parser.add_argument('message_regex', nargs='?',
                         help='e.g. ([ERROR].*)')
+    parser.add_argument('--pattern', '-p', nargs=2, action='append',
+                        default=[], metavar=('NAME', 'MESSAGE_REGEX'),
+                        help='count the messages matching the regex '
+                        'separately under the name, can be repeated.')
     parser.add_argument('--prefix', default='logs')
     parser.add_argument('--timezone', '-z',
                         help='overwrite system timezone e.g. Europe/Berlin')
@@ -46,12 +60,17 @@ def parse_args():
                         help='print number of unique events matching.')
     parser.add_argument('--total', '-t', action='store_true',
                         help='print number of total events matching.')
+    parser.add_argument('--slack', type=int, default=60,
+                        help='seconds the lines may be out of order.')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='print total and unique and with pretty text.')
     parser.add_argument('--debug', '-d', action='store_true',
                         help='enable debug output - useful to see regex match')
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.message_regex and not args.pattern:
+        parser.error('message_regex or --pattern is required')
+    return args
 
 
 def main():
@@ -66,69 +85,102 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
 
     logging.getLogger().addHandler(logging.StreamHandler())
-    errors = dict()
-    errors_total = 0
+    patterns = []
+    if args.message_regex:
+        patterns.append((None, re.compile(args.message_regex)))
+    for name, message_regex in args.pattern:
+        patterns.append((name, re.compile(message_regex)))
+    # The name of the pattern -> the hash of the message -> count
+    errors = {name: dict() for name, message_regex in patterns}
+    prefilter = get_prefilter(patterns)
     timeshift = get_datetime_timeshift(args.timeshift)
 
     logging.getLogger().debug('matchings logs since %s', timeshift)
 
     if isfile(expanduser(args.file)):
-        with open(args.file, mode='r') as f:
-
-            # @TODO maybe it is possible to read file backwards and stop if
-            # timeshift is exceeded so that we do not have to parse the
-            # complete file every run.
-            for line in f:
-                logging.getLogger().debug('parsing line %s', line)
-                time_string, message_string = get_datetime_and_message(
-                    line,
-                    args.time_regex,
-                    args.time_format,
-                    args.message_regex
-                )
-
-                if (
-                    (time_string and message_string) and
-                    (time_string >= timeshift)
-                ):
+        time_regex = re.compile(args.time_regex)
+        stop = timeshift - datetime.timedelta(seconds=args.slack)
+
+        for line in read_lines_reverse(args.file):
+            logging.getLogger().debug('parsing line %s', line)
+            time_string = get_datetime(line, time_regex, args.time_format)
+            if not time_string:
+                continue
+            if time_string < timeshift:
+                # The lines may be out of order up to the slack
+                if time_string < stop:
+                    break
+                continue
+
+            # The messages are only searched in the lines in time range
+            if prefilter and not prefilter.search(line):
+                continue
+            for name, message_regex in patterns:
+                message_string = get_message(line, message_regex)
+                if message_string:
                     logging.getLogger().debug(
                         'message is in time range: evaluating'
                     )
-                    message_hash = hashlib.md5(
-                        message_string.encode('utf-8')
-                    ).hexdigest()
-                    logging.getLogger().debug(
-                        'hash for message is %s', message_hash
-                    )
-
-                    if message_hash not in errors:
-                        logging.getLogger().debug(
-                            'new message %s', message_hash
-                        )
-                        errors[message_hash] = 1
-                    else:
-                        logging.getLogger().debug(
-                            'found message %s', message_hash
-                        )
-                        errors[message_hash] += 1
-
-    errors_unique = len(errors)
-    for matches in errors.values():
-        errors_total += matches
+                    count_message(errors[name], message_string)
+
+    timestamp = str(int(time()))
+    filename = args.file.replace('.', '_').lower().rsplit('/').pop()
+    for name, message_regex in patterns:
+        errors_unique = len(errors[name])
+        errors_total = sum(errors[name].values())
+
+        if args.verbose:
+            label = '' if name is None else name + ': '
+            print('{}{} unique errors'.format(label, errors_unique))
+            print('{}{} errors total'.format(label, errors_total))
+        else:
+            metric_path = '{}.{}'.format(args.prefix, filename)
+            if name is not None:
+                metric_path += '.' + name
+
+            if args.total:
+                print('{} {} {}'.format(metric_path, errors_total, timestamp))
+            if args.unique:
+                print('{} {} {}'.format(metric_path, errors_unique, timestamp))
 
     if args.verbose:
-        print('{} unique errors'.format(errors_unique))
-        print('{} errors total'.format(errors_total))
         print('timeshift {}'.format(timeshift))
-    else:
-        timestamp = str(int(time()))
-        filename = args.file.replace('.', '_').lower().rsplit('/').pop()
-        metric_path = '{}.{}'.format(args.prefix, filename)
 
-        if args.total:
-            print('{} {} {}'.format(metric_path, errors_total, timestamp))
-        if args.unique:
-            print('{} {} {}'.format(metric_path, errors_unique, timestamp))
+
+def get_prefilter(patterns):
+    """Combine the patterns to skip the lines matching none in one search
+
+    The patterns with back references cannot be combined, because the
+    numbers of their groups change, so they are searched one by one
+    -> compiled regex or None
+    """
+    if len(patterns) < 2:
+        return None
+    if any(
+        re.search(r'\\\d|\(\?P=', message_regex.pattern)
+        for name, message_regex in patterns
+    ):
+        return None
+    try:
+        return re.compile('|'.join(
+            '(?:{})'.format(message_regex.pattern)
+            for name, message_regex in patterns
+        ))
+    except re.error:
+        return None
+
+
+def count_message(errors, message_string):
+    """Count the message by its hash, which is only used within the run"""
+    message_hash = hash(message_string)
+    logging.getLogger().debug('hash for message is %s', message_hash)
+
+    if message_hash not in errors:
+        logging.getLogger().debug('new message %s', message_hash)
+        errors[message_hash] = 1
+    else:
+        logging.getLogger().debug('found message %s', message_hash)
+        errors[message_hash] += 1
 
 
 def get_datetime_timeshift(timeshift):
@@ -149,38 +201,32 @@ def get_datetime_timeshift(timeshift):
         return datetime.datetime.fromtimestamp(0)
 
 
-def get_datetime_and_message(line, time_regex, time_format, message_regex):
-    """Parse datetime and message matching schema -> datetime, str"""
-    time_string = None
-    message_string = None
-
-    logging.getLogger().debug(
-        'searching for regex %s in %s', time_regex, line
-    )
-    time_match = re.search(time_regex, line)
-    if time_match and len(time_match.groups()):
-        raw_string = time_match.group(0)
-        logging.getLogger().debug('match group is %s', raw_string)
-        try:
-            time_string = datetime.datetime.strptime(raw_string, time_format)
-            logging.getLogger().debug('parsed time is %s', time_string)
-        except ValueError:
-            logging.getLogger().error(
-                'can not parse time %s with time regex %s', raw_string,
-                time_format
-            )
-
-        # makes only sense to continue and parse message_string fi we have a
-        # time_string otherwise we could not compare it to timeshift.
-        logging.getLogger().debug(
-            'searching for regex %s in %s', message_regex, line
+def get_datetime(line, time_regex, time_format):
+    """Parse datetime matching the compiled regex -> datetime or None"""
+    time_match = time_regex.search(line)
+    if not time_match or not len(time_match.groups()):
+        return None
+    raw_string = time_match.group(0)
+    logging.getLogger().debug('match group is %s', raw_string)
+    try:
+        time_string = datetime.datetime.strptime(raw_string, time_format)
+    except ValueError:
+        logging.getLogger().error(
+            'can not parse time %s with time regex %s', raw_string,
+            time_format
         )
-        message_match = re.search(message_regex, line)
-        if message_match and len(message_match.groups()):
-            message_string = message_match.group(0)
-            logging.getLogger().debug('match group is %s', message_string)
-
-    return time_string, message_string
+        return None
+    logging.getLogger().debug('parsed time is %s', time_string)
+    return time_string
+
+
+def get_message(line, message_regex):
+    """Parse message matching the compiled regex -> str or None"""
+    message_match = message_regex.search(line)
+    if not message_match or not len(message_match.groups()):
+        return None
+    logging.getLogger().debug('match group is %s', message_match.group(0))
+    return message_match.group(0)
 
 
 if __name__ == '__main__':
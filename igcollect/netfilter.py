@@ -6,8 +6,6 @@ Copyright (c) 2023 InnoGames GmbH
 
 
 from argparse import ArgumentParser
-from nftables import Nftables
-from nftables import json
 from subprocess import check_output
 from time import time
 
@@ -63,6 +61,10 @@ def get_snat_info(snats):
 
 
 def get_counters_info():
+    # nftables loads libnftables, so it is imported only when used
+    from nftables import Nftables
+    from nftables import json
+
     ret = {}
     nft = Nftables()
     nft.set_json_output(True)
@@ -11,6 +11,9 @@ from psycopg2 import connect
 from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 from psycopg2.extras import RealDictCursor
 
+from lib_graphite import GraphiteEmitter
+from lib_runner import resident
+
 
 def parse_args():
     parser = ArgumentParser()
@@ -23,7 +26,23 @@ def parse_args():
 def main():
     args = parse_args()
 
-    conn = connect(database=args.dbname)
+    # The connection is kept open between the runs by the daemon
+    conn = resident(
+        ('postgres', args.dbname),
+        lambda: get_connection(args.dbname),
+        alive=lambda conn: not conn.closed,
+    )
+    try:
+        with GraphiteEmitter(args.prefix, int(time())) as emitter:
+            collect(args, conn, emitter)
+    finally:
+        # Don't keep the snapshot of the repeatable read transaction open
+        # until the next run
+        conn.rollback()
+
+
+def get_connection(dbname):
+    conn = connect(database=dbname)
     conn.set_session(
         isolation_level=ISOLATION_LEVEL_REPEATABLE_READ,
         readonly=True,
@@ -32,12 +51,16 @@ def main():
     # Set a lock_timeout of 10s to avoid piling up queries in case something is locked for a longer time
     with conn.cursor() as cur:
         cur.execute("SET lock_timeout = 10000;")  # 10 seconds
+    # The setting would be reverted by the rollback after the first run
+    conn.commit()
+
+    return conn
 
+
+def collect(args, conn, emitter):
     # Get PostgreSQL version, as some statistics are version dependent
     version = get_postgres_version(conn)
 
-    # To be formatted 2 times
-    template = '{}.{{}}.{{}} {{}} {}'.format(args.prefix, int(time()))
     # Database statistics
     for line in execute(conn, (
         'SELECT pg_database_size(d.oid) as size,'
@@ -63,7 +86,7 @@ def main():
     ), (args.dbname,)):
         for key, value in line.items():
             if value is not None:
-                print(template.format('database', key, value))
+                emit(emitter, 'database', key, value)
 
     # Table statistics
     for line in execute(conn, (
@@ -85,7 +108,7 @@ def main():
     )):
         for key, value in line.items():
             if value is not None:
-                print(template.format('tables', key, value))
+                emit(emitter, 'tables', key, value)
 
     # Connection counts
     for line in execute(conn, (
@@ -95,7 +118,7 @@ def main():
     )):
         if line['state']:
             key = line['state'].replace(' ', '_')
-            print(template.format('activity', key, line['count']))
+            emit(emitter, 'activity', key, line['count'])
 
     if args.extended:
         # Per relations statistics:
@@ -140,14 +163,14 @@ def main():
                         ]:
                             value = int(value.timestamp())
 
-                        print(template.format(postfix, key, value))
+                        emit(emitter, postfix, key, value)
 
         # bgwriter (checkpoints)
         for line in execute(conn, (
                 'SELECT * FROM pg_stat_bgwriter'
         )):
             for key, value in line.items():
-                print(template.format('bgwriter', key, value))
+                emit(emitter, 'bgwriter', key, value)
 
         # table size
         for line in execute(conn, ('''
@@ -157,7 +180,7 @@ def main():
                 WHERE c.relkind IN ('r', 'm') AND n.nspname NOT IN ('pg_catalog', 'information_schema')
                 ORDER BY pg_total_relation_size(c.oid) DESC;
         ''')):
-            print(template.format('table_size', line['relname'], line['pg_total_relation_size']))
+            emit(emitter, 'table_size', line['relname'], line['pg_total_relation_size'])
 
         # Autovacuum
         if version >= 170000:  # pg17 and above: max_dead_tuples->max_dead_tuple_bytes, num_dead_tuples->num_dead_item_ids
@@ -195,7 +218,7 @@ def main():
                                            line['phase'])
             for key, value in line.items():
                 if key not in ['table', 'phase'] and value is not None:
-                    print(template.format(postfix, key, value))
+                    emit(emitter, postfix, key, value)
 
         # Autovacuum wraparound protection on tables
         # https://www.cybertec-postgresql.com/en/autovacuum-wraparound-protection-in-postgresql/
@@ -218,8 +241,8 @@ def main():
             postfix = '{}.{}.{}'.format('vacuum',
                                         'tables',
                                         line['table'])
-            print(template.format(postfix, 'tx_before_wraparound_vacuum',
-                                  line['value']))
+            emit(emitter, postfix, 'tx_before_wraparound_vacuum',
+                 line['value'])
 
         # Locks
         for line in execute(conn, (
@@ -227,7 +250,7 @@ def main():
         )):
             postfix = '{}.{}'.format('database',
                                      'locks')
-            print(template.format(postfix, line['mode'], line['value']))
+            emit(emitter, postfix, line['mode'], line['value'])
 
         # Archiver
         for line in execute(conn, (
@@ -238,7 +261,7 @@ def main():
                                         'archiver')
             for key, value in line.items():
                 if value is not None:
-                    print(template.format(postfix, key, value))
+                    emit(emitter, postfix, key, value)
 
          # Replication
         for line in execute(conn, (
@@ -249,8 +272,13 @@ def main():
             postfix = '{}.{}'.format('replication',
                                      'replay_lag',
                                     )
-            print(template.format(postfix, line['hostname'].replace('.', '_'),
-                                  line['replay_lag']))
+            emit(emitter, postfix, line['hostname'].replace('.', '_'),
+                 line['replay_lag'])
+
+
+def emit(emitter, group, key, value):
+    emitter.emit('{}.{}'.format(group, key), value)
+
 
 def get_postgres_version(conn) -> int:
     """Fetch the PostgreSQL version number."""
@@ -1,13 +1,23 @@
 #!/usr/bin/env python3
 '''igcollect - Rsyslog impstats log parser
 
+Only the last stats of every action are reported, so the log is read
+backwards from the end.  With --rates the enqueued and discarded messages
+are reported per second too.
+
 Copyright (c) 2019 InnoGames GmbH
 '''
 
-import re
 from argparse import ArgumentParser
 from time import time
 
+from lib_graphite import GraphiteEmitter
+from lib_logfile import read_lines_reverse
+from lib_state import add_rate_arguments, emit_counter, get_counter_store
+
+# The other stats are counters
+GAUGES = {'size'}
+
 
 def parse_args():
     parser = ArgumentParser()
@@ -18,49 +28,92 @@ def parse_args():
         choices=['size', 'enqueued', 'discarded_full'],
         default=['size', 'enqueued', 'discarded_full']
     )
+    add_rate_arguments(parser)
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
+    timestamp = int(time())
+    store = get_counter_store(args)
     stats = parse_log(args.filename)
 
-    used_fields = set(args.stats)
+    used_fields = list(dict.fromkeys(args.stats))
 
-    template = args.prefix + '.{}.{} {} ' + str(int(time()))
-    for action, stat in stats.items():
-        for field in used_fields:
-            print(template.format(action, field, stat[field]))
+    with GraphiteEmitter(args.prefix, timestamp) as emitter:
+        for action, stat in stats.items():
+            for field in used_fields:
+                path = action + '.' + field
+                if field in GAUGES:
+                    emitter.emit(path, stat[field])
+                else:
+                    emit_counter(
+                        emitter, store, args.rates, path, stat[field],
+                        timestamp
+                    )
 
 
 def parse_log(filename):
+    """Return the last stats of every action
+
+    The file is read backwards from the end until an action is seen again,
+    as then all of them were seen in the last interval of impstats.
+    """
     actions = {}
 
-    with open(filename) as pstats_file:
-        # Nov 5 00:00:00 localhost rsyslogd-pstats: action-3-builtin:omfwd:\
-        #  queue: origin=core.queue size=0 enqueued=176432440 full=0\
-        #  discarded.full=0 discarded.nf=0 maxqsize=92057
-        regex = re.compile(
-            r'(?P<action>action-\d+).* queue(?P<is_DA>\[DA\]|)'
-            r': .*size=(?P<size>\d+) enqueued=(?P<enqueued>\d+)'
-            r' .* discarded\.full=(?P<discarded_full>\d+)'
-        )
-        for line in pstats_file:
-            match = regex.search(line)
-            if not match:
-                continue
-
-            stats = match.groupdict()
-            action_name = stats.pop('action').replace('-', '')
-            is_DA = bool(stats.pop('is_DA'))
-
-            # If we use disk assisted queues, we want those stats as well
-            if is_DA:
-                actions[action_name + '_DA'] = stats
-            else:
-                actions[action_name] = stats
+    for line in read_lines_reverse(filename):
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        action_name, stats = parsed
+        if action_name in actions:
+            break
+        actions[action_name] = stats
     return actions
 
 
+def parse_line(line):
+    """Return the name of the action and its stats or None
+
+    Nov 5 00:00:00 localhost rsyslogd-pstats: action-3-builtin:omfwd\
+     queue: origin=core.queue size=0 enqueued=176432440 full=0\
+     discarded.full=0 discarded.nf=0 maxqsize=92057
+    """
+    start = line.find('action-')
+    if start < 0:
+        return None
+    end = start + 7
+    while end < len(line) and line[end].isdigit():
+        end += 1
+    if end == start + 7:
+        return None
+    action_name = 'action' + line[start + 7:end]
+
+    queue = line.find(' queue', end)
+    if queue < 0:
+        return None
+    queue += 6
+    # If we use disk assisted queues, we want those stats as well
+    if line.startswith('[DA]', queue):
+        action_name += '_DA'
+        queue += 4
+    if not line.startswith(': ', queue):
+        return None
+
+    fields = {}
+    for token in line[queue + 2:].split():
+        key, sep, value = token.partition('=')
+        if sep:
+            fields[key] = value
+    try:
+        return action_name, {
+            'size': int(fields['size']),
+            'enqueued': int(fields['enqueued']),
+            'discarded_full': int(fields['discarded.full']),
+        }
+    except (KeyError, ValueError):
+        return None
+
+
 if __name__ == '__main__':
     main()
@@ -5,13 +5,33 @@ Copyright (c) 2020 InnoGames GmbH
 """
 
 # This script is used to collect statuscodes out of the logs of nginx and
-# similar services
+# similar services.  In the same pass it can aggregate the request and the
+# upstream response times into percentiles and histograms, for all the
+# requests, per status class and per vhost.
+#
+# With --incremental only the entries appended since the previous run are
+# read.  They are counted in the periods of their own times, and every
+# period is printed with its start as the timestamp once it has ended.
 
 import argparse
-import datetime
+import calendar
+import json
+import os
 import time
 
 from collections import Counter
+from math import isfinite
+
+from lib_aggregate import Aggregate, Histogram, format_bound
+from lib_logfile import LogTail, TimestampParser, seek_timestamp
+from lib_state import DEFAULT_STATE_DIR
+
+TIME_FORMAT = '%d/%b/%Y:%H:%M:%S'
+# The upper bounds of the buckets of the response times in seconds
+DEFAULT_BUCKETS = '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10'
+QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+# How many periods are kept to be corrected by the entries written late
+KEPT_PERIODS = 10
 
 
 def parse_args():
@@ -35,9 +55,65 @@ def parse_args():
     parser.add_argument('-p', '--prefix',
                         default='nginx',
                         help='the path to the value in Graphite ')
+    parser.add_argument('--period', type=int, default=60,
+                        help='how many seconds to count the entries of ')
+    parser.add_argument('-s', '--slack', type=int, default=10,
+                        help='how many seconds the entries may be out of '
+                        'order ')
+    parser.add_argument('--request-time', type=field,
+                        help='position or name of the key=value field of '
+                        'the request time in seconds ')
+    parser.add_argument('--upstream-time', type=field,
+                        help='position or name of the key=value field of '
+                        'the upstream response time in seconds ')
+    parser.add_argument('--vhost', type=field,
+                        help='position or name of the key=value field of '
+                        'the vhost to break the requests down by ')
+    parser.add_argument('--buckets', type=buckets, default=DEFAULT_BUCKETS,
+                        help='upper bounds of the buckets of the histograms '
+                        'of the times ')
+    parser.add_argument('--incremental', action='store_true',
+                        help='read only the entries appended since the '
+                        'previous run and print the completed periods by '
+                        'the times of the entries ')
+    parser.add_argument('--state-file',
+                        help='file to keep the position and the counts of '
+                        'the recent periods for --incremental, by default '
+                        'named after the prefix in ' + DEFAULT_STATE_DIR)
     return parser.parse_args()
 
 
+def field(value):
+    """
+    field
+
+    converts the argument of a field of the log
+
+    :param value: the position of the field or the key of a key=value field
+    :return: the position as int or the key with "=" as bytes
+    """
+
+    if value.isdigit():
+        return int(value)
+    return value.encode() + b'='
+
+
+def buckets(value):
+    """
+    buckets
+
+    converts the argument of the buckets of the histograms
+
+    :param value: the comma separated upper bounds
+    :return: the list of the upper bounds
+    """
+
+    try:
+        return sorted(float(bound) for bound in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError('Buckets must be numbers')
+
+
 def main():
     """
 
@@ -50,143 +126,529 @@ def main():
 
     args = parse_args()
     prob_time = int(time.time())
-    search_time = datetime.datetime.utcnow()
 
-    with open(args.logfile) as log:
+    if args.incremental:
+        for start, codes, latencies in read_incremental(args, prob_time):
+            print_metrics(args.prefix, codes, latencies, start)
+        return
+
+    latencies = new_latencies(args)
+    codes, total = count_statuscodes(
+        args.logfile, prob_time - args.period, args.time, args.position,
+        args.slack, latencies)
+    print_metrics(args.prefix, codes, latencies, prob_time)
 
-        log_for_period = get_log_for_period(log, search_time, 60, args.time)
 
-        codes, total = count_uniq_statuscodes(log_for_period, args.position)
+def new_latencies(args):
+    """
+    new latencies
 
-        template = args.prefix + '{}.{} {} {}'
+    creates the Latencies for the arguments
 
-        for code in codes.keys():
-            print(template.format(
-                '.status_codes', code, codes[code], prob_time))
+    :param args: the arguments
+    :return: the Latencies or None if no times are aggregated
+    """
 
-        print(template.format('', 'requests', total, prob_time))
+    timings = [
+        (name, position) for name, position in (
+            ('request_time', args.request_time),
+            ('upstream_time', args.upstream_time),
+        ) if position is not None
+    ]
+    if not timings and args.vhost is None:
+        return None
+    return Latencies(timings, args.vhost, args.buckets)
 
 
-def get_log_for_period(log, timedate_at_start, period_in_sec, time_position):
+def print_metrics(prefix, codes, latencies, timestamp):
     """
-    get log gor period
+    print metrics
 
-    this algorithm is designed to search for the given timespan with as low of
-    performance impact as possible so it searches for the beginning and the
-    end of the period its looking for.
+    prints the counts of a period
 
-    :param log: the logfile
-    :param timedate_at_start: what time the script started
-    :param period_in_sec: how long the period to search is in seconds
-    :param time_position: which position the time has in the log file
-    :return: the log for the period found
-    """
-
-    start = 0
-    stop = 0
-
-    # search for first entry of period to check:
-    for i in range(period_in_sec):
-        start = find_row(
-            log, timedate_at_start, -period_in_sec + i, time_position)
-        if start != -1:
-            break
-
-    # search for the last entry in the period (if exists):
-    stop = find_row(log, timedate_at_start, 1, time_position, start) - 1
-    for i in range(10):
-        stop = find_row(log, timedate_at_start, 1, time_position)
-        if stop != -1:
-            stop -= 1
-            break
-
-    # return everything in this period:
-    log_for_period = []
-    if stop == -1:
-        log.seek(0)
-        for line, entry in enumerate(log):
-            if line >= start:
-                log_for_period.append(entry.split(' '))
-    else:
-        log.seek(0)
-        for line, entry in enumerate(log):
-            if line >= start and line <= stop:
-                log_for_period.append(entry.split(' '))
+    :param prefix: the path to the values in Graphite
+    :param codes: the statuscodes and how often they got found
+    :param latencies: the Latencies or None
+    :param timestamp: the time of the period
+    :return:
+    """
+
+    template = prefix + '{}.{} {} {}'
+
+    for code in codes.keys():
+        print(template.format(
+            '.status_codes', code.decode(), codes[code], timestamp))
+
+    print(template.format('', 'requests', sum(codes.values()), timestamp))
 
-    return log_for_period
+    if latencies is not None:
+        for path, value in latencies.metrics():
+            print(template.format('', path, value, timestamp))
 
 
-def count_uniq_statuscodes(log, position):
+def count_statuscodes(logfile, start, time_position, position, slack,
+                      latencies=None):
     """
-    count uniq statuscodes
+    count statuscodes
 
-    looks up witch and how often witch statuscode was found
+    counts the statuscodes of the entries since the start in a single pass.
+    the first entry of the period is searched by bisecting the logfile, so
+    only the entries of the period and the ones up to slack seconds before
+    are read.
 
-    :param log: the logfile
+    :param logfile: the path of the logfile
+    :param start: the epoch seconds the period starts at
+    :param time_position: which position the time has in the log file
     :param position: the position of the statuscode in the log
+    :param slack: how many seconds the entries may be out of order
+    :param latencies: the Latencies to add the entries to in the same pass
     :return: a dict of statuscodes and how often they got found, and the total
              amount of statuscodes
     """
 
-    statuscodes = []
-    for entry in log:
-        statuscodes.append(entry[position])
-    statuscodes_counted = Counter(statuscodes)
+    parser = TimestampParser(TIME_FORMAT, parse_time)
+    offset = seek_timestamp(
+        logfile, start,
+        lambda entry: get_timestamp(entry, time_position, parser), slack)
+
+    statuscodes = Counter()
+    with open(logfile, 'rb') as log:
+        log.seek(offset)
+        for entry in log:
+            # The last field must not end with the line ending
+            entry = entry.rstrip(b'\r\n')
+            timestamp = get_timestamp(entry, time_position, parser)
+            if timestamp is None or timestamp < start:
+                continue
+            count_entry(entry, position, statuscodes, latencies)
 
-    return statuscodes_counted, len(statuscodes)
+    return statuscodes, sum(statuscodes.values())
 
 
-def get_position(position, entry):
+def count_entry(entry, position, statuscodes, latencies=None):
     """
-    get position
+    count entry
 
-    returns a position out of a string
+    counts the statuscode of an entry and adds its times
 
-    :param position: the position in the string
-    :param entry: the string
+    :param entry: the entry as bytes
+    :param position: the position of the statuscode in the log
+    :param statuscodes: the Counter of the statuscodes
+    :param latencies: the Latencies or None
     :return:
     """
 
-    return entry.split(' ')[position]
+    try:
+        code = entry.split(b' ', position + 1)[position]
+    except IndexError:
+        return
+    statuscodes[code] += 1
+    if latencies is not None:
+        latencies.add(entry, code)
+
+
+def read_incremental(args, now):
+    """
+    read incremental
+
+    reads the entries appended since the previous run and counts them in
+    the periods of their own times.  the periods are returned after they
+    ended and no more entries are expected for them, which is after the
+    slack.  the periods changed by the entries written even later are
+    returned again, so the values in Graphite are replaced with the
+    corrected ones.  the periods without entries are returned too, so
+    they are reported with 0 requests.
+
+    :param args: the arguments
+    :param now: the current time as epoch seconds
+    :return: the starts of the completed periods with their statuscodes and
+             Latencies
+    """
+
+    if not os.path.exists(args.logfile):
+        return []
+
+    state_file = args.state_file or os.path.join(
+        DEFAULT_STATE_DIR, args.prefix + '.statuscodes')
+    config = [
+        args.logfile, args.time, args.position, args.period,
+        repr(args.request_time), repr(args.upstream_time), repr(args.vhost),
+        args.buckets,
+    ]
+    state = IncrementalState.load(
+        state_file, config, lambda: new_latencies(args))
+    oldest = now - now % args.period - args.period * KEPT_PERIODS
+
+    end = now - args.period - args.slack
+    tail = LogTail(args.logfile, state.inode, state.offset)
+    if state.inode is None:
+        # The counting starts with the entries appended after the first run
+        tail.seek_end()
+        state.emitted = now - now % args.period - args.period
+    else:
+        parser = TimestampParser(TIME_FORMAT, parse_time)
+        for line in tail:
+            entry = line.encode().rstrip(b'\r\n')
+            timestamp = get_timestamp(entry, args.time, parser)
+            if timestamp is None or timestamp < oldest:
+                continue
+            state.add(timestamp - timestamp % args.period, entry,
+                      args.position)
+
+    state.fill(oldest, end - end % args.period, args.period)
+    completed = list(state.completed(end))
+    state.expire(oldest)
+    state.inode = tail.inode
+    state.offset = tail.offset
+    state.save(state_file)
+    return completed
+
+
+class IncrementalState(object):
+    """
+    incremental state
+
+    the position in the logfile and the counts of the recent periods
+
+    :param config: the arguments the counts are valid for
+    :param new_latencies: the function to create the Latencies of a period
+    """
+
+    def __init__(self, config, new_latencies):
+        self.config = config
+        self.new_latencies = new_latencies
+        self.inode = None
+        self.offset = 0
+        # start of the latest period filled by fill()
+        self.emitted = None
+        # start of the period -> [statuscodes, Latencies, changed]
+        self.periods = {}
+
+    @classmethod
+    def load(cls, filename, config, new_latencies):
+        """
+        load
+
+        loads the state saved by the previous run
+
+        :param filename: the state file
+        :param config: the arguments the counts are valid for
+        :param new_latencies: the function to create the Latencies
+        :return: the state, empty if the arguments were changed
+        """
+
+        state = cls(config, new_latencies)
+        try:
+            with open(filename) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return state
+        if data.get('config') != config:
+            return state
+
+        state.inode = data['inode']
+        state.offset = data['offset']
+        state.emitted = data.get('emitted')
+        for start, (codes, saved, changed) in data['periods'].items():
+            latencies = new_latencies()
+            if latencies is not None:
+                latencies.load_state(saved)
+            state.periods[int(start)] = [
+                Counter({k.encode(): v for k, v in codes.items()}),
+                latencies,
+                changed,
+            ]
+        return state
+
+    def save(self, filename):
+        """
+        save
+
+        saves the state for the next run
+
+        :param filename: the state file
+        :return:
+        """
+
+        data = {
+            'config': self.config,
+            'inode': self.inode,
+            'offset': self.offset,
+            'emitted': self.emitted,
+            'periods': {
+                start: [
+                    {k.decode(errors='replace'): v for k, v in codes.items()},
+                    latencies.to_state() if latencies is not None else None,
+                    changed,
+                ]
+                for start, (codes, latencies, changed) in self.periods.items()
+            },
+        }
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        with open(filename + '.tmp', 'w') as fh:
+            json.dump(data, fh)
+        os.replace(filename + '.tmp', filename)
+
+    def add(self, start, entry, position):
+        """
+        add
+
+        counts an entry in its period
+
+        :param start: the start of the period of the entry
+        :param entry: the entry as bytes
+        :param position: the position of the statuscode in the log
+        :return:
+        """
+
+        period = self.periods.get(start)
+        if period is None:
+            period = self.periods[start] = [
+                Counter(), self.new_latencies(), True]
+        count_entry(entry, position, period[0], period[1])
+        period[2] = True
+
+    def fill(self, oldest, last, period):
+        """
+        fill
+
+        creates the periods without entries after the latest one filled,
+        so they are returned by completed() like the others
+
+        :param oldest: the start of the oldest period to keep
+        :param last: the start of the latest completed period
+        :param period: the length of the periods in seconds
+        :return:
+        """
+
+        if self.emitted is not None:
+            first = max(self.emitted + period, oldest)
+            for start in range(first, last + 1, period):
+                if start not in self.periods:
+                    self.periods[start] = [Counter(), self.new_latencies(),
+                                           True]
+        if self.emitted is None or last > self.emitted:
+            self.emitted = last
+
+    def completed(self, end):
+        """
+        completed
+
+        yields the periods changed since they were last yielded
+
+        :param end: the latest start of the periods to yield
+        :return: the starts of the periods with their statuscodes and
+                 Latencies
+        """
+
+        for start in sorted(self.periods):
+            codes, latencies, changed = self.periods[start]
+            if start <= end and changed:
+                self.periods[start][2] = False
+                yield start, codes, latencies
+
+    def expire(self, oldest):
+        """
+        expire
+
+        forgets the periods started before the oldest time
+
+        :param oldest: the start of the oldest period to keep
+        :return:
+        """
+
+        for start in list(self.periods):
+            if start < oldest:
+                del self.periods[start]
+
+
+class Latencies(object):
+    """
+    latencies
+
+    aggregates the times of the entries into percentiles and histograms for
+    all of them, per status class like 2xx and per vhost.  the percentiles
+    are estimated within 1% of the actual times, see lib_aggregate.py.
+
+    :param timings: the names and the fields of the times to aggregate
+    :param vhost: the field of the vhost or None
+    :param bounds: the upper bounds of the buckets of the histograms
+    """
+
+    def __init__(self, timings, vhost=None, bounds=buckets(DEFAULT_BUCKETS)):
+        self.timings = timings
+        self.vhost = vhost
+        self.bounds = bounds
+        self.vhost_requests = Counter()
+        # (group, name) -> (Aggregate, Histogram)
+        self.aggregates = {}
+
+    def add(self, entry, code):
+        """
+        add
+
+        adds the times of an entry to its groups
+
+        :param entry: the entry as bytes
+        :param code: the statuscode of the entry
+        :return:
+        """
+
+        fields = entry.split(b' ')
+        groups = ['']
+        if code[:1].isdigit():
+            groups.append('status_classes.{}xx'.format(code[:1].decode()))
+        if self.vhost is not None:
+            vhost = get_field(fields, self.vhost)
+            if vhost:
+                group = 'vhosts.' + vhost.strip(b'"').decode(
+                    errors='replace').replace('.', '_')
+                self.vhost_requests[group] += 1
+                groups.append(group)
+
+        for name, position in self.timings:
+            value = parse_seconds(get_field(fields, position))
+            if value is None:
+                continue
+            for group in groups:
+                key = group, name
+                if key not in self.aggregates:
+                    self.aggregates[key] = (
+                        Aggregate(quantiles=True), Histogram(self.bounds))
+                aggregate, histogram = self.aggregates[key]
+                aggregate.add(value)
+                histogram.add(value)
+
+    def to_state(self):
+        """
+        to state
+
+        :return: the contents as a list which can be saved as JSON
+        """
+
+        return [
+            dict(self.vhost_requests),
+            [
+                [group, name, aggregate.to_state(), histogram.to_state()]
+                for (group, name), (aggregate, histogram)
+                in self.aggregates.items()
+            ],
+        ]
+
+    def load_state(self, state):
+        """
+        load state
+
+        :param state: the contents returned by to_state()
+        :return:
+        """
+
+        vhost_requests, aggregates = state
+        self.vhost_requests = Counter(vhost_requests)
+        for group, name, aggregate_state, histogram_state in aggregates:
+            aggregate = Aggregate(quantiles=True)
+            aggregate.load_state(aggregate_state)
+            histogram = Histogram(self.bounds)
+            histogram.load_state(histogram_state)
+            self.aggregates[group, name] = aggregate, histogram
+
+    def metrics(self):
+        """
+        metrics
+
+        yields the paths and the values of the metrics, the histograms count
+        the entries up to their bounds like le_0_5 for 0.5 seconds
+
+        :return: the paths and the values
+        """
+
+        for group, count in self.vhost_requests.items():
+            yield group + '.requests', count
+        for (group, name), (aggregate, histogram) in self.aggregates.items():
+            path = group + '.' + name if group else name
+            yield path + '.mean', aggregate.mean()
+            yield path + '.max', aggregate.max
+            for suffix, quantile in QUANTILES:
+                yield path + '.' + suffix, aggregate.quantile(quantile)
+            for bound, count in histogram.cumulative():
+                yield '{}.histogram.le_{}'.format(
+                    path, format_bound(bound)), count
+
+
+def get_field(fields, position):
+    """
+    get field
+
+    returns a field of an entry by its position or its key
+
+    :param fields: the fields of the entry split by spaces
+    :param position: the position as int or the key with "=" as bytes
+    :return: the field or the value of the key=value field or None
+    """
+
+    if isinstance(position, int):
+        return fields[position] if position < len(fields) else None
+    for value in fields:
+        if value.startswith(position):
+            return value[len(position):]
+    return None
+
+
+def parse_seconds(value):
+    """
+    parse seconds
+
+    parses a time like the request time of nginx.  of the times of multiple
+    upstreams like "0.010, 0.020" only the first one is used.
+
+    :param value: the field as bytes or None
+    :return: the seconds as float or None if the field has no time
+    """
+
+    if not value:
+        return None
+    try:
+        seconds = float(value.strip(b'"').split(b',', 1)[0])
+    except ValueError:
+        return None
+    if not isfinite(seconds):
+        return None
+    return seconds
 
 
-def add_seconds_to_time(time, seconds):
+def get_timestamp(entry, time_position, parser):
     """
-    add seconds to time
+    get timestamp
 
-    adds the given amount of seconds to the time
+    returns the time of an entry as epoch seconds
 
-    :param time: the time that gets calculated
-    :param seconds: the amount of seconds that get added
-           (negative amounts possible)
-    :return: the calculated time
+    :param entry: the entry as bytes
+    :param time_position: which position the time has in the entry
+    :param parser: the parser of the time format
+    :return: the epoch seconds or None if the entry has no time
     """
 
-    new_time = time + datetime.timedelta(seconds=seconds)
-    return new_time.strftime('%d/%b/%Y:%H:%M:%S')
+    fields = entry.split(b' ', time_position + 1)
+    if len(fields) <= time_position:
+        return None
+    try:
+        return parser(fields[time_position].lstrip(b'[').decode())
+    except ValueError:
+        return None
 
 
-def find_row(log, timedate_at_start, seconds_to_add, time_position, start=0):
+def parse_time(time_string):
     """
-    find row
+    parse time
 
-    searches for the the row of the log with a specific time stamp
+    the times are compared to the current UTC time, like the logs of nginx
+    are written with the UTC timezone
 
-    :param log: the logfile
-    :param timedate_at_start: the time at wich the script was started
-    :param seconds_to_add: how many seconds should get addet if nothing is
-           found (accepts negative values)
-    :param time_position: witch position hast the time in an entry
-    :param start: in which line the search should start
-    :return: number of entry or -1 if nothing is found
+    :param time_string: the time like 17/Oct/2026:12:00:00
+    :return: the epoch seconds
     """
 
-    log.seek(start)
-    for number_of_entry, entry in enumerate(log, start):
-        search_time = add_seconds_to_time(timedate_at_start, seconds_to_add)
-        if search_time in get_position(time_position, entry):
-            return number_of_entry
-    return -1
+    return calendar.timegm(time.strptime(time_string, TIME_FORMAT))
 
 
 if __name__ == '__main__':
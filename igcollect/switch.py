@@ -8,13 +8,17 @@ This script collects
 * CPU utilization
 * SFP Digital Optical Monitoring metrics
 
-from a switch via SNMP.
+from switches via SNMP.  The switches given are polled concurrently, and
+"{host}" in the prefix is replaced by the switch:
+
+python switch.py --community public --prefix 'switches.{host}' sw1 sw2 sw3
 
 Copyright (c) 2017 InnoGames GmbH
 """
 
 from argparse import ArgumentParser
 from time import time
+import asyncio
 import re
 import os
 import sys
@@ -25,9 +29,8 @@ sys.path.append(script_path)
 
 from lib_snmp import (
     add_snmp_arguments,
-    get_snmp_connection,
-    get_snmp_value,
-    get_snmp_table,
+    get_host_prefix,
+    poll_devices,
 )
 
 # Predefine some variables, it makes this program run a bit faster.
@@ -118,43 +121,55 @@ class SwitchException(Exception):
 
 def main():
     args = parse_args()
-    if not args.prefix:
-        args.prefix = 'switches.{}'.format(args.switch)
-
-    snmp = get_snmp_connection(args)
-
-    try:
-        model = get_switch_model(snmp)
-    except SwitchException as e:
-        print(e, file=sys.stderr)
-        return -1
 
-    if not model:
-        return -1
-
-    cpu_stats(args.prefix, snmp, model)
-    monitored_ports = get_monitored_ports(snmp, model)
-    ports_stats(args.prefix, snmp, monitored_ports, model)
-
-    # We check DOM metrics only for switch models that have OIDs added to
-    # the script
-    if model in DOM_OIDS:
-        dom_stats(args.prefix, snmp, monitored_ports, DOM_OIDS[model])
+    ret = 0
+    results = poll_devices(args.host, args, poll_switch)
+    for host, metrics in results.items():
+        if isinstance(metrics, Exception):
+            print(f'{host}: {metrics}', file=sys.stderr)
+            ret = -1
+            continue
+        prefix = get_host_prefix(args.prefix, host, len(args.host) > 1)
+        for path, value, timestamp in metrics:
+            print(f'{prefix}.{path} {value} {timestamp}')
+    return ret
 
 
 def parse_args():
     parser = ArgumentParser()
-    parser.add_argument('host', type=str, help='Hostname of a switch')
-    parser.add_argument('--prefix', help='Graphite prefix')
+    parser.add_argument('host', nargs='+', help='Hostnames of switches')
+    parser.add_argument(
+        '--prefix', default='switches.{host}',
+        help='Graphite prefix, "{host}" is replaced by the switch',
+    )
     add_snmp_arguments(parser)
 
     return parser.parse_args()
 
 
-def get_switch_model(snmp):
-    """ Recognize model of switch from SNMP MIB-2 sysDescr """
+async def poll_switch(snmp):
+    """ Return the metrics of the switch as tuples of the path, the value
+        and the timestamp
+    """
+
+    model = get_switch_model(await snmp.get_value(OIDS['switch_model']))
 
-    model = get_snmp_value(snmp, OIDS['switch_model'])
+    cpu, monitored_ports = await asyncio.gather(
+        cpu_stats(snmp, model),
+        get_monitored_ports(snmp, model),
+    )
+    metrics = [cpu]
+    metrics += await ports_stats(snmp, monitored_ports, model)
+
+    # We check DOM metrics only for switch models that have OIDs added to
+    # the script
+    if model in DOM_OIDS:
+        metrics += await dom_stats(snmp, monitored_ports, DOM_OIDS[model])
+    return metrics
+
+
+def get_switch_model(model):
+    """ Recognize model of switch from SNMP MIB-2 sysDescr """
 
     if 'PowerConnect' in model:
         return 'powerconnect'
@@ -178,7 +193,7 @@ def get_switch_model(snmp):
     raise SwitchException(f'Unknown switch model {model}')
 
 
-def get_monitored_ports(snmp, model):
+async def get_monitored_ports(snmp, model):
     """ Get ports which meet the following conditions:
         - are configured to be no shutdown
         - and don't belong to a LAGG
@@ -190,15 +205,14 @@ def get_monitored_ports(snmp, model):
 
     ret = {}
 
-    port_names = get_snmp_table(snmp, OIDS['port_name'])
-    laggs = get_laggs(snmp, model)
+    port_names, port_states, laggs = await asyncio.gather(
+        snmp.get_table(OIDS['port_name']),
+        snmp.get_table(OIDS['port_state']),
+        get_laggs(snmp, model),
+    )
 
     # Get only those ports which are up.
-    port_states = {
-        x: y for x, y
-        in get_snmp_table(snmp, OIDS['port_state']).items()
-        if y == 1
-    }
+    port_states = {x: y for x, y in port_states.items() if y == 1}
     for port_idx, port_state in port_states.items():
         if not laggs or port_idx not in laggs.keys():
             port_name = standardize_portname(port_names[port_idx], model)
@@ -208,13 +222,13 @@ def get_monitored_ports(snmp, model):
     return ret
 
 
-def get_laggs(snmp, model):
+async def get_laggs(snmp, model):
     """ Get only those LAGGs which have members """
 
     if model in ['powerconnect', 'procurve']:
         return {
             x: y for x, y
-            in get_snmp_table(snmp, LAGG_OIDS[model]).items()
+            in (await snmp.get_table(LAGG_OIDS[model])).items()
             if y != 0
         }
 
@@ -234,52 +248,61 @@ def standardize_portname(port_name, model):
     return g.replace('/', '_').replace(':', '_')
 
 
-def ports_stats(prefix, snmp, ports, model):
-    """ Print graphite-compatible stats for each port of switch """
+async def ports_stats(snmp, ports, model):
+    """ Return graphite-compatible stats for each port of switch """
 
-    for counter, oid in COUNTERS.items():
+    async def counter_stats(counter, oid):
+        ret = []
+        table = await snmp.get_table(oid)
         # SNMP is slow that we want to get current time for each counter.
-        template = prefix + '.ports.{}.{} {} ' + str(int(time()))
-        table = get_snmp_table(snmp, oid)
+        timestamp = int(time())
         table_ignore = []
         if model in COUNTERS_IGNORE and counter in COUNTERS_IGNORE[model]:
-            table_ignore = get_snmp_table(
-                snmp, COUNTERS_IGNORE[model][counter]
+            table_ignore = await snmp.get_table(
+                COUNTERS_IGNORE[model][counter]
             )
         for port_idx, port_name in ports.items():
             if port_idx in table:
                 data = table[port_idx]
                 if port_idx in table_ignore:
                     data -= table_ignore[port_idx]
-                print(template.format(port_name, counter, data))
+                ret.append((f'ports.{port_name}.{counter}', data, timestamp))
+        return ret
 
+    tables = await asyncio.gather(
+        *(counter_stats(counter, oid) for counter, oid in COUNTERS.items())
+    )
+    return [metric for metrics in tables for metric in metrics]
 
-def dom_stats(prefix, snmp, ports, oids):
+
+async def dom_stats(snmp, ports, oids):
     """
-    Print graphite-compatible Digital Optical Monitoring stats for each port
+    Return graphite-compatible Digital Optical Monitoring stats for each port
     of the switch
     """
 
-    for metric, oid in oids.items():
-        # SNMP is slow, so we want to get current time for each counter.
-        timestamp = int(time())
-        table = get_snmp_table(snmp, oid)
+    ret = []
+    tables = await snmp.get_tables(oids.values())
+    # The tables are fetched concurrently, so they share the timestamp.
+    timestamp = int(time())
+    for metric, table in zip(oids, tables):
         for port_idx, port_name in ports.items():
             if port_idx not in table:
                 continue
             data = table[port_idx]
             if not data:
                 continue
-            print(f'{prefix}.ports.{port_name}.{metric} {data} {timestamp}')
+            ret.append((f'ports.{port_name}.{metric}', data, timestamp))
+    return ret
 
 
-def cpu_stats(prefix, snmp, model):
-    """ Print graphite-compatible stats of switch CPU
+async def cpu_stats(snmp, model):
+    """ Return graphite-compatible stats of switch CPU
 
         We use single OID which should percentage of CPU time used.
     """
 
-    cpu_usage = get_snmp_value(snmp, CPU_OIDS[model])
+    cpu_usage = await snmp.get_value(CPU_OIDS[model])
 
     if model == 'cumulus':
         # The value is percent idle
@@ -301,8 +324,7 @@ def cpu_stats(prefix, snmp, model):
     else:
         cpu_usage = int(cpu_usage)
 
-    template = prefix + '.cpu {} ' + str(int(time()))
-    print(template.format(cpu_usage))
+    return 'cpu', cpu_usage, int(time())
 
 
 if __name__ == '__main__':
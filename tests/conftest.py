@@ -0,0 +1,11 @@
+"""igcollect - Tests - Configuration
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from os.path import abspath, dirname, join
+import sys
+
+# The collectors import the libraries as top-level modules, the same way as
+# they are installed.
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'igcollect'))
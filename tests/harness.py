@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Fixture Harness
+
+This module captures the pseudo-files under /proc and /sys which the
+collectors read into a tarball, and replays them by pointing the
+collectors to the extracted copy with the IGCOLLECT_ROOT environment
+variable.  It can also report the wall time and the memory allocations of
+the collectors running on a fixture:
+
+    python -m tests.harness record tests/linux_proc.tgz /proc/stat ...
+    python -m tests.harness benchmark tests/linux_proc.tgz linux_cpu ...
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from io import BytesIO
+from os.path import abspath, dirname, isdir, islink, join
+from tempfile import TemporaryDirectory
+from time import perf_counter, process_time
+import os
+import sys
+import tarfile
+import tracemalloc
+
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), 'igcollect'))
+
+from lib_procfs import ROOT_ENV
+from lib_runner import run_collector
+
+# The pseudo-files report their size as 0, so they are read up to this
+MAX_FILE_SIZE = 1024 * 1024
+
+
+def record(tarball, paths, follow_depth=1):
+    """Capture the given files and directories into the tarball
+
+    The symbolic links are followed only up to the given depth below the
+    given directories.  It is necessary for the directories like
+    /sys/class/net which consist of links, but following all the links in
+    sysfs would never end.  The files which cannot be read are skipped.
+    """
+    with tarfile.open(tarball, 'w:gz') as tar:
+        for path in paths:
+            _record_path(tar, path, follow_depth)
+
+
+def _record_path(tar, path, follow_depth):
+    name = path.lstrip('/')
+    if islink(path) and follow_depth < 0:
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.SYMTYPE
+        info.linkname = os.readlink(path)
+        tar.addfile(info)
+    elif isdir(path):
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.DIRTYPE
+        info.mode = 0o755
+        tar.addfile(info)
+        try:
+            entries = sorted(os.listdir(path))
+        except OSError:
+            return
+        for entry in entries:
+            _record_path(tar, join(path, entry), follow_depth - 1)
+    else:
+        try:
+            with open(path, 'rb') as fd:
+                data = fd.read(MAX_FILE_SIZE)
+        except OSError:
+            return
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = 0o644
+        tar.addfile(info, BytesIO(data))
+
+
+@contextmanager
+def replay(tarball):
+    """Extract the tarball and point the collectors to it"""
+    with TemporaryDirectory() as root:
+        with tarfile.open(tarball) as tar:
+            tar.extractall(root)
+        saved = os.environ.get(ROOT_ENV)
+        os.environ[ROOT_ENV] = root
+        try:
+            yield root
+        finally:
+            if saved is None:
+                del os.environ[ROOT_ENV]
+            else:
+                os.environ[ROOT_ENV] = saved
+
+
+class BenchmarkResult(object):
+    def __init__(self, name, runs):
+        self.name = name
+        self.runs = runs
+        self.wall_times = []
+        self.cpu_times = []
+        self.allocated = 0
+        self.lines = 0
+        self.error = None
+
+    @property
+    def wall_time(self):
+        return min(self.wall_times)
+
+    @property
+    def cpu_time(self):
+        return min(self.cpu_times)
+
+    def __str__(self):
+        return '{:<24} {:>10.3f}ms {:>10.3f}ms {:>10.1f}KiB {:>8}'.format(
+            self.name, self.wall_time * 1000, self.cpu_time * 1000,
+            self.allocated / 1024, self.lines,
+        )
+
+
+def benchmark(name, argv=(), runs=10):
+    """Run the collector repeatedly and measure its cost
+
+    The best of the wall and CPU times are reported.  The allocations are
+    measured with tracemalloc on a separate run, because tracing slows
+    down the execution.
+    """
+    result = BenchmarkResult(name, runs)
+    run_collector(name, argv)  # Warm up the imports and the caches
+    for _ in range(runs):
+        wall_start = perf_counter()
+        cpu_start = process_time()
+        collector_result = run_collector(name, argv)
+        result.cpu_times.append(process_time() - cpu_start)
+        result.wall_times.append(perf_counter() - wall_start)
+        result.lines = len(collector_result.lines)
+        result.error = collector_result.error
+
+    tracemalloc.start()
+    try:
+        run_collector(name, argv)
+        result.allocated = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result
+
+
+def parse_args():
+    parser = ArgumentParser(prog='harness')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('tarball')
+    record_parser.add_argument('paths', nargs='+')
+    record_parser.add_argument('--follow-depth', type=int, default=1)
+
+    benchmark_parser = subparsers.add_parser('benchmark')
+    benchmark_parser.add_argument('tarball')
+    benchmark_parser.add_argument('collectors', nargs='+')
+    benchmark_parser.add_argument('--runs', type=int, default=10)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'record':
+        record(args.tarball, args.paths, args.follow_depth)
+        return
+
+    print('{:<24} {:>12} {:>12} {:>13} {:>8}'.format(
+        'collector', 'wall', 'cpu', 'allocated', 'lines'
+    ))
+    with replay(args.tarball):
+        for name in args.collectors:
+            result = benchmark(name, runs=args.runs)
+            print(result)
+            if result.error:
+                print('    {}'.format(result.error))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Import Time
+
+Every collector is started once per interval, so the time to import it
+is paid on every run.  The modules are imported in fresh interpreters with
+"python -X importtime" to measure it.  The heavy third-party packages must
+only be imported when the collectors actually use them.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from glob import glob
+from os.path import abspath, basename, dirname, join
+from subprocess import run
+import sys
+import unittest
+
+_igcollect_dir = join(dirname(dirname(abspath(__file__))), 'igcollect')
+
+# Cumulative import time of a module in microseconds, generous to tolerate
+# slow and busy test machines
+_budget = 200000
+
+# The packages which must not be imported only to parse the arguments.
+# grequests is not among them: gevent must monkeypatch the standard
+# library before ssl is imported, so it is imported first.
+_lazy_modules = {
+    'idrac': ('pysnmp',),
+    'kvm_virtualisation': ('libvirt',),
+    'lib_snmp': ('pysnmp',),
+    'netfilter': ('nftables',),
+    'switch': ('pysnmp',),
+}
+
+
+def _modules():
+    for path in sorted(glob(join(_igcollect_dir, '*.py'))):
+        yield basename(path)[:-len('.py')]
+
+
+def _import(module, code=''):
+    return run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import {}\n{}'.format(module, code)],
+        cwd=_igcollect_dir, capture_output=True, text=True,
+    )
+
+
+def _import_time(stderr, module):
+    """Return the cumulative import time of the module in microseconds"""
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and line.endswith('| ' + module):
+            return int(line.split('|')[1])
+    return None
+
+
+class TestImportTime(unittest.TestCase):
+    def test_budget(self):
+        for module in _modules():
+            with self.subTest(module=module):
+                process = _import(module)
+                if 'ModuleNotFoundError' in process.stderr:
+                    # The dependency is not installed on this machine
+                    continue
+                self.assertEqual(process.returncode, 0, process.stderr)
+                # The best of two imports to ignore writing the bytecode
+                import_time = min(
+                    _import_time(process.stderr, module),
+                    _import_time(_import(module).stderr, module),
+                )
+                self.assertLess(import_time, _budget)
+
+    def test_lazy_imports(self):
+        for module, packages in _lazy_modules.items():
+            with self.subTest(module=module):
+                process = _import(module, (
+                    'import sys\n'
+                    'for name in {!r}:\n'
+                    '    assert name not in sys.modules, name\n'
+                ).format(packages))
+                self.assertEqual(process.returncode, 0, process.stderr)
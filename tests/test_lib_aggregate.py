@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Streaming Aggregation
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from json import dumps, loads
+from random import Random
+import tracemalloc
+import unittest
+
+from lib_aggregate import Aggregate, Histogram, QuantileSketch, log_bounds
+
+_quantiles = (0, 0.01, 0.25, 0.5, 0.9, 0.99, 0.999, 1)
+
+
+def _values(count, seed=0):
+    random = Random(seed)
+    return [random.lognormvariate(3, 2) for _ in range(count)]
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def assert_accurate(self, sketch, values, quantiles=_quantiles):
+        values = sorted(values)
+        for q in quantiles:
+            exact = values[int(q * (len(values) - 1))]
+            estimate = sketch.quantile(q)
+            self.assertLessEqual(
+                abs(estimate - exact),
+                abs(exact) * sketch.relative_accuracy + 1e-12,
+                'q={} exact={} estimate={}'.format(q, exact, estimate),
+            )
+
+    def test_relative_error(self):
+        values = _values(100000)
+        for accuracy in (0.01, 0.05):
+            sketch = QuantileSketch(accuracy)
+            for value in values:
+                sketch.add(value)
+            self.assert_accurate(sketch, values)
+
+    def test_signs(self):
+        values = [-100, -10, -1, 0, 0, 1, 10, 100, 1000]
+        sketch = QuantileSketch()
+        for value in values:
+            sketch.add(value)
+        self.assert_accurate(sketch, values, [i / 8 for i in range(9)])
+
+    def test_merge(self):
+        values = _values(10000)
+        merged = QuantileSketch()
+        for chunk in range(10):
+            sketch = QuantileSketch()
+            for value in values[chunk * 1000:(chunk + 1) * 1000]:
+                sketch.add(value)
+            merged.merge(sketch)
+        self.assertEqual(merged.count, len(values))
+        self.assert_accurate(merged, values)
+
+    def test_collapse(self):
+        values = _values(10000)
+        sketch = QuantileSketch(max_buckets=500)
+        for value in values:
+            sketch.add(value)
+        self.assertLessEqual(len(sketch.positive), 500)
+        # Only the lowest quantiles lose their accuracy
+        self.assert_accurate(sketch, values, (0.5, 0.9, 0.99, 1))
+        self.assertLess(sketch.quantile(0), values[0])
+
+    def test_empty(self):
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+
+class TestHistogram(unittest.TestCase):
+    def test_cumulative(self):
+        histogram = Histogram([1, 0.1, 10])
+        for value in (0.05, 0.1, 0.5, 1, 3, 100, 1000):
+            histogram.add(value)
+        self.assertEqual(histogram.counts, [2, 2, 1, 2])
+        self.assertEqual(histogram.cumulative(), [
+            (0.1, 2), (1, 4), (10, 5), (float('inf'), 7),
+        ])
+
+    def test_log_bounds(self):
+        self.assertEqual(
+            log_bounds(0.01, 1), [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1]
+        )
+        self.assertEqual(log_bounds(3, 60), [5, 10, 20, 50])
+
+    def test_aggregate(self):
+        aggregate = Aggregate(histogram=[1, 10])
+        for value in (0.5, 5, 50):
+            aggregate.add(value)
+        loaded = Aggregate(histogram=[1, 10])
+        loaded.load_state(loads(dumps(aggregate.to_state())))
+        loaded.merge(aggregate)
+        self.assertEqual(loaded.histogram.counts, [2, 2, 2])
+
+    def test_merge_state(self):
+        histogram = Histogram([1, 2])
+        histogram.add(1.5)
+        loaded = Histogram([1, 2])
+        loaded.load_state(loads(dumps(histogram.to_state())))
+        loaded.merge(histogram)
+        self.assertEqual(loaded.counts, [0, 2, 0])
+
+
+class TestAggregate(unittest.TestCase):
+    def test_exact(self):
+        values = [3, -1, 7.5, 100, 0, 42]
+        aggregate = Aggregate(threshold=7.5, distribution=True)
+        for value in values:
+            aggregate.add(value)
+        self.assertEqual(aggregate.count, 6)
+        self.assertEqual(aggregate.sum, sum(values))
+        self.assertEqual(aggregate.mean(), sum(values) / 6)
+        self.assertEqual(aggregate.min, -1)
+        self.assertEqual(aggregate.max, 100)
+        self.assertEqual(aggregate.above, 3)
+        self.assertEqual(
+            aggregate.distribution, {3: 1, -1: 1, 7: 1, 100: 1, 0: 1, 42: 1}
+        )
+
+    def test_quantile_limits(self):
+        aggregate = Aggregate(quantiles=True)
+        aggregate.add(1000)
+        self.assertEqual(aggregate.quantile(0.5), 1000)
+
+    def test_state(self):
+        aggregate = Aggregate(threshold=10, quantiles=True, distribution=True)
+        for value in _values(1000):
+            aggregate.add(value)
+        loaded = Aggregate(threshold=10, quantiles=True, distribution=True)
+        loaded.load_state(loads(dumps(aggregate.to_state())))
+        self.assertEqual(loaded.to_state(), aggregate.to_state())
+        for q in _quantiles:
+            self.assertEqual(loaded.quantile(q), aggregate.quantile(q))
+
+    def test_not_finite(self):
+        aggregate = Aggregate(
+            quantiles=True, distribution=True, histogram=[1, 10]
+        )
+        for value in (float('inf'), float('-inf'), float('nan'), 1e400, 5):
+            aggregate.add(value)
+        self.assertEqual(aggregate.count, 1)
+        self.assertEqual(aggregate.sum, 5)
+        self.assertEqual(aggregate.max, 5)
+        self.assertEqual(aggregate.sketch.zeros, 0)
+        self.assertAlmostEqual(aggregate.quantile(0.5), 5, delta=0.1)
+
+    def test_merge_empty(self):
+        aggregate = Aggregate(quantiles=True)
+        aggregate.merge(Aggregate(quantiles=True))
+        self.assertEqual(aggregate.count, 0)
+        self.assertIsNone(aggregate.min)
+
+    def test_memory(self):
+        """Compare the memory with keeping all values"""
+        values = _values(100000)
+
+        def keep_all():
+            kept = []
+            for value in values:
+                kept.append(value)
+            return sorted(kept)[len(kept) // 2]
+
+        def aggregate():
+            aggregate = Aggregate(quantiles=True)
+            for value in values:
+                aggregate.add(value)
+            return aggregate.quantile(0.5)
+
+        results = []
+        for function in (keep_all, aggregate):
+            tracemalloc.start()
+            function()
+            results.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(results[1] * 10, results[0])
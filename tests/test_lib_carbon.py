@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Carbon Sender
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from pickle import loads
+from socket import socket, SHUT_RDWR, SOL_SOCKET, SO_REUSEADDR
+from struct import unpack
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import monotonic, sleep
+import unittest
+
+from lib_carbon import CarbonSender, parse_destination, parse_line
+from lib_graphite import GraphiteEmitter
+from lib_spool import Spool
+
+
+class DummyCarbon(object):
+    """Accept connections on a local port and record the received data"""
+
+    def __init__(self, port=0):
+        self.sock = socket()
+        self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.connections = []
+        self.received = []
+        self.thread = Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            Thread(target=self._read, args=(conn, ), daemon=True).start()
+
+    def _read(self, conn):
+        data = b''
+        while True:
+            try:
+                chunk = conn.recv(65536)
+            except OSError:
+                chunk = b''
+            if not chunk:
+                break
+            data += chunk
+        self.received.append(data)
+
+    def close(self):
+        # Shutdown wakes up the thread waiting in accept()
+        self.sock.shutdown(SHUT_RDWR)
+        self.sock.close()
+        for conn in self.connections:
+            conn.shutdown(SHUT_RDWR)
+            conn.close()
+
+    def wait(self, count):
+        for _ in range(100):
+            if len(self.received) >= count:
+                return
+            sleep(0.01)
+
+
+def _unpickle(data):
+    metrics = []
+    while data:
+        length, = unpack('!L', data[:4])
+        metrics.extend(loads(data[4:4 + length]))
+        data = data[4 + length:]
+    return metrics
+
+
+class TestCarbonSender(unittest.TestCase):
+    def setUp(self):
+        self.carbon = DummyCarbon()
+
+    def tearDown(self):
+        self.carbon.close()
+
+    def test_plaintext(self):
+        with CarbonSender([('127.0.0.1', self.carbon.port)]) as sender:
+            sender.write(b'cpu.user 1 1700000000\ncpu.sys')
+            sender.write(b'tem 2.5 1700000000\n')
+            sender.send([('cpu.idle', 3, 1700000001)])
+        self.carbon.wait(1)
+        self.assertEqual(self.carbon.received, [
+            b'cpu.user 1 1700000000\n'
+            b'cpu.system 2.5 1700000000\n'
+            b'cpu.idle 3 1700000001\n'
+        ])
+
+    def test_pickle(self):
+        sender = CarbonSender(
+            [('127.0.0.1', self.carbon.port)], 'pickle', batch_size=2
+        )
+        with GraphiteEmitter('cpu', 1700000000, sender) as emitter:
+            for i in range(5):
+                emitter.emit('core{}'.format(i), i)
+        sender.close()
+        self.carbon.wait(1)
+        self.assertEqual(len(self.carbon.connections), 1)
+        self.assertEqual(_unpickle(self.carbon.received[0]), [
+            ('cpu.core{}'.format(i), (1700000000, float(i)))
+            for i in range(5)
+        ])
+
+    def test_failover(self):
+        down = DummyCarbon()
+        down.close()
+        sender = CarbonSender([
+            ('127.0.0.1', down.port), ('127.0.0.1', self.carbon.port),
+        ])
+        sender.send([('a', 1, 1)])
+        self.assertTrue(sender.flush())
+        self.assertGreater(sender.destinations[0].backoff, 0)
+        sender.close()
+        self.carbon.wait(1)
+        self.assertEqual(self.carbon.received, [b'a 1 1\n'])
+
+    def test_reconnect(self):
+        sender = CarbonSender(
+            [('127.0.0.1', self.carbon.port)], min_backoff=0.05
+        )
+        sender.send([('a', 1, 1)])
+        self.assertTrue(sender.flush())
+
+        # The relay restarts, the metrics are kept until it is back
+        port = self.carbon.port
+        self.carbon.close()
+        self.carbon.wait(1)
+        sender.send([('b', 2, 2)])
+        self.assertFalse(sender.flush())
+        self.assertEqual(list(sender.pending), [('b', 2, 2)])
+
+        self.carbon = DummyCarbon(port)
+        sleep(0.1)
+        self.assertTrue(sender.flush())
+        sender.close()
+        self.carbon.wait(1)
+        self.assertEqual(self.carbon.received, [b'b 2 2\n'])
+
+    def test_spool(self):
+        port = self.carbon.port
+        self.carbon.close()
+        with TemporaryDirectory() as directory:
+            sender = CarbonSender(
+                [('127.0.0.1', port)], min_backoff=0.05,
+                spool=Spool(directory), replay_rate=20,
+            )
+            sender.send([('a', i, 1) for i in range(5)])
+            self.assertFalse(sender.flush())
+            self.assertEqual(len(sender.pending), 0)
+            self.assertGreater(sender.spool.backlog, 0)
+
+            self.carbon = DummyCarbon(port)
+            sleep(0.1)
+            # Only 2 metrics are allowed by the rate after 0.1 seconds
+            sender._replay_checked = monotonic() - 0.1
+            self.assertTrue(sender.flush())
+            self.assertEqual(len(sender.spool.read(100)), 3)
+            # The rest is sent later
+            sender._replay_checked = monotonic() - 1
+            self.assertTrue(sender.flush())
+            self.assertEqual(sender.spool.backlog, 0)
+            sender.close()
+        self.carbon.wait(1)
+        self.assertEqual(self.carbon.received, [
+            b'a 0 1\na 1 1\na 2 1\na 3 1\na 4 1\n'
+        ])
+
+
+class TestParsing(unittest.TestCase):
+    def test_parse_line(self):
+        self.assertEqual(parse_line(b'a.b 1 2'), ('a.b', '1', 2))
+        self.assertEqual(
+            parse_line(b'a.b 18446744073709551615 2.5'),
+            ('a.b', '18446744073709551615', 2),
+        )
+        self.assertIsNone(parse_line(b''))
+        self.assertIsNone(parse_line(b'a.b nan? 2 3'))
+        self.assertIsNone(parse_line(b'a.b x 2'))
+
+    def test_parse_destination(self):
+        self.assertEqual(parse_destination('carbon'), ('carbon', 2003))
+        self.assertEqual(
+            parse_destination('carbon', 'pickle'), ('carbon', 2004)
+        )
+        self.assertEqual(parse_destination('carbon:2103'), ('carbon', 2103))
+        self.assertEqual(parse_destination('[::1]:2103'), ('::1', 2103))
+        self.assertEqual(parse_destination('[::1]'), ('::1', 2003))
+        self.assertEqual(parse_destination('::1'), ('::1', 2003))
+        self.assertEqual(
+            parse_destination('2001:db8::2', 'pickle'), ('2001:db8::2', 2004)
+        )
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Graphite Output
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from io import BytesIO, TextIOWrapper
+import unittest
+
+from lib_graphite import GraphiteEmitter
+
+
+_lines = 100000
+_timestamp = 1700000000
+
+
+def _metrics():
+    for i in range(_lines):
+        yield 'dev{}.bytesIn'.format(i % 64), i * 1024, _timestamp
+
+
+class _Stream(BytesIO):
+    """Stream recording the sizes of the writes"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(len(data))
+        return super().write(data)
+
+
+class TestGraphiteEmitter(unittest.TestCase):
+    def test_output(self):
+        buf = BytesIO()
+        with GraphiteEmitter('network', _timestamp, buf) as emitter:
+            emitter.emit('eth0.bytesIn', 1)
+            emitter.emit('eth0.bytesOut', 2.5, _timestamp + 1)
+            emitter.emit_many([('lo.pktsIn', 3, _timestamp + 2)])
+        self.assertEqual(buf.getvalue(), (
+            b'network.eth0.bytesIn 1 1700000000\n'
+            b'network.eth0.bytesOut 2.5 1700000001\n'
+            b'network.lo.pktsIn 3 1700000002\n'
+        ))
+        self.assertEqual(emitter.lines, 3)
+
+    def test_same_as_print(self):
+        text = TextIOWrapper(BytesIO(), write_through=True)
+        for path, value, timestamp in _metrics():
+            print('{}.{} {} {}'.format('network', path, value, timestamp),
+                  file=text)
+
+        buf = BytesIO()
+        with GraphiteEmitter('network', stream=buf) as emitter:
+            emitter.emit_many(_metrics())
+
+        self.assertEqual(buf.getvalue(), text.buffer.getvalue())
+
+    def test_writes(self):
+        """The lines are written in buffers instead of one by one"""
+        stream = _Stream()
+        with GraphiteEmitter('network', stream=stream) as emitter:
+            emitter.emit_many(_metrics())
+        self.assertEqual(emitter.lines, _lines)
+        self.assertGreater(len(stream.writes), 1)
+        self.assertTrue(all(size >= 65536 for size in stream.writes[:-1]))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Log File Library
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from os import rename
+from os.path import join
+from random import Random
+from tempfile import TemporaryDirectory
+import unittest
+
+from lib_logfile import (
+    LogTail,
+    extract_json_fields,
+    extract_logfmt_fields,
+    read_lines_reverse,
+    seek_timestamp,
+)
+
+
+def _parse(line):
+    """Return the timestamp of the test lines"""
+    timestamp = line.split(b' ', 1)[0]
+    return int(timestamp) if timestamp.isdigit() else None
+
+
+class TestLogFile(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, data, mode='a'):
+        with open(self.log, mode) as fh:
+            fh.write(data)
+
+    def test_read_lines_reverse(self):
+        lines = ['line {}'.format(i) for i in range(1000)]
+        self.write('\n'.join(lines) + '\n\n')
+        self.assertEqual(
+            list(read_lines_reverse(self.log, buf_size=7)), lines[::-1]
+        )
+        self.assertEqual(
+            list(read_lines_reverse(self.log, end=13)), ['line 1', 'line 0']
+        )
+
+    def test_tail(self):
+        self.write('a\nb\nc')
+        tail = LogTail(self.log, buf_size=3)
+        self.assertEqual(list(tail), ['a', 'b'])
+        self.write('\nd\n')
+        self.assertEqual(list(tail), ['c', 'd'])
+        self.assertEqual(list(tail), [])
+
+    def test_seek_end(self):
+        self.write('a\nb\nc')
+        tail = LogTail(self.log)
+        tail.seek_end()
+        self.assertEqual(tail.offset, 4)
+        self.write('\n')
+        self.assertEqual(list(tail), ['c'])
+
+    def test_rotate(self):
+        self.write('a\n')
+        tail = LogTail(self.log)
+        self.assertEqual(list(tail), ['a'])
+        self.write('b\nc')
+        rename(self.log, self.log + '.1')
+        self.write('d\n')
+        # The rotated file is finished including its incomplete line
+        self.assertEqual(list(tail), ['b', 'c', 'd'])
+        self.assertEqual(tail.offset, 2)
+
+    def test_truncate(self):
+        self.write('a\nb\n')
+        tail = LogTail(self.log)
+        self.assertEqual(list(tail), ['a', 'b'])
+        self.write('c\n', 'w')
+        self.assertEqual(list(tail), ['c'])
+
+    def test_seek_timestamp(self):
+        self.write(''.join(
+            '{} line {}\n'.format(i, i) for i in range(100000)
+        ))
+        offset = seek_timestamp(self.log, 50000, _parse, min_size=0)
+        with open(self.log, 'rb') as fh:
+            fh.seek(offset)
+            lines = fh.read().splitlines()
+        self.assertEqual(_parse(lines[0]) // 1000, 49)
+        self.assertLess(len(lines) - 50000, 1000)
+        self.assertEqual(seek_timestamp(self.log, 0, _parse, min_size=0), 0)
+        # The small files are read from the start
+        self.write('100000 line\n', 'w')
+        self.assertEqual(seek_timestamp(self.log, 200000, _parse), 0)
+
+    def test_seek_timestamp_jitter(self):
+        random = Random(0)
+        lines = [
+            '{} line\n'.format(i + random.randrange(-30, 30))
+            for i in range(100000)
+        ]
+        # The lines without timestamps are skipped
+        lines[50000:50100] = ['continued\n'] * 100
+        self.write(''.join(lines))
+        for timestamp in (1000, 49990, 50040, 99000):
+            offset = seek_timestamp(
+                self.log, timestamp, _parse, slack=60, min_size=0
+            )
+            with open(self.log, 'rb') as fh:
+                before = fh.read(offset).splitlines()
+            self.assertTrue(all(
+                _parse(line) is None or _parse(line) < timestamp
+                for line in before
+            ))
+            self.assertLess(len(lines) - len(before), 100000 - timestamp + 500)
+
+    def test_seek_timestamp_parsed(self):
+        """Only a few lines are parsed to bisect the file"""
+        self.write(''.join(
+            '{} line {}\n'.format(i, i) for i in range(100000)
+        ))
+        parsed = []
+
+        def parse(line):
+            parsed.append(line)
+            return _parse(line)
+
+        offset = seek_timestamp(self.log, 99000, parse, min_size=0)
+        with open(self.log, 'rb') as fh:
+            fh.seek(offset)
+            first = _parse(fh.readline())
+        self.assertLessEqual(first, 99000)
+        self.assertGreater(first, 98000)
+        self.assertLess(len(parsed), 50)
+
+
+class TestFields(unittest.TestCase):
+    def test_json(self):
+        line = (
+            '{"msg": "a \\"b\\": 1", "a":"x", "b" : 12.5, '
+            '"c": {"d": true}, "e": "\\u00e4\\\\", "f": null}'
+        )
+        self.assertEqual(
+            extract_json_fields(line, {'a', 'b', 'd', 'e', 'f', 'g', 'x'}),
+            {'a': 'x', 'b': '12.5', 'd': 'true', 'e': '\u00e4\\',
+             'f': 'null'},
+        )
+
+    def test_logfmt(self):
+        keys = {'a', 'b', 'c', 'd'}
+        self.assertEqual(
+            extract_logfmt_fields('a=1 xb=2 b=3 c= d', keys),
+            {'a': '1', 'b': '3', 'c': ''},
+        )
+        # The quoted values are not searched for the keys
+        self.assertEqual(
+            extract_logfmt_fields('msg="a=1 b=\\"2\\"" a=x b="3 4"', keys),
+            {'a': 'x', 'b': '3 4'},
+        )
+        self.assertEqual(
+            extract_logfmt_fields('msg="b=\\"2\\""', keys), {}
+        )
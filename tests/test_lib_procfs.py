@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""igcollect - Tests - procfs and sysfs Reader
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from inspect import currentframe, getfile
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+import os
+import sys
+import unittest
+
+import lib_runner
+from lib_procfs import ProcReader
+from lib_runner import enable_resident, run_collector
+from tests.harness import replay
+
+_collectors = {
+    'linux_cpu': [],
+    'linux_disk': [],
+    'linux_memory': [],
+    'linux_network': [],
+    'linux_vmstat': ['--fields', 'nr_free_pages', 'pgfault'],
+}
+_runs = 10
+
+# The files opened while counting, the audit hooks cannot be removed
+_opened = None
+
+
+def _audit(event, args):
+    if event == 'open' and _opened is not None:
+        _opened.append(args[0])
+
+
+sys.addaudithook(_audit)
+
+
+def _read_syscalls():
+    with open('/proc/self/io') as fd:
+        for line in fd:
+            if line.startswith('syscr:'):
+                return int(line.split()[1])
+
+
+def _count(name, argv):
+    """Return the average number of opens and reads of the collector
+
+    The number of reads the files opened on the first run would need with
+    the builtin open() is returned too, for comparison.
+    """
+    global _opened
+
+    run_collector(name, argv)  # Warm up the imports
+    # Reading /proc/self/io is counted too
+    overhead = -_read_syscalls() + _read_syscalls()
+    reads = _read_syscalls()
+    _opened = []
+    try:
+        for _ in range(_runs):
+            run_collector(name, argv)
+        paths = _opened
+    finally:
+        _opened = None
+    opens = len(paths)
+    reads = _read_syscalls() - reads - overhead
+
+    builtin_reads = _read_syscalls()
+    for path in paths[:len(paths) // _runs]:
+        with open(path) as fd:
+            fd.read()
+    builtin_reads = _read_syscalls() - builtin_reads - overhead
+
+    return opens / _runs, reads / _runs, builtin_reads
+
+
+class TestProcReader(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.path = join(self._tmp.name, 'file')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, data):
+        with open(self.path, 'wb') as fd:
+            fd.write(data)
+
+    def test_reread(self):
+        self.write(b' 123\n')
+        with ProcReader() as reader:
+            self.assertEqual(reader.read_int(self.path), 123)
+            self.write(b'4567\n')
+            self.assertEqual(reader.read_int(self.path), 4567)
+            self.assertEqual(reader.read(self.path), b'4567\n')
+
+    def test_grow(self):
+        data = b''.join(b'line %d\n' % i for i in range(1000))
+        self.write(data)
+        with ProcReader(buffer_size=16) as reader:
+            self.assertEqual(reader.read(self.path), data)
+
+    def test_sweep(self):
+        self.write(b'1\n')
+        with ProcReader() as reader:
+            reader.read_int(self.path)
+            reader.sweep()
+            self.assertIn(self.path, reader._fds)
+            reader.sweep()
+            self.assertNotIn(self.path, reader._fds)
+
+    def test_reopen(self):
+        self.write(b'1\n')
+        with ProcReader() as reader:
+            reader.read_int(self.path)
+            # Replace the file descriptor with one of a directory which
+            # cannot be read
+            os.close(reader._fds[self.path])
+            reader._fds[self.path] = os.open(self._tmp.name, os.O_RDONLY)
+            self.assertEqual(reader.read_int(self.path), 1)
+
+    def test_missing(self):
+        with ProcReader() as reader:
+            with self.assertRaises(FileNotFoundError):
+                reader.read(self.path)
+
+
+class TestSyscalls(unittest.TestCase):
+    _tests_dir = dirname(getfile(currentframe()))
+
+    def tearDown(self):
+        for obj in (lib_runner._resident or {}).values():
+            obj.close()
+        lib_runner._resident = None
+
+    def test_syscalls(self):
+        """Compare the syscalls of the standalone runs and the daemon"""
+        with replay(join(self._tests_dir, 'linux_proc.tgz')):
+            standalone = {n: _count(n, a) for n, a in _collectors.items()}
+            enable_resident()
+            daemon = {n: _count(n, a) for n, a in _collectors.items()}
+
+        for name in _collectors:
+            self.assertGreater(standalone[name][0], 0)
+            self.assertEqual(daemon[name][0], 0)
+            self.assertLessEqual(daemon[name][1], standalone[name][1])
+            self.assertLess(standalone[name][1], standalone[name][2])
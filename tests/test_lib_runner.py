@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Collector Runner
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from multiprocessing import get_context
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import monotonic, sleep
+import sys
+import unittest
+
+import lib_runner
+
+
+_collector = '''
+from argparse import ArgumentParser
+from subprocess import call
+from time import sleep
+import logging
+
+
+def parse_args():
+    parser = ArgumentParser()
+    parser.add_argument('--prefix', default='dummy')
+    parser.add_argument('--fail', action='store_true')
+    parser.add_argument('--sleep', type=float, default=0)
+    parser.add_argument('--subprocess', action='store_true')
+    parser.add_argument('--log-errors', type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print('{}.runs 1 0'.format(args.prefix))
+    for i in range(args.log_errors):
+        logging.getLogger('dummy').error('error %d', i)
+    if args.fail:
+        raise RuntimeError('failed')
+    if args.subprocess:
+        call(['sleep', str(args.sleep)])
+    else:
+        sleep(args.sleep)
+'''
+
+
+class DummyCollectorTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self._temp_dir = TemporaryDirectory()
+        with open(join(self._temp_dir.name, 'dummy_collector.py'), 'w') as fd:
+            fd.write(_collector)
+        sys.path.insert(0, self._temp_dir.name)
+
+    @classmethod
+    def tearDownClass(self):
+        sys.path.remove(self._temp_dir.name)
+        sys.modules.pop('dummy_collector', None)
+        self._temp_dir.cleanup()
+
+
+class TestRunner(DummyCollectorTestCase):
+    def tearDown(self):
+        lib_runner._resident = None
+
+    def test_output(self):
+        result = lib_runner.run_collector('dummy_collector', ['--prefix', 'x'])
+        self.assertIsNone(result.error)
+        self.assertEqual(result.lines, ['x.runs 1 0'])
+
+    def test_argv_restored(self):
+        argv = list(sys.argv)
+        lib_runner.run_collector('dummy_collector')
+        self.assertEqual(sys.argv, argv)
+
+    def test_exception(self):
+        result = lib_runner.run_collector('dummy_collector', ['--fail'])
+        self.assertEqual(result.error, 'RuntimeError: failed')
+        self.assertEqual(result.lines, ['dummy.runs 1 0'])
+
+    def test_exit(self):
+        result = lib_runner.run_collector('dummy_collector', ['--unknown'])
+        self.assertEqual(result.error, 'exited with 2')
+
+    def test_telemetry(self):
+        result = lib_runner.run_collector(
+            'dummy_collector', ['--sleep', '0.05'], 'dummy.job'
+        )
+        self.assertGreaterEqual(result.wall_time, 0.05)
+        self.assertGreater(result.max_rss, 0)
+        lines = result.telemetry('igcollect', 100)
+        self.assertEqual(
+            [line.split()[0] for line in lines],
+            [
+                'igcollect.dummy_job.wall_time',
+                'igcollect.dummy_job.cpu_time',
+                'igcollect.dummy_job.max_rss',
+                'igcollect.dummy_job.lines',
+                'igcollect.dummy_job.errors',
+            ],
+        )
+        self.assertEqual(lines[3], 'igcollect.dummy_job.lines 1 100')
+        self.assertEqual(lines[4], 'igcollect.dummy_job.errors 0 100')
+
+    def test_telemetry_errors(self):
+        result = lib_runner.run_collector(
+            'dummy_collector', ['--log-errors', '2', '--fail']
+        )
+        self.assertEqual(result.errors, 3)
+
+    def test_resident_disabled(self):
+        self.assertIsNot(
+            lib_runner.resident('key', object),
+            lib_runner.resident('key', object),
+        )
+
+    def test_resident(self):
+        lib_runner.enable_resident()
+        obj = lib_runner.resident('key', object)
+        self.assertIs(lib_runner.resident('key', object), obj)
+        self.assertIsNot(
+            lib_runner.resident('key', object, alive=lambda o: False), obj
+        )
+
+
+class TestParallel(DummyCollectorTestCase):
+    def run_parallel(self, specs, **kwargs):
+        jobs = [lib_runner.parse_job(s) for s in specs]
+        for job, spec in zip(jobs, specs):
+            job.name = spec
+        return list(lib_runner.run_parallel(jobs, **kwargs))
+
+    def test_parse_job(self):
+        job = lib_runner.parse_job('linux_cpu --prefix "a b"')
+        self.assertEqual(job.module, 'linux_cpu')
+        self.assertEqual(job.argv, ['--prefix', 'a b'])
+
+    def test_read_jobs(self):
+        filename = join(self._temp_dir.name, 'jobs.ini')
+        with open(filename, 'w') as fd:
+            fd.write('[cpu]\nmodule = linux_cpu\n[load]\ninterval = 10\n')
+        jobs = lib_runner.read_jobs(filename, interval=60)
+        self.assertEqual([(j.module, j.interval) for j in jobs],
+                         [('linux_cpu', 60), ('load', 10)])
+        with self.assertRaises(ValueError):
+            lib_runner.read_jobs(filename, interval=0)
+        with open(filename, 'a') as fd:
+            fd.write('[disk]\ninterval = -1\n')
+        with self.assertRaises(ValueError):
+            lib_runner.read_jobs(filename, interval=60)
+
+    def test_order(self):
+        results = self.run_parallel([
+            'dummy_collector --prefix slow --sleep 0.3',
+            'dummy_collector --prefix fast',
+        ])
+        self.assertEqual(
+            [r.lines for r in results], [['fast.runs 1 0'], ['slow.runs 1 0']]
+        )
+
+    def test_concurrency(self):
+        start = monotonic()
+        results = self.run_parallel([
+            'dummy_collector --prefix {} --sleep 0.3'.format(i)
+            for i in range(4)
+        ], workers=4)
+        self.assertLess(monotonic() - start, 1.0)
+        self.assertEqual(len(results), 4)
+        self.assertFalse(any(r.error for r in results))
+
+    def test_timeout(self):
+        start = monotonic()
+        results = self.run_parallel([
+            'dummy_collector --prefix slow --sleep 30',
+            'dummy_collector --prefix sub --sleep 30 --subprocess',
+            'dummy_collector --prefix fast',
+        ], timeout=0.5)
+        self.assertLess(monotonic() - start, 5)
+        results = {r.name.split()[2]: r for r in results}
+        self.assertEqual(results['fast'].lines, ['fast.runs 1 0'])
+        self.assertIsNone(results['fast'].error)
+        self.assertEqual(results['slow'].error, 'timed out after 0.5s')
+        self.assertEqual(results['sub'].error, 'timed out after 0.5s')
+
+    def test_kill_before_setpgrp(self):
+        # The child is killed even without its own process group
+        process = get_context('fork').Process(target=sleep, args=(30,))
+        process.start()
+        start = monotonic()
+        lib_runner._kill(process)
+        self.assertLess(monotonic() - start, 5)
+        self.assertFalse(process.is_alive())
+
+    def test_error(self):
+        results = self.run_parallel(['dummy_collector --fail'])
+        self.assertEqual(results[0].error, 'RuntimeError: failed')
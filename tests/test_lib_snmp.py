@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""igcollect - Tests - SNMP Library
+
+The devices are simulated by local responders serving the records in the
+format of snmpsim: OID|TAG|VALUE
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from argparse import Namespace
+from bisect import bisect_right
+import asyncio
+from socketserver import BaseRequestHandler, ThreadingUDPServer
+from threading import Lock, Thread
+from time import sleep
+import unittest
+
+try:
+    from pyasn1.codec.ber import decoder, encoder
+    from pysnmp.proto import api
+except ImportError:
+    api = None
+
+from lib_runner import run_collector
+from lib_snmp import SNMPDevice, get_host_prefix, poll_devices
+
+_ports = range(1, 9)
+
+_counters = [
+    '1.3.6.1.2.1.31.1.1.1.6',
+    '1.3.6.1.2.1.31.1.1.1.10',
+    '1.3.6.1.2.1.31.1.1.1.7',
+    '1.3.6.1.2.1.31.1.1.1.11',
+    '1.3.6.1.2.1.31.1.1.1.9',
+    '1.3.6.1.2.1.31.1.1.1.13',
+    '1.3.6.1.2.1.2.2.1.14',
+    '1.3.6.1.2.1.2.2.1.20',
+    '1.3.6.1.2.1.2.2.1.13',
+    '1.3.6.1.2.1.2.2.1.19',
+]
+
+
+def _switch_records(model='ProCurve J9850A'):
+    """Return the records of a switch with its port 7 in a trunk"""
+    lines = [
+        '1.3.6.1.2.1.1.1.0|4|' + model,
+        '1.3.6.1.4.1.11.2.14.11.5.1.9.6.1.0|2|12',
+    ]
+    for port in _ports:
+        lines += [
+            '1.3.6.1.2.1.31.1.1.1.1.{}|4|{}'.format(port, port),
+            '1.3.6.1.2.1.31.1.1.1.18.{}|4|uplink'.format(port),
+            '1.3.6.1.2.1.2.2.1.8.{}|2|{}'.format(port, 2 if port == 8 else 1),
+            '1.3.6.1.4.1.11.2.14.11.5.1.7.1.3.1.1.8.{}|2|{}'.format(
+                port, int(port == 7)
+            ),
+        ]
+        for index, oid in enumerate(_counters):
+            lines.append('{}.{}|70|{}'.format(oid, port, index * 100 + port))
+    return '\n'.join(lines)
+
+
+_idrac_records = '''
+1.3.6.1.4.1.674.10892.5.4.700.20.1.6.1.1|2|450
+1.3.6.1.4.1.674.10892.5.4.700.20.1.6.1.2|2|300
+1.3.6.1.4.1.674.10892.5.4.700.20.1.7.1.1|2|3
+1.3.6.1.4.1.674.10892.5.4.700.20.1.7.1.2|2|16
+1.3.6.1.4.1.674.10892.5.4.700.20.1.8.1.1|4|CPU1 Temp
+1.3.6.1.4.1.674.10892.5.4.700.20.1.8.1.2|4|Discrete
+1.3.6.1.4.1.674.10892.5.4.600.30.1.6.1.1|2|200
+1.3.6.1.4.1.674.10892.5.4.600.30.1.7.1.1|2|26
+1.3.6.1.4.1.674.10892.5.4.600.30.1.8.1.1|4|System Board Pwr Consumption
+'''
+
+
+class _Handler(BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        server = self.server
+        request, _ = decoder.decode(data, asn1Spec=api.v2c.Message())
+        if str(api.v2c.apiMessage.get_community(request)) != 'public':
+            return
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        # Let the requests overlap
+        sleep(server.delay)
+        response = api.v2c.apiMessage.get_response(request)
+        api.v2c.apiPDU.set_varbinds(
+            api.v2c.apiMessage.get_pdu(response),
+            server.respond(api.v2c.apiMessage.get_pdu(request)),
+        )
+        with server.lock:
+            server.in_flight -= 1
+        sock.sendto(encoder.encode(response), self.client_address)
+
+
+class _Responder(ThreadingUDPServer):
+    """Agent serving the records given in the format of snmpsim"""
+
+    daemon_threads = True
+
+    def __init__(self, records, delay=0.01):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        types = {
+            '2': api.v2c.Integer,
+            '4': api.v2c.OctetString,
+            '65': api.v2c.Counter32,
+            '70': api.v2c.Counter64,
+        }
+        self.records = {}
+        for line in records.strip().splitlines():
+            oid, tag, value = line.split('|', 2)
+            key = tuple(int(x) for x in oid.split('.'))
+            self.records[key] = types[tag](
+                int(value) if tag != '4' else value
+            )
+        self.oids = sorted(self.records)
+        self.delay = delay
+        self.lock = Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.host = '127.0.0.1:{}'.format(self.server_address[1])
+        Thread(target=self.serve_forever, daemon=True).start()
+
+    def respond(self, pdu):
+        oids = [tuple(oid) for oid, value in api.v2c.apiPDU.get_varbinds(pdu)]
+        if pdu.isSameTypeWith(api.v2c.GetRequestPDU()):
+            return [
+                (oid, self.records.get(oid, api.v2c.NoSuchInstance()))
+                for oid in oids
+            ]
+        varbinds = []
+        for _ in range(api.v2c.apiBulkPDU.get_max_repetitions(pdu)):
+            for index, oid in enumerate(oids):
+                position = bisect_right(self.oids, oid)
+                if position < len(self.oids):
+                    oids[index] = self.oids[position]
+                    varbinds.append((oids[index], self.records[oids[index]]))
+                else:
+                    varbinds.append((oid, api.v2c.EndOfMibView()))
+        return varbinds
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestHostPrefix(unittest.TestCase):
+    def test_placeholder(self):
+        self.assertEqual(
+            get_host_prefix('servers.{host}.idrac', 'sw1', True),
+            'servers.sw1.idrac',
+        )
+        self.assertEqual(
+            get_host_prefix('servers.{host}.idrac', 'sw1', False),
+            'servers.sw1.idrac',
+        )
+
+    def test_multiple(self):
+        self.assertEqual(get_host_prefix('switches', 'sw1', True),
+                         'switches.sw1')
+        self.assertEqual(get_host_prefix('switches', 'sw1', False),
+                         'switches')
+
+
+class TestGetTable(unittest.TestCase):
+    """Walk the tables with the requests answered from the records"""
+
+    def setUp(self):
+        self.records = {}
+        for line in _switch_records().splitlines():
+            oid, tag, value = line.split('|', 2)
+            key = tuple(int(x) for x in oid.split('.'))
+            self.records[key] = int(value) if tag != '4' else value
+        self.oids = sorted(self.records)
+        self.device = SNMPDevice(None, None, 'sw1', 2)
+        self.device.send = self.send
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send(self, command, OID, non_repeaters, max_repetitions):
+        self.assertEqual(command, 'bulk')
+        self.requests.append(OID)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        oid = tuple(int(x) for x in OID.split('.'))
+        results = []
+        for _ in range(max_repetitions):
+            position = bisect_right(self.oids, oid)
+            # The agent repeats the last OID at the end of the MIB
+            if position < len(self.oids):
+                oid = self.oids[position]
+            results.append((oid, self.records.get(oid)))
+        return results
+
+    def get_tables(self, OIDs):
+        return asyncio.run(self.device.get_tables(OIDs))
+
+    def test_subtree(self):
+        # The walk stops at the first OID after the table
+        self.assertEqual(self.get_tables(['1.3.6.1.2.1.31.1.1.1.1']), [
+            {port: str(port) for port in _ports},
+        ])
+        self.assertEqual(self.requests, ['1.3.6.1.2.1.31.1.1.1.1'])
+
+    def test_leading_dot(self):
+        self.assertEqual(
+            self.get_tables(['.1.3.6.1.4.1.11.2.14.11.5.1.7.1.3.1.1.8']),
+            [{port: int(port == 7) for port in _ports}],
+        )
+
+    def test_missing(self):
+        self.assertEqual(self.get_tables(['1.3.6.1.2.1.31.1.1.1.99']), [{}])
+
+    def test_end_of_mib(self):
+        self.assertEqual(self.get_tables(['1.3.6.1.4.1.11.2.14.11.5.1.9']), [
+            {0: 12},
+        ])
+        self.assertEqual(self.get_tables(['1.3.6.1.4.1.674']), [{}])
+
+    def test_pages(self):
+        # Spread the table over many requests of 25 values
+        for port in range(9, 60):
+            self.records[(1, 3, 6, 1, 2, 1, 2, 2, 1, 8, port)] = 1
+        self.oids = sorted(self.records)
+        tables = self.get_tables(['1.3.6.1.2.1.2.2.1.8'])
+        self.assertEqual(len(tables[0]), 59)
+        self.assertEqual(tables[0][8], 2)
+        self.assertEqual(self.requests, [
+            '1.3.6.1.2.1.2.2.1.8',
+            '1.3.6.1.2.1.2.2.1.8.25',
+            '1.3.6.1.2.1.2.2.1.8.50',
+        ])
+
+    def test_max_requests(self):
+        tables = self.get_tables(_counters)
+        self.assertEqual(len(tables), len(_counters))
+        self.assertEqual(tables[1], {port: 100 + port for port in _ports})
+        self.assertEqual(self.max_in_flight, 2)
+
+
+@unittest.skipIf(api is None, 'pysnmp is not installed')
+class TestSNMP(unittest.TestCase):
+    def setUp(self):
+        self.responders = []
+
+    def tearDown(self):
+        for responder in self.responders:
+            responder.close()
+
+    def responder(self, records, delay=0.01):
+        responder = _Responder(records, delay)
+        self.responders.append(responder)
+        return responder
+
+    def test_tables(self):
+        responder = self.responder(_switch_records(), delay=0)
+
+        async def poll(snmp):
+            return (
+                await snmp.get_value('1.3.6.1.2.1.1.1.0'),
+                await snmp.get_tables([
+                    '1.3.6.1.2.1.31.1.1.1.1',
+                    '.1.3.6.1.4.1.11.2.14.11.5.1.7.1.3.1.1.8',
+                    '1.3.6.1.2.1.31.1.1.1.10',
+                    '1.3.6.1.2.1.31.1.1.1.99',
+                ]),
+            )
+
+        args = Namespace(community='public', max_requests=4)
+        results = poll_devices([responder.host], args, poll)
+        model, tables = results[responder.host]
+        self.assertEqual(model, 'ProCurve J9850A')
+        self.assertEqual(tables, [
+            {port: str(port) for port in _ports},
+            {port: int(port == 7) for port in _ports},
+            {port: 100 + port for port in _ports},
+            {},
+        ])
+
+    def test_switch(self):
+        # Delay the responses long enough for the requests to overlap
+        responders = [
+            self.responder(_switch_records(), delay=0.05) for _ in range(3)
+        ]
+        responders.append(self.responder(_switch_records('Unknown')))
+        result = run_collector('switch', [
+            '--community', 'public', '--max-requests', '3',
+        ] + [r.host for r in responders])
+        # The unknown switch does not stop the others
+        self.assertEqual(result.error, 'returned -1')
+        values = {}
+        for line in result.lines:
+            path, value, timestamp = line.split()
+            values[path] = int(value)
+        self.assertEqual(len(values), 3 * (1 + 6 * len(_counters)))
+        for responder in responders[:3]:
+            prefix = 'switches.' + responder.host
+            self.assertEqual(values[prefix + '.cpu'], 12)
+            self.assertEqual(values[prefix + '.ports.1.bytesIn'], 1)
+            self.assertEqual(values[prefix + '.ports.6.ifOutDiscards'], 906)
+            self.assertNotIn(prefix + '.ports.7.bytesIn', values)
+            self.assertNotIn(prefix + '.ports.8.bytesIn', values)
+            # The tables are walked concurrently up to the limit
+            self.assertEqual(responder.max_in_flight, 3)
+
+    def test_idrac(self):
+        responders = [self.responder(_idrac_records) for _ in range(2)]
+        result = run_collector('idrac', [
+            '--community', 'public', '--prefix', 'servers.{host}.idrac',
+        ] + [r.host for r in responders])
+        self.assertIsNone(result.error)
+        values = {}
+        for line in result.lines:
+            path, value, timestamp = line.split()
+            values[path] = float(value)
+        for responder in responders:
+            prefix = 'servers.{}.idrac'.format(responder.host)
+            self.assertEqual(values, {
+                **values,
+                prefix + '.temperature.CPU1_Temp': 45.0,
+                prefix + '.current.System_Board_Pwr_Consumption.W': 200,
+            })
+        self.assertEqual(len(values), 4)
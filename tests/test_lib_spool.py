@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Spool
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from os import listdir
+from tempfile import TemporaryDirectory
+import unittest
+
+from lib_spool import Spool
+
+
+def _lines(start, stop):
+    return [b'a.b%d %d 1700000000\n' % (i, i) for i in range(start, stop)]
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.directory = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_read_commit(self):
+        with Spool(self.directory) as spool:
+            spool.append(b''.join(_lines(0, 10)))
+            self.assertEqual(spool.read(4), _lines(0, 4))
+            # Without commit the same lines are read again
+            self.assertEqual(spool.read(4), _lines(0, 4))
+            spool.commit()
+            self.assertEqual(spool.read(100), _lines(4, 10))
+            spool.commit()
+            self.assertEqual(spool.backlog, 0)
+            self.assertEqual(spool.read(100), [])
+
+    def test_segments(self):
+        with Spool(self.directory, segment_size=100) as spool:
+            for i in range(10):
+                spool.append(b''.join(_lines(i * 5, i * 5 + 5)))
+            self.assertEqual(len(listdir(self.directory)), 10)
+            self.assertEqual(spool.read(12), _lines(0, 12))
+            spool.commit()
+            # The completely read segments are removed
+            self.assertEqual(len(listdir(self.directory)), 9)
+            self.assertEqual(spool.read(100), _lines(12, 50))
+
+    def test_max_size(self):
+        with Spool(self.directory, max_size=500, segment_size=100) as spool:
+            for i in range(10):
+                spool.append(b''.join(_lines(i * 5, i * 5 + 5)))
+            self.assertLessEqual(spool.size, 500)
+            lines = spool.read(100)
+            # The oldest lines are dropped
+            self.assertEqual(lines, _lines(50 - len(lines), 50))
+            self.assertEqual(spool.backlog, sum(len(l) for l in lines))
+
+    def test_restart(self):
+        with Spool(self.directory, segment_size=100) as spool:
+            spool.append(b''.join(_lines(0, 10)))
+            spool.read(3)
+            spool.commit()
+            spool.read(3)
+        with Spool(self.directory, segment_size=100) as spool:
+            spool.append(b''.join(_lines(10, 12)))
+            self.assertEqual(spool.read(100), _lines(3, 12))
+
+    def test_locked(self):
+        with Spool(self.directory):
+            with self.assertRaises(OSError):
+                Spool(self.directory)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Counter State
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import time
+import unittest
+
+from lib_state import CounterStore
+
+
+class TestCounterStore(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.filename = join(self._temp_dir.name, 'test.counters')
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_persistence(self):
+        with CounterStore(self.filename) as store:
+            self.assertIsNone(store.get('a.b'))
+            store.set('a.b', 100, 5)
+        with CounterStore(self.filename) as store:
+            self.assertEqual(store.get('a.b'), (100, 5))
+            self.assertIsNone(store.get('a.c'))
+
+    def test_rate(self):
+        with CounterStore(self.filename) as store:
+            self.assertIsNone(store.rate('bytesIn', 1000, 100))
+            self.assertEqual(store.rate('bytesIn', 1600, 160), 10)
+            # Same timestamp, no rate can be computed
+            self.assertIsNone(store.rate('bytesIn', 1700, 160))
+
+    def test_wrap(self):
+        with CounterStore(self.filename) as store:
+            store.rate('c32', 2 ** 32 - 100, 0)
+            self.assertEqual(store.rate('c32', 100, 10), 20)
+            store.rate('c64', 2 ** 64 - 2 ** 20, 0)
+            self.assertEqual(store.rate('c64', 2 ** 20, 2), 2 ** 20)
+
+    def test_reset(self):
+        with CounterStore(self.filename) as store:
+            store.rate('counter', 5000, 0)
+            self.assertIsNone(store.rate('counter', 10, 10))
+            self.assertEqual(store.rate('counter', 20, 20), 1)
+
+    def test_grow(self):
+        now = time()
+        with CounterStore(self.filename, capacity=16) as store:
+            for i in range(1000):
+                store.set('metric{}'.format(i), now, i)
+        with CounterStore(self.filename) as store:
+            self.assertGreaterEqual(store._capacity, 1024)
+            for i in range(1000):
+                self.assertEqual(store.get('metric{}'.format(i)), (now, i))
+
+    def test_locked(self):
+        with CounterStore(self.filename) as store:
+            store.set('a', 100, 5)
+            with self.assertRaises(OSError):
+                CounterStore(self.filename, lock_timeout=0.1)
+        with CounterStore(self.filename, lock_timeout=0.1) as store:
+            self.assertEqual(store.get('a'), (100, 5))
+
+    def test_expire(self):
+        with CounterStore(self.filename, capacity=16, max_age=60) as store:
+            store.set('old', 0, 1)
+            for i in range(20):
+                store.set('metric{}'.format(i), time(), i)
+            self.assertIsNone(store.get('old'))
+
+    def test_many_metrics(self):
+        keys = ['host.disk.sd{}.iopsRead'.format(i) for i in range(10000)]
+        now = time()
+        with CounterStore(self.filename) as store:
+            for key in keys:
+                self.assertIsNone(store.rate(key, 0, now))
+        with CounterStore(self.filename) as store:
+            for key in keys:
+                self.assertEqual(store.rate(key, 100, now + 10), 10)
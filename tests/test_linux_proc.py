@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Linux procfs and sysfs Collectors
+
+The collectors are run on the files captured into linux_proc.tgz by
+tests/harness.py.
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from inspect import currentframe, getfile
+from os.path import dirname, join
+import unittest
+
+from lib_runner import run_collector
+from tests.harness import benchmark, replay
+
+_collectors = {
+    'linux_cpu': [],
+    'linux_disk': [],
+    'linux_load': [],
+    'linux_memory': [],
+    'linux_network': [],
+    'linux_numa': [],
+    'linux_pressure': [],
+    'linux_vmstat': ['--fields', 'nr_free_pages', 'pgfault'],
+}
+
+
+def _values(lines):
+    """Strip the timestamps from the lines"""
+    return dict(line.split()[:2] for line in lines)
+
+
+class TestLinuxProc(unittest.TestCase):
+    _tests_dir = dirname(getfile(currentframe()))
+
+    @classmethod
+    def setUpClass(self):
+        self._replay = replay(join(self._tests_dir, 'linux_proc.tgz'))
+        self._replay.__enter__()
+
+    @classmethod
+    def tearDownClass(self):
+        self._replay.__exit__(None, None, None)
+
+    def run_collector(self, name):
+        result = run_collector(name, _collectors[name])
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def test_linux_cpu(self):
+        values = self.run_collector('linux_cpu')
+        self.assertEqual(values['cpu.amount'], '1')
+        self.assertEqual(values['cpu.0.user'], '6411')
+        self.assertEqual(values['cpu.0.idle'], '103962')
+
+    def test_linux_disk(self):
+        values = self.run_collector('linux_disk')
+        self.assertEqual(values['disk.vda.iopsRead'], '6902')
+        self.assertEqual(values['disk.vda.bytesRead'], '778679296')
+
+    def test_linux_load(self):
+        values = self.run_collector('linux_load')
+        self.assertEqual(values, {
+            'load.avg01': '0.32', 'load.avg05': '0.23', 'load.avg15': '0.09',
+        })
+
+    def test_linux_memory(self):
+        values = self.run_collector('linux_memory')
+        self.assertEqual(values['memory.MemTotal'], '6305947648')
+        self.assertEqual(values['memory.MemFree'], '5207379968')
+        self.assertEqual(values['memory.Apps'], '243851264')
+
+    def test_linux_network(self):
+        values = self.run_collector('linux_network')
+        self.assertEqual(values['network.eth0.bytesIn'], '129927')
+        self.assertEqual(values['network.eth0.pktsOut'], '44')
+        self.assertEqual(values['network.lo.bytesIn'], '25646803')
+        # Only the physical devices report the errors
+        self.assertIn('network.eth0.errsIn', values)
+        self.assertNotIn('network.lo.errsIn', values)
+
+    def test_linux_numa(self):
+        values = self.run_collector('linux_numa')
+        self.assertEqual(values['numa.node0.cpu.user'], '6411')
+        self.assertEqual(values['numa.node0.stat.numa_hit'], '1859160')
+        self.assertEqual(values['numa.node0.memory.MemTotal'], '4292344')
+
+    def test_linux_pressure(self):
+        values = self.run_collector('linux_pressure')
+        self.assertEqual(values['pressure.cpu.some.avg10'], '1.29')
+        self.assertEqual(values['pressure.cpu.some.total'], '27645805')
+
+    def test_linux_vmstat(self):
+        values = self.run_collector('linux_vmstat')
+        self.assertEqual(values, {
+            'vmstat.nr_free_pages': '804896', 'vmstat.pgfault': '2090572',
+        })
+
+    def test_benchmark(self):
+        result = benchmark('linux_load', runs=2)
+        self.assertIsNone(result.error)
+        self.assertGreater(result.lines, 0)
+        self.assertEqual(len(result.wall_times), 2)
+        self.assertGreater(result.allocated, 0)
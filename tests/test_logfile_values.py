@@ -0,0 +1,602 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Values from Log File
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from argparse import ArgumentTypeError, Namespace
+from datetime import datetime, timezone
+from os import rename, utime
+from os.path import join
+from random import Random
+from tempfile import TemporaryDirectory
+import gzip
+from time import time
+import json
+import unittest
+
+from lib_logfile import TimestampParser
+from lib_runner import run_collector
+from logfile_values import (
+    Metric,
+    convert_to_timestamp,
+    extract_value,
+    format_bound,
+    get_archive_files,
+    parse_line,
+    strptime_timestamp,
+)
+
+_metrics = [
+    'mean:1:mean:1h',
+    'sum:2:sum:1h',
+    'median:1:median:1h',
+    'count:2:count_50:1h',
+    'percentage:2:count_50_percentage:1h',
+    'distribution:1:distribution:1h',
+    'max:2:max:1h',
+    'p90:2:p90:1h',
+]
+
+
+def _lines(start, stop, base):
+    """Return log lines every 10 seconds over the 2 hours before the base"""
+    lines = []
+    for i in range(start, stop):
+        timestamp = datetime.fromtimestamp(
+            base - 7200 + i * 10 + 5, timezone.utc
+        )
+        lines.append('{} {} {}\n'.format(
+            timestamp.strftime('%Y-%m-%dT%H:%M:%S+0000'), i % 7, i % 100,
+        ))
+    return ''.join(lines)
+
+
+def _legacy_estimate(column, fields):
+    """The interpreter of the expressions before they were compiled"""
+    def value(field):
+        try:
+            return float(extract_value(field))
+        except ValueError:
+            return 0.0
+
+    arr = [s for s in column if s.isdigit() or s in ['/', '*', '+', '-']]
+    result = 0
+    for index, char in enumerate(arr):
+        try:
+            if char.isdigit() and result == 0:
+                result += value(fields[int(char)])
+            elif char == '/':
+                div_value = value(fields[int(arr[index + 1])])
+                result = result / div_value if div_value != 0 else 0
+            elif char == '*':
+                result = result * value(fields[int(arr[index + 1])])
+            elif char == '+':
+                result = result + value(fields[int(arr[index + 1])])
+            elif char == '-':
+                result = result - value(fields[int(arr[index + 1])])
+        except (IndexError, ValueError):
+            result = 0
+    return result
+
+
+def _values(lines):
+    """Strip the timestamps from the lines"""
+    return dict(line.split()[:2] for line in lines)
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.base = int(time())
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+        self.state = join(self._tmp.name, 'state')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, data, mode='a'):
+        with open(self.log, mode) as fh:
+            fh.write(data)
+
+    def run_collector(self, *args):
+        argv = ['--file', self.log, '--metric'] + _metrics + list(args)
+        result = run_collector('logfile_values', argv)
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def assert_same_as_full_scan(self):
+        incremental = self.run_collector(
+            '--incremental', '--state-file', self.state,
+            '--granularity', '1',
+        )
+        self.assertEqual(incremental, self.run_collector())
+        return incremental
+
+    def test_append(self):
+        self.write(_lines(0, 600, self.base))
+        self.assert_same_as_full_scan()
+        self.write(_lines(600, 650, self.base))
+        # The incomplete line is read after it is completed
+        self.write(_lines(650, 651, self.base)[:10])
+        self.run_collector(
+            '--incremental', '--state-file', self.state,
+            '--granularity', '1',
+        )
+        self.write(
+            _lines(650, 651, self.base)[10:] + _lines(651, 700, self.base)
+        )
+        values = self.assert_same_as_full_scan()
+        self.assertEqual(values['logfile_values.max'], '99.0')
+
+    def test_rotate(self):
+        self.write(_lines(0, 600, self.base))
+        self.assert_same_as_full_scan()
+        self.write(_lines(600, 650, self.base))
+        rename(self.log, self.log + '.1')
+        self.write(_lines(650, 700, self.base))
+        incremental = self.run_collector(
+            '--incremental', '--state-file', self.state,
+            '--granularity', '1',
+        )
+        # The full scan cannot see the end of the rotated file
+        self.write(_lines(0, 700, self.base), 'w')
+        self.assertEqual(incremental, self.run_collector())
+
+    def test_truncate(self):
+        self.write(_lines(0, 600, self.base))
+        self.assert_same_as_full_scan()
+        self.write(_lines(600, 700, self.base), 'w')
+        incremental = self.run_collector(
+            '--incremental', '--state-file', self.state,
+            '--granularity', '1',
+        )
+        self.write(_lines(0, 700, self.base), 'w')
+        self.assertEqual(incremental, self.run_collector())
+
+    def test_granularity(self):
+        self.write(_lines(0, 600, self.base))
+        self.run_collector(
+            '--incremental', '--state-file', self.state, '--metric',
+            'count:1:count:1h',
+        )
+        self.write(_lines(600, 720, self.base))
+        values = self.run_collector(
+            '--incremental', '--state-file', self.state, '--metric',
+            'count:1:count:1h',
+        )
+        expected = self.run_collector('--metric', 'count:1:count:1h')
+        # The buckets of 60 seconds have 6 lines, the one at the beginning
+        # of the period is added completely
+        self.assertGreaterEqual(
+            float(values['logfile_values.count']),
+            float(expected['logfile_values.count']),
+        )
+        self.assertLessEqual(
+            float(values['logfile_values.count']),
+            float(expected['logfile_values.count']) + 6,
+        )
+        with open(self.state) as fh:
+            self.assertLessEqual(len(json.load(fh)['buckets']), 61)
+
+
+class TestSeek(unittest.TestCase):
+    def setUp(self):
+        self.base = int(time())
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def run_collector(self, data):
+        with open(self.log, 'w') as fh:
+            fh.write(data)
+        argv = ['--file', self.log, '--metric'] + _metrics
+        result = run_collector('logfile_values', argv)
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def test_large_file(self):
+        """Search the period in a file large enough to be bisected"""
+        old = _lines(0, 50000, self.base - 86400 * 7)
+        self.assertGreater(len(old), 1024 * 1024)
+        self.assertEqual(
+            self.run_collector(old + _lines(0, 720, self.base)),
+            self.run_collector(_lines(0, 720, self.base)),
+        )
+
+
+class TestArchives(unittest.TestCase):
+    def setUp(self):
+        self.base = int(time())
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, filename, data):
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(filename, 'wt') as fh:
+            fh.write(data)
+
+    def run_collector(self, *args):
+        argv = ['--file', self.log, '--metric'] + _metrics + list(args)
+        result = run_collector('logfile_values', argv)
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def test_generations(self):
+        self.write(self.log, _lines(0, 720, self.base))
+        expected = self.run_collector()
+        self.write(self.log, _lines(500, 720, self.base))
+        self.write(self.log + '.1', _lines(400, 500, self.base))
+        self.write(self.log + '.2.gz', _lines(300, 400, self.base))
+        # Not needed, as the previous generation starts before the period
+        self.write(self.log + '.3.gz', _lines(650, 720, self.base))
+        for workers in ('1', '4'):
+            self.assertEqual(self.run_collector(
+                '--arch', '--arch-count', '3', '--arch-workers', workers
+            ), expected)
+
+    def test_skip_old(self):
+        for name in ('.1', '.2.gz', '.3.gz', '.10.gz', '.1.gz.tmp'):
+            self.write(self.log + name, '')
+        utime(self.log + '.3.gz', (0, 0))
+        self.assertEqual(get_archive_files(self.log, 10), [
+            self.log + '.1', self.log + '.2.gz', self.log + '.3.gz',
+            self.log + '.10.gz',
+        ])
+        self.assertEqual(get_archive_files(self.log, 2), [
+            self.log + '.1', self.log + '.2.gz',
+        ])
+        # The older generations are skipped by their modification time
+        self.assertEqual(get_archive_files(self.log, 10, time() - 3600), [
+            self.log + '.1', self.log + '.2.gz',
+        ])
+
+
+class TestHistogram(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write_latencies(self, count):
+        """Write the lines with the latencies in the second column"""
+        random = Random(0)
+        now = int(time())
+        with open(self.log, 'w') as fh:
+            for i in range(count):
+                timestamp = datetime.fromtimestamp(
+                    now - 3000 + i * 3000 // count, timezone.utc
+                )
+                fh.write('{} {:.3f}\n'.format(
+                    timestamp.strftime('%Y-%m-%dT%H:%M:%S+0000'),
+                    random.lognormvariate(3, 2),
+                ))
+
+    def run_collector(self, *metrics):
+        result = run_collector(
+            'logfile_values', ['--file', self.log, '--metric'] + list(metrics)
+        )
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def test_buckets(self):
+        self.write_latencies(1000)
+        values = self.run_collector(
+            'd:1:distribution:1h', 'h:1:histogram_10_100:1h',
+            'l:1:histogram_log_1_100_le:1h',
+        )
+        distribution = sum(
+            int(v) for k, v in values.items()
+            if k.startswith('logfile_values.d.')
+        )
+        self.assertEqual(distribution, 1000)
+        self.assertEqual(
+            int(values['logfile_values.h.10']) +
+            int(values['logfile_values.h.100']) +
+            int(values['logfile_values.h.inf']),
+            1000,
+        )
+        self.assertEqual(int(values['logfile_values.l.le_inf']), 1000)
+        self.assertEqual(
+            values['logfile_values.l.le_10'], values['logfile_values.h.10']
+        )
+        self.assertEqual(
+            int(values['logfile_values.l.le_100']),
+            int(values['logfile_values.h.10']) +
+            int(values['logfile_values.h.100']),
+        )
+        self.assertEqual(
+            [k for k in values if k.startswith('logfile_values.l.')],
+            ['logfile_values.l.le_' + b for b in (
+                '1', '2', '5', '10', '20', '50', '100', 'inf',
+            )],
+        )
+
+    def test_empty(self):
+        self.assertEqual(
+            Metric('l:1:histogram_log_1_100_le:1h').get_metric_value(),
+            {'le_' + b: 0 for b in ('1', '2', '5', '10', '20', '50', '100',
+                                    'inf')},
+        )
+
+    def test_bounds(self):
+        self.assertEqual(
+            [format_bound(b) for b in (
+                0.0000001, 0.0000005, 0.1, 1, 100, 2.5e16, -3, float('inf')
+            )],
+            ['0_0000001', '0_0000005', '0_1', '1', '100',
+             '25000000000000000', '-3', 'inf'],
+        )
+        metric = Metric('h:1:histogram_0.0000001_0.0000005_1:1h')
+        for value in (0.0000001, 0.0000003, 1):
+            metric.aggregate.add(value)
+        self.assertEqual(metric.get_metric_value(), {
+            '0_0000001': 1, '0_0000005': 1, '1': 1, 'inf': 0,
+        })
+
+    def test_invalid(self):
+        for function in (
+            'histogram_a', 'histogram_log_1', 'histogram_log_0_1',
+        ):
+            with self.assertRaises(ArgumentTypeError):
+                Metric('h:1:{}:1h'.format(function))
+
+    def test_series(self):
+        """The histogram has fewer series than the distribution"""
+        self.write_latencies(2000)
+        distribution = self.run_collector('m:1:distribution:1h')
+        histogram = self.run_collector('m:1:histogram:1h')
+        self.assertEqual(len(histogram), 20)
+        self.assertGreater(len(distribution), len(histogram))
+
+
+def _structured_lines(start, stop, log_format, base):
+    """Return the lines of _lines() with named fields"""
+    lines = []
+    for line in _lines(start, stop, base).splitlines():
+        timestamp, first, second = line.split()
+        values = {
+            'time': timestamp, 'msg': 'took {} ms'.format(first),
+            'first': int(first), 'second': int(second),
+        }
+        if log_format == 'json':
+            lines.append(json.dumps(values) + '\n')
+        else:
+            lines.append(
+                'time={time} msg="{msg}" first={first} second={second}\n'
+                .format(**values)
+            )
+    return ''.join(lines)
+
+
+class TestStructured(unittest.TestCase):
+    def setUp(self):
+        self.base = int(time())
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def run_collector(self, data, metrics, *args):
+        with open(self.log, 'w') as fh:
+            fh.write(data)
+        argv = ['--file', self.log, '--metric'] + metrics + list(args)
+        result = run_collector('logfile_values', argv)
+        self.assertIsNone(result.error)
+        return _values(result.lines)
+
+    def test_same_as_plain(self):
+        expected = self.run_collector(_lines(0, 720, self.base), _metrics)
+        named = [
+            m.replace(':1:', ':first:').replace(':2:', ':second:')
+            for m in _metrics
+        ]
+        for log_format in ('json', 'logfmt'):
+            data = _structured_lines(0, 720, log_format, self.base)
+            for args in ((), ('--incremental', '--granularity', '1',
+                              '--state-file', join(
+                                  self._tmp.name, log_format + '.state'
+                              ))):
+                self.assertEqual(self.run_collector(
+                    data, named, '--format', log_format, *args
+                ), expected)
+
+    def test_fields(self):
+        line = (
+            'ts=1700000000 msg="a b=5 \\"quoted\\"" b=2 c="3" '
+            'path=/a=1 d=\n'
+        )
+        args = Namespace(
+            format='logfmt', field_names={'ts', 'b', 'c', 'd', 'e'},
+            time_column='ts', time_format='epoch',
+        )
+        timestamp, fields = parse_line(line, args)
+        self.assertEqual(timestamp, 1700000000)
+        self.assertEqual(fields, {'ts': '1700000000', 'b': '2', 'c': '3',
+                                  'd': ''})
+        metric = Metric('m:b*c+e:mean:1h', named=True)
+        self.assertEqual(metric.field_names, {'b', 'c', 'e'})
+        # The missing fields result in 0 like the missing columns
+        self.assertEqual(metric.estimate_columns_value(fields), 0)
+        self.assertEqual(
+            Metric('m:b*(c+b)', named=True).estimate_columns_value(fields), 10
+        )
+        args.format = 'json'
+        self.assertIsNone(parse_line('{"b": 2}', args))
+
+    def test_constants(self):
+        metric = Metric('latency:duration_ms/1000:p99:5min', named=True)
+        self.assertEqual(metric.field_names, {'duration_ms'})
+        for log_format, line in (
+            ('json', '{"ts": 1700000000, "duration_ms": 250}'),
+            ('logfmt', 'ts=1700000000 duration_ms=250'),
+        ):
+            args = Namespace(
+                format=log_format, field_names=metric.field_names | {'ts'},
+                time_column='ts', time_format='epoch',
+            )
+            timestamp, fields = parse_line(line, args)
+            self.assertEqual(metric.estimate_columns_value(fields), 0.25)
+        self.assertEqual(
+            Metric('m:(b+0.5)*2', named=True).estimate_columns_value(
+                {'b': '2'}
+            ),
+            5,
+        )
+
+    def test_many_fields(self):
+        """Only the used fields are picked from the long lines"""
+        count = 1000
+        time_format = '%Y-%m-%dT%H:%M:%S%z'
+        values = [
+            {'time': datetime.fromtimestamp(1792000000 + i, timezone.utc)
+             .strftime(time_format)}
+            for i in range(count)
+        ]
+        # The service logs have many fields besides the used ones
+        for i, value in enumerate(values):
+            for j in range(30):
+                value['field{}'.format(j)] = i * j if j % 2 else 'v' + str(j)
+            value['latency'] = i % 1000
+        formats = {
+            'plain': ' '.join,
+            'json': json.dumps,
+            'logfmt': lambda v: ' '.join(k + '=' + str(v[k]) for k in v),
+        }
+        for log_format, dump in formats.items():
+            named = log_format != 'plain'
+            args = Namespace(
+                format=log_format, columns_num=0, time_format=time_format,
+                time_column='time' if named else 0,
+                field_names={'time', 'latency'},
+            )
+            lines = [
+                dump(v if named else [str(f) for f in v.values()])
+                for v in values
+            ]
+            metric = Metric('m:{}:mean:1h'.format('latency' if named else 31),
+                            named)
+            for i, line in enumerate(lines):
+                timestamp, fields = parse_line(line, args)
+                self.assertEqual(timestamp, 1792000000 + i)
+                metric.aggregate.add(metric.estimate_columns_value(fields))
+            self.assertEqual(metric.get_mean(), 499.5)
+
+
+class TestExpression(unittest.TestCase):
+    fields = '2026-10-17T12:00:00 a=1 b="2" 3 4 5 6 7 8 9 10 11 12'.split()
+
+    def evaluate(self, column):
+        return Metric('m:{}:mean:1h'.format(column)).estimate_columns_value(
+            self.fields
+        )
+
+    def test_columns(self):
+        self.assertEqual(self.evaluate('1'), 1.0)
+        self.assertEqual(self.evaluate('2'), 2.0)
+        self.assertEqual(self.evaluate('12'), 12.0)
+        self.assertEqual(self.evaluate('0'), 0.0)
+
+    def test_precedence(self):
+        self.assertEqual(self.evaluate('3+4*5'), 23.0)
+        self.assertEqual(self.evaluate('(3+4)*5'), 35.0)
+        self.assertEqual(self.evaluate('12-4-3'), 5.0)
+        self.assertEqual(self.evaluate('12/4/3'), 1.0)
+        self.assertEqual(self.evaluate('$6 / ($4 + $5)'), 6 / 9)
+
+    def test_errors(self):
+        self.assertEqual(self.evaluate('3/0'), 0)
+        self.assertEqual(self.evaluate('3+13'), 0)
+        for column in ('3+', '(3', '3)', '3 4'):
+            with self.assertRaises(ArgumentTypeError):
+                Metric('m:{}:mean:1h'.format(column))
+
+    def test_same_as_legacy(self):
+        # No zeros, the legacy interpreter treated them specially
+        lines = [
+            '{} {} {} {}'.format(i, i % 97 + 1, i % 13 + 1, i % 7).split()
+            for i in range(1000)
+        ]
+        column = '1*2/3'
+        metric = Metric('m:{}:mean:1h'.format(column))
+        for fields in lines:
+            self.assertEqual(
+                metric.estimate_columns_value(fields),
+                _legacy_estimate(column, fields),
+            )
+
+
+class TestTimestamps(unittest.TestCase):
+    def assert_same(self, time_format, samples):
+        for time_str in samples:
+            self.assertEqual(
+                convert_to_timestamp(time_str, time_format),
+                strptime_timestamp(time_str, time_format),
+                time_str,
+            )
+
+    def test_iso(self):
+        self.assert_same('%Y-%m-%dT%H:%M:%S%z', [
+            '2026-10-17T12:00:00+0000',
+            '2026-10-17T12:00:00Z',
+            '2026-10-17T12:00:00+02:00',
+            '2026-10-17T12:00:00-0530',
+            '1700000000',
+        ])
+        self.assert_same('%Y-%m-%dT%H:%M:%S.%f%z', [
+            '2026-10-17T12:00:00.654320355Z',
+            '2026-10-17T12:00:00.999999+0100',
+            '2026-10-17T12:00:01.1Z',
+        ])
+        self.assert_same('%Y-%m-%dT%H:%M:%S', ['2026-10-17T12:00:00'])
+
+    def test_strptime(self):
+        self.assert_same('[%d/%b/%Y:%H:%M:%S', ['[17/Oct/2026:12:00:00'])
+        self.assert_same('%d.%m.%Y-%H:%M:%S', [
+            '17.10.2026-12:00:00', '18.10.2026-12:00:00',
+        ])
+
+    def test_epoch(self):
+        self.assertEqual(convert_to_timestamp('1700000000', 'epoch'),
+                         1700000000)
+        self.assertEqual(convert_to_timestamp('1700000000.9', 'epoch'),
+                         1700000000)
+        self.assertEqual(convert_to_timestamp('1700000000999', 'epoch_ms'),
+                         1700000000)
+
+    def test_memo(self):
+        """The lines of the same second are parsed only once"""
+        base = 1792000000
+        samples = {
+            '%Y-%m-%dT%H:%M:%S.%f%z': [
+                datetime.fromtimestamp(base + i // 100, timezone.utc)
+                .strftime('%Y-%m-%dT%H:%M:%S.{:09d}Z'.format(i * 7919))
+                for i in range(1000)
+            ],
+            '[%d/%b/%Y:%H:%M:%S': [
+                datetime.fromtimestamp(base + i // 100, timezone.utc)
+                .strftime('[%d/%b/%Y:%H:%M:%S')
+                for i in range(1000)
+            ],
+        }
+        for time_format, lines in samples.items():
+            parsed = []
+
+            def fallback(time_str):
+                parsed.append(time_str)
+                return strptime_timestamp(time_str, time_format)
+
+            parser = TimestampParser(time_format, fallback)
+            self.assertEqual(
+                [parser(s) for s in lines],
+                [strptime_timestamp(s, time_format) for s in lines],
+            )
+            self.assertLessEqual(len(parsed), 10)
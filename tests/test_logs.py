@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Logs
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from datetime import datetime
+from os.path import join
+from random import Random
+from tempfile import TemporaryDirectory
+from time import time
+import hashlib
+import re
+import unittest
+
+from lib_runner import run_collector
+from logs import get_prefilter
+
+_time_regex = r'([0-9]{2}-?){3} ([0-9]{2}:?){3}'
+_time_format = '%y-%m-%d %H:%M:%S'
+_message_regex = r'(\[ERROR\].*)'
+
+
+def _lines(count, seed=0):
+    """Return log lines every second until now with some disorder"""
+    random = Random(seed)
+    now = int(time())
+    lines = []
+    for i in range(count):
+        timestamp = now - count + i + random.randrange(-5, 5)
+        level = random.choice(('ERROR', 'INFO', 'INFO', 'WARNING'))
+        lines.append('{} [{}] message {}\n'.format(
+            datetime.fromtimestamp(timestamp).strftime(_time_format),
+            level, random.randrange(20),
+        ))
+        if i % 100 == 0:
+            lines.append('  continued without time [ERROR]\n')
+    return ''.join(lines)
+
+
+def _legacy_count(filename, timeshift, message_regex=_message_regex):
+    """Count the messages reading the whole file like before"""
+    errors = {}
+    with open(filename) as fh:
+        for line in fh:
+            time_match = re.search(_time_regex, line)
+            if not time_match:
+                continue
+            time_string = datetime.strptime(time_match.group(0), _time_format)
+            message_match = re.search(message_regex, line)
+            if message_match and time_string >= timeshift:
+                message_hash = hashlib.md5(
+                    message_match.group(0).encode('utf-8')
+                ).hexdigest()
+                errors[message_hash] = errors.get(message_hash, 0) + 1
+    return sum(errors.values()), len(errors)
+
+
+class TestLogs(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'app.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def run_collector(self, timeshift, *args, message_regex=_message_regex):
+        argv = [self.log, timeshift, _time_regex, _time_format]
+        if message_regex:
+            argv.append(message_regex)
+        result = run_collector('logs', argv + list(args))
+        self.assertIsNone(result.error)
+        return result
+
+    def count(self, timeshift):
+        """Return the total and the unique count and the timeshift"""
+        lines = self.run_collector(timeshift, '--verbose').lines
+        unique, total = (int(line.split()[0]) for line in lines[:2])
+        return total, unique, datetime.fromisoformat(lines[2].split(' ', 1)[1])
+
+    def test_counts(self):
+        with open(self.log, 'w') as fh:
+            fh.write(_lines(7200))
+        for timeshift in ('90s', '15m', '1h', '10d'):
+            total, unique, since = self.count(timeshift)
+            self.assertEqual((total, unique), _legacy_count(self.log, since))
+            self.assertGreater(total, 0)
+
+    def test_patterns(self):
+        with open(self.log, 'w') as fh:
+            fh.write(_lines(7200))
+        patterns = {
+            'error': _message_regex,
+            'warning': r'(\[WARNING\].*)',
+            'message': r'(message (1|2).*)',
+            'backreference': r'(message (\d)\2)',
+        }
+        argv = []
+        for name, regex in patterns.items():
+            argv += ['--pattern', name, regex]
+        lines = self.run_collector(
+            '1h', '--verbose', *argv, message_regex=None
+        ).lines
+        since = datetime.fromisoformat(lines[-1].split(' ', 1)[1])
+        for index, (name, regex) in enumerate(patterns.items()):
+            unique, total = (
+                int(line.split()[1]) for line in lines[index * 2:][:2]
+            )
+            self.assertEqual(
+                (total, unique), _legacy_count(self.log, since, regex), name
+            )
+        # Without the verbose flag, the metrics are named after the patterns
+        lines = self.run_collector('1h', '--total', *argv).lines
+        self.assertEqual(
+            [line.split()[0] for line in lines],
+            ['logs.app_log'] + ['logs.app_log.' + name for name in patterns],
+        )
+
+    def test_prefilter_backreference(self):
+        patterns = [
+            (None, re.compile(r'(ERROR .*)')),
+            (None, re.compile(r'(\w+) again \1')),
+        ]
+        prefilter = get_prefilter(patterns)
+        self.assertTrue(
+            prefilter is None or prefilter.search('retry again retry')
+        )
+        self.assertIsNone(get_prefilter(patterns[:1] + [
+            (None, re.compile(r'(?P<word>\w+) again (?P=word)')),
+        ]))
+        self.assertIsNotNone(get_prefilter(patterns[:1] * 2))
+
+    def test_missing_file(self):
+        result = self.run_collector('15m', '--total')
+        self.assertEqual(result.lines[0].split()[1], '0')
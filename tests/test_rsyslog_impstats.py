@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Rsyslog impstats
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import sleep
+from unittest.mock import patch
+import re
+import unittest
+
+from lib_runner import enable_resident, run_collector
+import lib_runner
+from rsyslog_impstats import parse_line, parse_log
+
+
+def _lines(intervals, actions=20, start=0):
+    """Return the impstats lines of the intervals"""
+    lines = []
+    for interval in range(start, start + intervals):
+        lines.append(
+            'Nov  5 00:00:00 localhost rsyslogd-pstats: main Q: '
+            'origin=core.queue size=1 enqueued={} full=0 '
+            'discarded.full=0 discarded.nf=0 maxqsize=10\n'.format(interval)
+        )
+        for action in range(actions):
+            for queue in ('queue', 'queue[DA]') if action % 5 == 0 else (
+                'queue',
+            ):
+                lines.append(
+                    'Nov  5 00:00:00 localhost rsyslogd-pstats: '
+                    'action-{}-builtin:omfwd {}: origin=core.queue size={} '
+                    'enqueued={} full=0 discarded.full={} discarded.nf=0 '
+                    'maxqsize=92057\n'.format(
+                        action, queue, action, interval * 100 + action,
+                        interval,
+                    )
+                )
+    return ''.join(lines)
+
+
+def _legacy_parse(filename):
+    """Parse the whole file with the regex like before"""
+    actions = {}
+    regex = re.compile(
+        r'(?P<action>action-\d+).* queue(?P<is_DA>\[DA\]|)'
+        r': .*size=(?P<size>\d+) enqueued=(?P<enqueued>\d+)'
+        r' .* discarded\.full=(?P<discarded_full>\d+)'
+    )
+    with open(filename) as fh:
+        for line in fh:
+            match = regex.search(line)
+            if not match:
+                continue
+            stats = match.groupdict()
+            action_name = stats.pop('action').replace('-', '')
+            if stats.pop('is_DA'):
+                action_name += '_DA'
+            actions[action_name] = {k: int(v) for k, v in stats.items()}
+    return actions
+
+
+class TestImpstats(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'pstats')
+
+    def tearDown(self):
+        for obj in (lib_runner._resident or {}).values():
+            obj.close()
+        lib_runner._resident = None
+        self._tmp.cleanup()
+
+    def write(self, data, mode='w'):
+        with open(self.log, mode) as fh:
+            fh.write(data)
+
+    def test_same_as_legacy(self):
+        self.write(_lines(100))
+        stats = parse_log(self.log)
+        self.assertEqual(stats, _legacy_parse(self.log))
+        self.assertEqual(len(stats), 24)
+        self.assertEqual(
+            stats['action5_DA'],
+            {'size': 5, 'enqueued': 9905, 'discarded_full': 99},
+        )
+
+    def test_rates(self):
+        # The counters are kept open between the runs like by the daemon
+        enable_resident()
+        self.write(_lines(1))
+        argv = [
+            '--filename', self.log, '--rates', 'add',
+            '--state-file', join(self._tmp.name, 'counters'),
+        ]
+        result = run_collector('rsyslog_impstats', argv)
+        self.assertIsNone(result.error)
+        self.assertFalse(any('_rate ' in line for line in result.lines))
+        sleep(1)
+        self.write(_lines(10, start=1), 'a')
+        result = run_collector('rsyslog_impstats', argv)
+        self.assertIsNone(result.error)
+        values = dict(line.split()[:2] for line in result.lines)
+        self.assertEqual(values['rsyslog.action3.enqueued'], '1003')
+        self.assertGreater(float(values['rsyslog.action3.enqueued_rate']), 0)
+        self.assertNotIn('rsyslog.action3.size_rate', values)
+
+    def test_last_interval(self):
+        """Only the lines of the last interval are parsed"""
+        self.write(_lines(10000))
+        with patch('rsyslog_impstats.parse_line', wraps=parse_line) as mocked:
+            stats = parse_log(self.log)
+        self.assertEqual(stats['action3']['enqueued'], 999903)
+        # The 25 lines of the interval and the first one seen again
+        self.assertEqual(mocked.call_count, 26)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""igcollect - Tests - Status Codes of Access Logs
+
+Copyright (c) 2026 InnoGames GmbH
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from os import rename
+from os.path import join
+from random import Random
+from tempfile import TemporaryDirectory
+from time import time
+from unittest.mock import patch
+import unittest
+
+from lib_runner import run_collector
+from statuscode2graphite import count_statuscodes
+
+
+def _append(filename, *entries):
+    """Append the entries of the (time, status code) tuples to the log"""
+    with open(filename, 'a') as fh:
+        for seconds, code in entries:
+            fh.write(
+                '10.0.0.1 - - [{} +0000] "GET / HTTP/1.1" {} 612 "-" '
+                '"curl/7.88.1" 0.010\n'.format(
+                    datetime.fromtimestamp(seconds, timezone.utc)
+                    .strftime('%d/%b/%Y:%H:%M:%S'), code,
+                )
+            )
+
+
+def _lines(count, now, seed=0):
+    """Return access log lines, the last fifth of them in the minute"""
+    random = Random(seed)
+    lines = []
+    # Leave a gap, so the minute may start while the test runs
+    old = count * 4 // 5
+    for i in range(count):
+        if i < old:
+            seconds = now - 250 + i * 180 // old
+        else:
+            seconds = now - 50 + (i - old) * 50 // (count - old)
+        lines.append(
+            '10.0.0.{} - - [{} +0000] "GET /{} HTTP/1.1" {} 612 "-" '
+            '"curl/7.88.1"\n'.format(
+                i % 256,
+                datetime.fromtimestamp(seconds, timezone.utc)
+                .strftime('%d/%b/%Y:%H:%M:%S'),
+                i, random.choice((200, 200, 200, 301, 404, 502)),
+            )
+        )
+    return ''.join(lines)
+
+
+def _legacy_count(filename, period_in_sec=60, time_position=3, position=8):
+    """Count the status codes searching the period like before"""
+    def find_row(log, seconds_to_add, start=0):
+        log.seek(start)
+        for number_of_entry, entry in enumerate(log, start):
+            search_time = (
+                timedate_at_start + timedelta(seconds=seconds_to_add)
+            ).strftime('%d/%b/%Y:%H:%M:%S')
+            if search_time in entry.split(' ')[time_position]:
+                return number_of_entry
+        return -1
+
+    timedate_at_start = datetime.now(timezone.utc)
+    with open(filename) as log:
+        for i in range(period_in_sec):
+            start = find_row(log, -period_in_sec + i)
+            if start != -1:
+                break
+        stop = find_row(log, 1, start) - 1
+        for i in range(10):
+            stop = find_row(log, 1)
+            if stop != -1:
+                stop -= 1
+                break
+        log.seek(0)
+        statuscodes = []
+        for line, entry in enumerate(log):
+            if line >= start and (stop == -1 or line <= stop):
+                statuscodes.append(entry.split(' ')[position])
+    return Counter(statuscodes), len(statuscodes)
+
+
+class TestStatusCodes(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.log = join(self._tmp.name, 'access.log')
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, data):
+        with open(self.log, 'w') as fh:
+            fh.write(data)
+
+    def count(self):
+        codes, total = count_statuscodes(self.log, int(time()) - 60, 3, 8, 10)
+        return {k.decode(): v for k, v in codes.items()}, total
+
+    def test_same_as_legacy(self):
+        self.write(_lines(5000, int(time())))
+        codes, total = self.count()
+        self.assertEqual((codes, total), _legacy_count(self.log))
+        self.assertEqual(total, 1000)
+
+    def test_bisect(self):
+        # The file is large enough to be searched
+        self.write(_lines(500000, int(time())))
+        self.assertEqual(self.count()[1], 100000)
+
+    def test_collector(self):
+        self.write(_lines(1000, int(time())))
+        result = run_collector('statuscode2graphite', ['--logfile', self.log])
+        self.assertIsNone(result.error)
+        values = dict(line.split()[:2] for line in result.lines)
+        self.assertEqual(values['nginx.requests'], '200')
+        self.assertEqual(
+            sum(int(v) for k, v in values.items() if 'status_codes' in k), 200
+        )
+
+    def test_latencies(self):
+        now = int(time())
+        timestamp = datetime.fromtimestamp(now - 10, timezone.utc).strftime(
+            '%d/%b/%Y:%H:%M:%S')
+        lines = []
+        for i in range(1000):
+            lines.append(
+                '10.0.0.1 - - [{} +0000] "GET / HTTP/1.1" {} 612 "-" '
+                '"curl/7.88.1" {} {:.3f} urt="{}"\n'.format(
+                    timestamp, 500 if i % 10 == 0 else 200,
+                    'a.example.com' if i % 2 else 'b.example.com',
+                    (i + 1) / 1000, '-' if i % 4 == 0 else '0.001, 0.002',
+                )
+            )
+        self.write(''.join(lines))
+        result = run_collector('statuscode2graphite', [
+            '--logfile', self.log, '--request-time', '13',
+            '--upstream-time', 'urt', '--vhost', '12', '--buckets', '0.1,0.5',
+        ])
+        self.assertIsNone(result.error)
+        values = {
+            k[len('nginx.'):]: float(v)
+            for k, v in (line.split()[:2] for line in result.lines)
+        }
+        self.assertEqual(values['requests'], 1000)
+        self.assertEqual(values['vhosts.a_example_com.requests'], 500)
+        self.assertEqual(values['request_time.max'], 1)
+        self.assertAlmostEqual(values['request_time.p50'], 0.5, delta=0.01)
+        self.assertAlmostEqual(values['request_time.p99'], 0.99, delta=0.01)
+        self.assertEqual(values['request_time.histogram.le_0_1'], 100)
+        self.assertEqual(values['request_time.histogram.le_0_5'], 500)
+        self.assertEqual(values['request_time.histogram.le_inf'], 1000)
+        self.assertEqual(
+            values['status_classes.5xx.request_time.histogram.le_inf'], 100
+        )
+        self.assertEqual(
+            values['vhosts.b_example_com.request_time.histogram.le_0_1'], 50
+        )
+        # The upstream time is missing from every fourth entry
+        self.assertEqual(values['upstream_time.histogram.le_inf'], 750)
+        self.assertEqual(values['upstream_time.max'], 0.001)
+
+    def test_bucket_names(self):
+        timestamp = datetime.fromtimestamp(
+            int(time()) - 10, timezone.utc
+        ).strftime('%d/%b/%Y:%H:%M:%S')
+        self.write(''.join(
+            '10.0.0.1 - - [{} +0000] "GET / HTTP/1.1" 200 612 "-" '
+            '"curl/7.88.1" {}\n'.format(timestamp, request_time)
+            for request_time in (0.00000005, 1234567.5, 1234568)
+        ))
+        result = run_collector('statuscode2graphite', [
+            '--logfile', self.log, '--request-time', '12',
+            '--buckets', '0.0000001,1234567,1234568',
+        ])
+        self.assertIsNone(result.error)
+        values = dict(line.split()[:2] for line in result.lines)
+        prefix = 'nginx.request_time.histogram.le_'
+        self.assertEqual(values[prefix + '0_0000001'], '1')
+        self.assertEqual(values[prefix + '1234567'], '1')
+        self.assertEqual(values[prefix + '1234568'], '3')
+        self.assertEqual(values[prefix + 'inf'], '3')
+
+    def test_vhost_last(self):
+        timestamp = datetime.fromtimestamp(int(time()) - 10, timezone.utc)
+        self.write(''.join(
+            '10.0.0.1 - - [{} +0000] "GET / HTTP/1.1" 200 612 "-" '
+            '"curl/7.88.1" host="example.com"\n'.format(
+                timestamp.strftime('%d/%b/%Y:%H:%M:%S')
+            ) for _ in range(3)
+        ))
+        result = run_collector('statuscode2graphite', [
+            '--logfile', self.log, '--vhost', 'host',
+        ])
+        self.assertIsNone(result.error)
+        values = dict(line.split()[:2] for line in result.lines)
+        self.assertEqual(values['nginx.vhosts.example_com.requests'], '3')
+
+    def collect(self, now=None):
+        """Run the collector incrementally at the given time"""
+        argv = [
+            '--logfile', self.log, '--incremental',
+            '--state-file', join(self._tmp.name, 'state'),
+            '--request-time', '12',
+        ]
+        if now is None:
+            result = run_collector('statuscode2graphite', argv)
+        else:
+            with patch('time.time', return_value=now):
+                result = run_collector('statuscode2graphite', argv)
+        self.assertIsNone(result.error)
+        return {
+            (k, int(t)): float(v)
+            for k, v, t in (line.split() for line in result.lines)
+        }
+
+    def test_incremental(self):
+        now = int(time())
+        minute = now - now % 60
+
+        _append(self.log, (minute - 500, 200))
+        # The first run only remembers the end of the file
+        self.assertEqual(self.collect(), {})
+        _append(
+            self.log, (minute - 180, 200), (minute - 150, 404),
+            (minute - 120, 200), (minute + 1, 200),
+        )
+        values = self.collect()
+        self.assertEqual(values[('nginx.requests', minute - 180)], 2)
+        self.assertEqual(
+            values[('nginx.status_codes.404', minute - 180)], 1
+        )
+        self.assertEqual(values[('nginx.requests', minute - 120)], 1)
+        self.assertEqual(
+            values[('nginx.request_time.max', minute - 120)], 0.01
+        )
+        # The current minute is not complete yet
+        self.assertNotIn(('nginx.requests', minute), values)
+        self.assertEqual(self.collect(), {})
+
+        # The entries written late correct their minute, also after rotation
+        _append(self.log, (minute - 100, 500))
+        rename(self.log, self.log + '.1')
+        _append(self.log, (minute - 90, 200), (minute - 2000, 200))
+        values = self.collect()
+        # Only the corrected minute is printed again
+        self.assertEqual({t for k, t in values}, {minute - 120})
+        values = {k: v for (k, t), v in values.items()}
+        self.assertEqual(values['nginx.requests'], 3)
+        self.assertEqual(values['nginx.status_codes.200'], 2)
+        self.assertEqual(values['nginx.status_codes.500'], 1)
+        self.assertEqual(values['nginx.request_time.histogram.le_inf'], 3)
+        self.assertEqual(
+            values['nginx.status_classes.5xx.request_time.histogram.le_inf'], 1
+        )
+
+    def test_incremental_quiet(self):
+        now = int(time())
+        minute = now - now % 60
+        _append(self.log, (minute - 30, 200))
+        self.assertEqual(self.collect(minute + 30), {})
+        _append(self.log, (minute + 35, 200), (minute + 150, 404))
+        values = self.collect(minute + 250)
+        # The minutes without requests are reported with 0
+        self.assertEqual(
+            {t: v for (k, t), v in values.items() if k == 'nginx.requests'},
+            {minute: 1, minute + 60: 0, minute + 120: 1, minute + 180: 0},
+        )
+        self.assertNotIn(('nginx.status_codes.200', minute + 60), values)
+        self.assertEqual(self.collect(minute + 260), {})
+        values = self.collect(minute + 320)
+        self.assertEqual(values[('nginx.requests', minute + 240)], 0)
+        self.assertEqual({t for k, t in values}, {minute + 240})